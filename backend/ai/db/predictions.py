@@ -0,0 +1,418 @@
+"""
+predictions.py
+==============
+Forecast persistence in the Prisma `Prediction` table (prisma/schema.prisma)
+so the Node backend / dashboard read forecasts from MySQL instead of the
+CSV files in data/ and predictions/.
+
+Row layout. This is NOT the layout of
+src/modules/prediction/prediction.repository.js, which stores
+forecastJson as a bare array with timestamp = generatedAt:
+    deviceId      device
+    timestamp     forecast origin (last observed time, naive UTC);
+                  point i (0-based) is at timestamp + (i + 1) * step
+    generatedAt   when the forecast was produced
+    forecastJson  `series_forecast()`  {"step_sec", "series": {name: [...]},
+                                        "prediction": first series}
+                  or `vector_forecast()` {"prediction": [...], "target_cols"}
+    metaJson      free-form (model path, horizon, source script, ...)
+    modelVersion  e.g. "xgb_multi"
+
+prediction.chart.controller.js takes the newest row by `timestamp` (all
+devices). It plots `series[<temp_c_pred|tvoc_ppb_pred>]` at `step_sec`
+when present, otherwise `prediction` at 1-minute steps, so both shapes
+carry a `prediction` array.
+
+Writes: `PredictionWriter` buffers rows and inserts them with one
+executemany per batch (PREDICTION_BATCH_ROWS rows or PREDICTION_FLUSH_SEC
+seconds, whichever comes first) from a background thread, so callers
+never wait on MySQL. Series values are rounded to PREDICTION_DECIMALS to
+keep forecastJson small.
+
+Reads: `latest_predictions()` returns the newest forecast per device in
+ONE query: GROUP BY deviceId / MAX(timestamp) walks the
+(deviceId, timestamp) index, then joins back on the same index.
+
+Used by:
+- app/main.py (/predict store, /predictions/latest)
+- mqtt/forecast_mqtt_xgb_multi.py, mqtt/mqtt_ingest_sqlite.py (hourly sink)
+- ai/training/predict_hourly_recursive.py, train_predict_hourly_fix.py
+
+Run (benchmark on SQLite with the same table/index):
+    python -m ai.db.predictions --devices 20 --per-device 500
+"""
+
+from __future__ import annotations
+import json
+import os
+import threading
+import time
+from datetime import datetime, timezone
+from typing import Any, Dict, List, Mapping, Optional, Sequence
+
+import numpy as np
+from sqlalchemy import bindparam, text
+
+from ai.db.engine import DATABASE_URL, get_engine
+
+# ======================================================
+# CONFIG
+# ======================================================
+
+BATCH_ROWS = int(os.getenv("PREDICTION_BATCH_ROWS", "200"))
+FLUSH_SEC = float(os.getenv("PREDICTION_FLUSH_SEC", "5"))
+DECIMALS = int(os.getenv("PREDICTION_DECIMALS", "4"))
+STORE = os.getenv("PREDICTION_STORE", "1") == "1"            # scripts: simpan ke DB juga
+DEFAULT_DEVICE = os.getenv("PREDICTION_DEVICE", "esp32-01")  # device untuk script single-device
+
+INSERT_SQL = text(
+    "INSERT INTO Prediction "
+    "(deviceId, timestamp, generatedAt, forecastJson, metaJson, modelVersion, createdAt) "
+    "VALUES (:deviceId, :timestamp, :generatedAt, :forecastJson, :metaJson, :modelVersion, :createdAt)"
+)
+
+_LATEST_SQL = (
+    "SELECT p.id, p.deviceId, p.timestamp, p.generatedAt, p.forecastJson, p.metaJson, p.modelVersion "
+    "FROM Prediction p "
+    "JOIN (SELECT deviceId, MAX(timestamp) AS ts FROM Prediction {where} GROUP BY deviceId) m "
+    "ON p.deviceId = m.deviceId AND p.timestamp = m.ts "
+    "ORDER BY p.deviceId, p.id"
+)
+
+# skema yang sama untuk self-test SQLite (MySQL dikelola Prisma)
+SQLITE_DDL = [
+    """
+    CREATE TABLE IF NOT EXISTS Prediction (
+        id           INTEGER PRIMARY KEY AUTOINCREMENT,
+        deviceId     TEXT NOT NULL,
+        timestamp    DATETIME NOT NULL,
+        generatedAt  DATETIME NOT NULL DEFAULT CURRENT_TIMESTAMP,
+        forecastJson TEXT NOT NULL,
+        metaJson     TEXT,
+        modelVersion TEXT NOT NULL,
+        createdAt    DATETIME NOT NULL DEFAULT CURRENT_TIMESTAMP
+    )
+    """,
+    "CREATE INDEX IF NOT EXISTS Prediction_deviceId_timestamp_idx ON Prediction (deviceId, timestamp)",
+]
+
+
+# ======================================================
+# ROWS
+# ======================================================
+
+def to_utc_naive(ts: Any) -> datetime:
+    """epoch seconds / datetime / pd.Timestamp → naive UTC datetime (Prisma DateTime)."""
+    if ts is None:
+        return datetime.now(timezone.utc).replace(tzinfo=None)
+    if isinstance(ts, (int, float, np.integer, np.floating)):
+        return datetime.fromtimestamp(float(ts), timezone.utc).replace(tzinfo=None)
+    if hasattr(ts, "to_pydatetime"):
+        ts = ts.to_pydatetime()
+    if ts.tzinfo is not None:
+        ts = ts.astimezone(timezone.utc).replace(tzinfo=None)
+    return ts
+
+
+def series_forecast(step_sec: int, series: Mapping[str, Sequence[float]]) -> dict:
+    """
+    Regular forecast: one value list per series, no per-point timestamps.
+    `prediction` repeats the first series for readers that only know the
+    vector shape.
+    """
+    rounded = {
+        name: np.round(np.asarray(vals, dtype=np.float64), DECIMALS).tolist()
+        for name, vals in series.items()
+    }
+    return {
+        "step_sec": int(step_sec),
+        "series": rounded,
+        "prediction": next(iter(rounded.values()), []),
+    }
+
+
+def vector_forecast(target_cols: Sequence[str], values: Sequence[float]) -> dict:
+    """One multi-output prediction, in the {"prediction": [...]} shape the Node chart reads."""
+    return {
+        "prediction": np.round(np.asarray(values, dtype=np.float64), DECIMALS).tolist(),
+        "target_cols": list(target_cols),
+    }
+
+
+def prediction_row(device_id: str, timestamp: Any, forecast: dict, model_version: str,
+                   meta: Optional[dict] = None, generated_at: Any = None) -> dict:
+    now = to_utc_naive(None)
+    return {
+        "deviceId": device_id,
+        "timestamp": to_utc_naive(timestamp),
+        "generatedAt": to_utc_naive(generated_at) if generated_at is not None else now,
+        "forecastJson": json.dumps(forecast, separators=(",", ":")),
+        "metaJson": None if meta is None else json.dumps(meta, separators=(",", ":"), default=str),
+        "modelVersion": model_version,
+        "createdAt": now,
+    }
+
+
+def insert_predictions(engine, rows: List[dict]) -> int:
+    """One transaction, one executemany for all `rows`."""
+    if not rows:
+        return 0
+    with engine.begin() as conn:
+        conn.execute(INSERT_SQL, rows)
+    return len(rows)
+
+
+def store_forecast(device_id: str, origin: Any, step_sec: int, series: Mapping[str, Sequence[float]],
+                   model_version: str, meta: Optional[dict] = None, engine=None) -> bool:
+    """
+    One-shot insert for the forecasting scripts (PREDICTION_STORE=1).
+    DB errors are logged, not raised, so the CSV outputs still happen.
+    """
+    if not STORE:
+        return False
+    try:
+        row = prediction_row(device_id, origin, series_forecast(step_sec, series), model_version, meta)
+        insert_predictions(engine if engine is not None else get_engine(DATABASE_URL), [row])
+    except Exception as e:
+        print(f"⚠️ forecast not stored in Prediction table: {e.__class__.__name__}: {e}")
+        return False
+    print(f"✅ stored forecast → Prediction (device={device_id}, model={model_version})")
+    return True
+
+
+# ======================================================
+# BATCHED WRITER
+# ======================================================
+
+class PredictionWriter(threading.Thread):
+    """
+    Background batch inserter. `add()` only appends to a buffer; the
+    thread flushes every `flush_sec` or as soon as `batch_rows` rows are
+    waiting. A failed batch is kept and retried on the next flush (the
+    buffer is capped at 50 batches, oldest rows dropped first).
+    """
+
+    def __init__(self, engine=None, batch_rows: int = BATCH_ROWS, flush_sec: float = FLUSH_SEC):
+        super().__init__(name="prediction-writer", daemon=True)
+        self.engine = engine if engine is not None else get_engine(DATABASE_URL)
+        self.batch_rows = max(1, batch_rows)
+        self.flush_sec = flush_sec
+        self.max_buffer = 50 * self.batch_rows
+
+        self._buf: List[dict] = []
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._stop_event = threading.Event()
+
+        # metrics
+        self.rows = 0
+        self.batches = 0
+        self.errors = 0
+        self.dropped = 0
+        self.batch_ms_max = 0.0
+
+    def add(self, device_id: str, timestamp: Any, forecast: dict, model_version: str,
+            meta: Optional[dict] = None, generated_at: Any = None) -> None:
+        row = prediction_row(device_id, timestamp, forecast, model_version, meta, generated_at)
+        with self._lock:
+            self._buf.append(row)
+            if len(self._buf) > self.max_buffer:
+                drop = len(self._buf) - self.max_buffer
+                del self._buf[:drop]
+                self.dropped += drop
+            full = len(self._buf) >= self.batch_rows
+        if full:
+            self._wake.set()
+
+    def flush(self) -> int:
+        """Insert everything buffered now (also callable from the caller's thread)."""
+        written = 0
+        while True:
+            with self._lock:
+                batch = self._buf[:self.batch_rows]
+                del self._buf[:len(batch)]
+            if not batch:
+                return written
+            t0 = time.perf_counter()
+            try:
+                insert_predictions(self.engine, batch)
+            except Exception as e:
+                self.errors += 1
+                with self._lock:
+                    self._buf[:0] = batch          # coba lagi di flush berikutnya
+                print(f"❌ prediction insert failed ({len(batch)} rows): {e}")
+                return written
+            self.batch_ms_max = max(self.batch_ms_max, (time.perf_counter() - t0) * 1e3)
+            self.batches += 1
+            self.rows += len(batch)
+            written += len(batch)
+
+    def run(self) -> None:
+        while not self._stop_event.is_set():
+            self._wake.wait(self.flush_sec)
+            self._wake.clear()
+            self.flush()
+        self.flush()
+
+    def stop(self, timeout: float = 30.0) -> None:
+        self._stop_event.set()
+        self._wake.set()
+        if self.is_alive():
+            self.join(timeout)
+        else:
+            self.flush()
+
+    def metrics(self) -> dict:
+        with self._lock:
+            pending = len(self._buf)
+        return {
+            "rows": self.rows,
+            "batches": self.batches,
+            "pending": pending,
+            "errors": self.errors,
+            "dropped": self.dropped,
+            "batch_ms_max": round(self.batch_ms_max, 2),
+        }
+
+
+_writer: Optional[PredictionWriter] = None
+_writer_lock = threading.Lock()
+
+
+def get_writer(engine=None) -> PredictionWriter:
+    """Process-wide started writer (created on first use)."""
+    global _writer
+    with _writer_lock:
+        if _writer is None:
+            _writer = PredictionWriter(engine)
+            _writer.start()
+        return _writer
+
+
+def stop_writer() -> None:
+    """Flush and stop the process-wide writer, if one was started."""
+    global _writer
+    with _writer_lock:
+        writer, _writer = _writer, None
+    if writer is not None:
+        writer.stop()
+
+
+# ======================================================
+# READ
+# ======================================================
+
+def _parse_dt(v):
+    return datetime.fromisoformat(v) if isinstance(v, str) else v
+
+
+def _parse_json(v):
+    return json.loads(v) if isinstance(v, (str, bytes)) else v
+
+
+def latest_predictions(engine=None, device_ids: Optional[Sequence[str]] = None) -> List[Dict[str, Any]]:
+    """Newest forecast per device (all devices, or only `device_ids`) in one query."""
+    engine = engine if engine is not None else get_engine(DATABASE_URL)
+    params = {}
+    if device_ids:
+        sql = text(_LATEST_SQL.format(where="WHERE deviceId IN :devs")).bindparams(
+            bindparam("devs", expanding=True)
+        )
+        params["devs"] = list(device_ids)
+    else:
+        sql = text(_LATEST_SQL.format(where=""))
+
+    with engine.connect() as conn:
+        rows = conn.execute(sql, params).fetchall()
+
+    latest: Dict[str, Dict[str, Any]] = {}
+    for r in rows:   # timestamp kembar → id terbesar menang (ORDER BY id)
+        latest[r.deviceId] = {
+            "id": r.id,
+            "device_id": r.deviceId,
+            "timestamp": _parse_dt(r.timestamp),
+            "generated_at": _parse_dt(r.generatedAt),
+            "model_version": r.modelVersion,
+            "forecast": _parse_json(r.forecastJson),
+            "meta": _parse_json(r.metaJson),
+        }
+    return list(latest.values())
+
+
+# ======================================================
+# SELF-TEST / BENCHMARK (SQLite)
+# ======================================================
+
+if __name__ == "__main__":
+    import argparse
+    import tempfile
+
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--devices", type=int, default=20)
+    ap.add_argument("--per-device", type=int, default=500)
+    ap.add_argument("--points", type=int, default=168)
+    args = ap.parse_args()
+
+    tmp = tempfile.mkdtemp()
+    engines = {}
+    for name in ("row", "batch"):
+        eng = get_engine(f"sqlite:///{tmp}/{name}.db")
+        with eng.begin() as conn:
+            for ddl in SQLITE_DDL:
+                conn.execute(text(ddl))
+        engines[name] = eng
+
+    rng = np.random.default_rng(0)
+    devices = [f"esp32-{i:02d}" for i in range(args.devices)]
+    t_origin = 1_763_000_000
+    jobs = [
+        (dev, t_origin + k * 3600,
+         series_forecast(3600, {"temp_c_pred": 27 + rng.normal(0, 1, args.points),
+                                "tvoc_ppb_pred": 390 + rng.normal(0, 20, args.points)}))
+        for k in range(args.per_device) for dev in devices
+    ]
+    n = len(jobs)
+
+    # 1) satu INSERT + commit per forecast (seperti prisma.prediction.create per pesan)
+    t0 = time.perf_counter()
+    for dev, ts, fc in jobs:
+        insert_predictions(engines["row"], [prediction_row(dev, ts, fc, "xgb_multi")])
+    t_row = time.perf_counter() - t0
+
+    # 2) PredictionWriter (executemany per batch, background thread)
+    writer = PredictionWriter(engines["batch"])
+    writer.start()
+    t0 = time.perf_counter()
+    for dev, ts, fc in jobs:
+        writer.add(dev, ts, fc, "xgb_multi")
+    t_add = time.perf_counter() - t0
+    writer.stop()
+    t_batch = time.perf_counter() - t0
+
+    # 3) latest per device: satu query vs satu query per device
+    eng = engines["batch"]
+    t0 = time.perf_counter()
+    latest = latest_predictions(eng)
+    t_latest = time.perf_counter() - t0
+    t0 = time.perf_counter()
+    with eng.connect() as conn:
+        for dev in devices:
+            conn.execute(text("SELECT * FROM Prediction WHERE deviceId = :d ORDER BY timestamp DESC LIMIT 1"),
+                         {"d": dev}).fetchone()
+    t_loop = time.perf_counter() - t0
+    with eng.connect() as conn:
+        plan = conn.execute(text("EXPLAIN QUERY PLAN " + _LATEST_SQL.format(where=""))).fetchall()
+
+    assert len(latest) == args.devices
+    assert all(p["timestamp"] == to_utc_naive(t_origin + (args.per_device - 1) * 3600) for p in latest)
+    assert len(latest_predictions(eng, devices[:3])) == 3
+
+    print("=" * 70)
+    print(f"💾 PREDICTION STORE ({n:,} forecasts x {args.points} points, SQLite)")
+    print("=" * 70)
+    print(f"insert per row      : {t_row:.2f}s ({n / t_row:,.0f} rows/s)")
+    print(f"PredictionWriter    : {t_batch:.2f}s ({n / t_batch:,.0f} rows/s), add() loop {t_add:.2f}s")
+    print(f"latest, 1 query     : {t_latest * 1e3:.1f} ms for {len(latest)} devices")
+    print(f"latest, per device  : {t_loop * 1e3:.1f} ms")
+    print("plan:", " | ".join(r[-1] for r in plan))
+    print(f"📊 {writer.metrics()}")
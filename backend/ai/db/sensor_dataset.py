@@ -0,0 +1,368 @@
+"""
+sensor_dataset.py
+=================
+Columnar sensor dataset: typed, zstd-compressed Parquet partitioned by
+device and UTC day (hive layout, readable by pyarrow.dataset / pandas).
+
+    data/sensor_dataset/
+        device_id=esp32-01/
+            date=2025-11-18/part-0.parquet
+            date=2025-11-19/part-0.parquet
+
+Schema: ts timestamp[ms, UTC] + BASE_COLS as float32. `device_id` and
+`date` live in the directory names (partition columns).
+
+Reader: `read_dataset()` with column projection and device / time
+predicate pushdown: partitions outside the device/day range are never
+opened, only the requested columns are decoded, and the ts filter is
+checked against row-group statistics. `load_sensor_frame()` gives the
+trainers one entry point for either a dataset directory or a CSV.
+
+Used by:
+- ai/utils/clean_sensor_stream.py (write path)
+- ai/training/train_xgb_from_csv.py, train_xgb_multi.py, train_rf_hourly.py,
+  predict_hourly_recursive.py, train_predict_hourly_fix.py (read path)
+
+Run:
+    python -m ai.db.sensor_dataset --device esp32-01 --last-days 365
+"""
+
+from __future__ import annotations
+import glob
+import os
+import time
+from typing import Dict, Optional, Sequence, Tuple, Union
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.dataset as ds
+import pyarrow.parquet as pq
+
+from ai.db.sensor_hourly import BASE_COLS
+
+# ======================================================
+# CONFIG
+# ======================================================
+
+DATASET_DIR = os.path.abspath(
+    os.path.join(os.path.dirname(__file__), "..", "data", "sensor_dataset")
+)
+
+SCHEMA = pa.schema(
+    [pa.field("ts", pa.timestamp("ms", tz="UTC"))]
+    + [pa.field(c, pa.float32()) for c in BASE_COLS]
+)
+
+PARTITIONING = ds.partitioning(
+    pa.schema([("device_id", pa.string()), ("date", pa.string())]),
+    flavor="hive",
+)
+
+COMPRESSION = "zstd"
+ROW_GROUP_ROWS = 128_000
+
+
+def partition_dir(root: str, device_id: str, day: str) -> str:
+    return os.path.join(root, f"device_id={device_id}", f"date={day}")
+
+
+# ======================================================
+# WRITER
+# ======================================================
+
+class PartitionWriter:
+    """
+    Append cleaned rows to (device, day) partitions.
+
+    Rows for a partition are buffered up to `row_group_rows` and written
+    as one row group; a partition's file is closed by `close_before(ts)`
+    (or per device, `close_before(ts, device_id)`) once the stream has
+    moved past that day, so open files stay bounded by
+    (#devices × days in flight).
+
+    A partition touched in this run is rewritten: its old part files are
+    removed when it is first opened.
+    """
+
+    def __init__(
+        self,
+        root: str = DATASET_DIR,
+        compression: str = COMPRESSION,
+        row_group_rows: int = ROW_GROUP_ROWS,
+    ):
+        self.root = root
+        self.compression = compression
+        self.row_group_rows = row_group_rows
+
+        self._writers: Dict[Tuple[str, str], pq.ParquetWriter] = {}
+        self._buffers: Dict[Tuple[str, str], list] = {}
+        self._touched = set()
+
+        # metrics
+        self.rows = 0
+        self.files = 0
+        self.row_groups = 0
+
+    def write(self, device_id: str, df: pd.DataFrame) -> None:
+        """`df`: ts (UTC datetime) + BASE_COLS, sorted by ts."""
+        if df.empty:
+            return
+        days = df["ts"].dt.strftime("%Y-%m-%d")
+        for day, part in df.groupby(days, sort=True):
+            key = (device_id, day)
+            buf = self._buffers.setdefault(key, [])
+            buf.append(part)
+            if sum(len(p) for p in buf) >= self.row_group_rows:
+                self._flush(key)
+
+    def _open(self, key) -> pq.ParquetWriter:
+        writer = self._writers.get(key)
+        if writer is None:
+            path_dir = partition_dir(self.root, *key)
+            os.makedirs(path_dir, exist_ok=True)
+            if key not in self._touched:
+                for old in glob.glob(os.path.join(path_dir, "*.parquet")):
+                    os.remove(old)
+                self._touched.add(key)
+            n = len(glob.glob(os.path.join(path_dir, "part-*.parquet")))
+            writer = pq.ParquetWriter(
+                os.path.join(path_dir, f"part-{n}.parquet"),
+                SCHEMA,
+                compression=self.compression,
+            )
+            self._writers[key] = writer
+            self.files += 1
+        return writer
+
+    def _flush(self, key) -> None:
+        parts = self._buffers.pop(key, None)
+        if not parts:
+            return
+        df = pd.concat(parts, ignore_index=True) if len(parts) > 1 else parts[0]
+        table = pa.Table.from_pandas(
+            df[SCHEMA.names], schema=SCHEMA, preserve_index=False, safe=False
+        )
+        self._open(key).write_table(table)
+        self.rows += len(df)
+        self.row_groups += 1
+
+    def close_before(self, ts: Optional[pd.Timestamp], device_id: Optional[str] = None) -> None:
+        """Flush & close partitions (of `device_id`, or all) whose day ends at or before `ts`."""
+        if ts is None:
+            return
+        cutoff = ts.strftime("%Y-%m-%d")
+        keys = set(self._buffers) | set(self._writers)
+        for key in [k for k in keys if k[1] < cutoff and (device_id is None or k[0] == device_id)]:
+            self._flush(key)
+            writer = self._writers.pop(key, None)
+            if writer is not None:
+                writer.close()
+
+    def close(self) -> None:
+        for key in list(self._buffers):
+            self._flush(key)
+        for writer in self._writers.values():
+            writer.close()
+        self._writers.clear()
+
+    def metrics(self) -> dict:
+        return {
+            "rows": self.rows,
+            "files": self.files,
+            "row_groups": self.row_groups,
+            "open_files": len(self._writers),
+        }
+
+
+# ======================================================
+# READER
+# ======================================================
+
+Devices = Union[str, Sequence[str], None]
+
+
+def open_dataset(root: str = DATASET_DIR) -> ds.Dataset:
+    return ds.dataset(root, format="parquet", partitioning=PARTITIONING)
+
+
+def _utc(t) -> Optional[pd.Timestamp]:
+    if t is None:
+        return None
+    if isinstance(t, (int, float)):
+        return pd.Timestamp(t, unit="s", tz="UTC")
+    t = pd.Timestamp(t)
+    return t.tz_localize("UTC") if t.tzinfo is None else t.tz_convert("UTC")
+
+
+def _device_filter(device_id: Devices):
+    if device_id is None:
+        return None
+    devices = [device_id] if isinstance(device_id, str) else list(device_id)
+    return ds.field("device_id").isin(devices)
+
+
+def _and(a, b):
+    return b if a is None else (a if b is None else a & b)
+
+
+def latest_day(dataset: ds.Dataset, device_id: Devices = None) -> Optional[pd.Timestamp]:
+    """Newest partition day (from directory names only, no file reads)."""
+    days = [
+        ds.get_partition_keys(f.partition_expression).get("date")
+        for f in dataset.get_fragments(filter=_device_filter(device_id))
+    ]
+    days = [d for d in days if d]
+    return pd.Timestamp(max(days), tz="UTC") if days else None
+
+
+def read_dataset(
+    root: str = DATASET_DIR,
+    device_id: Devices = None,
+    start=None,
+    end=None,
+    last_days: Optional[float] = None,
+    columns: Optional[Sequence[str]] = None,
+    info: Optional[dict] = None,
+) -> pd.DataFrame:
+    """
+    Load [start, end) for one/several/all devices.
+
+    Parameters
+    ----------
+    start, end : epoch seconds / Timestamp / str (UTC if naive)
+    last_days : float, optional
+        Keep the last N days before `end`, or before the newest data of
+        the selected device(s) when `end` is None.
+    columns : sequence, optional
+        Subset of BASE_COLS (default all).
+    info : dict, optional
+        Filled with {"files", "files_total", "rows", "seconds"}.
+
+    Returns
+    -------
+    DataFrame indexed by ts (UTC), sorted; with a `device_id` column
+    unless a single device was requested.
+    """
+    t0 = time.perf_counter()
+    dataset = open_dataset(root)
+    columns = list(columns or BASE_COLS)
+    start, end = _utc(start), _utc(end)
+
+    exact_last = None
+    if last_days is not None:
+        if end is None:
+            newest = latest_day(dataset, device_id)
+            if newest is None:
+                return pd.DataFrame(columns=columns, index=pd.DatetimeIndex([], tz="UTC", name="ts"))
+            # batas kasar per hari untuk pruning; dipotong presisi setelah load
+            start = newest - pd.Timedelta(days=last_days)
+            exact_last = pd.Timedelta(days=last_days)
+        else:
+            start = end - pd.Timedelta(days=last_days)
+
+    expr = _device_filter(device_id)
+    if start is not None:
+        expr = _and(expr, ds.field("date") >= start.strftime("%Y-%m-%d"))
+        expr = _and(expr, ds.field("ts") >= pa.scalar(start, type=SCHEMA.field("ts").type))
+    if end is not None:
+        expr = _and(expr, ds.field("date") <= (end - pd.Timedelta(milliseconds=1)).strftime("%Y-%m-%d"))
+        expr = _and(expr, ds.field("ts") < pa.scalar(end, type=SCHEMA.field("ts").type))
+
+    single = isinstance(device_id, str)
+    read_cols = ["ts"] + columns + ([] if single else ["device_id"])
+    fragments = list(dataset.get_fragments(filter=expr))
+    table = dataset.to_table(columns=read_cols, filter=expr)
+
+    df = table.to_pandas()
+    if not single:
+        df["device_id"] = df["device_id"].astype("str")
+    df = df.set_index("ts").sort_index(kind="stable")
+    df.index = df.index.as_unit("ns")
+
+    if exact_last is not None and len(df):
+        df = df.loc[df.index >= df.index.max() - exact_last]
+
+    if info is not None:
+        info.update(
+            files=len(fragments),
+            files_total=len(dataset.files),
+            rows=len(df),
+            seconds=time.perf_counter() - t0,
+        )
+    return df
+
+
+def load_sensor_frame(
+    path: str,
+    device_id: Devices = None,
+    last_days: Optional[float] = None,
+    columns: Optional[Sequence[str]] = None,
+) -> pd.DataFrame:
+    """
+    Common training input: dataset directory → `read_dataset` (pushdown);
+    CSV file → read + shared timestamp parser + the same filters in pandas.
+
+    Returns ts-indexed (UTC) rows with BASE_COLS (or `columns`).
+    """
+    if os.path.isdir(path):
+        info = {}
+        df = read_dataset(path, device_id, last_days=last_days, columns=columns, info=info)
+        print(f"📦 Dataset {path}: {info['rows']:,} rows from {info['files']}/{info['files_total']} files "
+              f"({info['seconds']:.2f}s)")
+        return df
+
+    from ai.utils.timestamps import parse_timestamps
+
+    df = pd.read_csv(path)
+    df = df.rename(columns=lambda c: str(c).strip().strip(";"))
+    if "ts" not in df.columns:
+        raise RuntimeError("CSV must contain 'ts' column")
+
+    ts = parse_timestamps(df["ts"])
+    valid = ts.notna()
+    if not valid.all():
+        print(f"[WARN] {int((~valid).sum())} invalid timestamps dropped")
+    df = df.loc[valid].drop(columns=["ts"])
+    df.index = pd.DatetimeIndex(ts[valid], name="ts")
+
+    if "device_id" in df.columns:
+        df["device_id"] = df["device_id"].astype("str").str.strip().str.rstrip(";")
+        if device_id is not None:
+            devices = [device_id] if isinstance(device_id, str) else list(device_id)
+            df = df.loc[df["device_id"].isin(devices)]
+
+    df = df.sort_index(kind="stable")
+    if last_days is not None and len(df):
+        df = df.loc[df.index >= df.index.max() - pd.Timedelta(days=last_days)]
+
+    keep = [c for c in (columns or BASE_COLS) if c in df.columns]
+    if "device_id" in df.columns and not isinstance(device_id, str):
+        keep.append("device_id")
+    return df[keep]
+
+
+# ======================================================
+# CLI (pushdown demo / benchmark vs CSV)
+# ======================================================
+if __name__ == "__main__":
+    import argparse
+
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--root", default=DATASET_DIR)
+    ap.add_argument("--device", default=None)
+    ap.add_argument("--last-days", type=float, default=None)
+    ap.add_argument("--columns", default=None, help="comma separated, default all")
+    ap.add_argument("--csv", default=None, help="compare with loading this CSV")
+    args = ap.parse_args()
+
+    cols = args.columns.split(",") if args.columns else None
+    info = {}
+    df = read_dataset(args.root, args.device, last_days=args.last_days, columns=cols, info=info)
+    print(f"✅ dataset: {info['rows']:,} rows, {info['files']}/{info['files_total']} files, {info['seconds']:.2f}s")
+    if len(df):
+        print(f"   {df.index.min()} → {df.index.max()} cols={list(df.columns)}")
+
+    if args.csv:
+        t0 = time.perf_counter()
+        ref = load_sensor_frame(args.csv, args.device, last_days=args.last_days, columns=cols)
+        print(f"📊 csv    : {len(ref):,} rows, {time.perf_counter() - t0:.2f}s")
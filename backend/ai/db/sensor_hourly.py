@@ -0,0 +1,371 @@
+"""
+sensor_hourly.py
+================
+Ingest-time hourly rollup of the SQLite `sensor` table.
+
+`sensor_hourly` is keyed by (device_id, hour) and holds, per base column,
+count / sum / sum of squares / min / max, plus a p90 for TVOC. It is
+upserted by the MQTT ingest writer in the same transaction as the raw
+rows, so readers can load hourly series without resampling minute data.
+
+Used by:
+- mqtt/mqtt_ingest_sqlite.py (write path)
+- hourly readers (load_hourly)
+
+Run (backfill an existing database):
+    python -m ai.db.sensor_hourly --db ai/data/sensor.db --rebuild
+"""
+
+from __future__ import annotations
+import math
+import sqlite3
+from typing import Iterable, List, Optional, Sequence
+
+import numpy as np
+import pandas as pd
+
+# ======================================================
+# CONFIG
+# ======================================================
+
+BASE_COLS = [
+    "temp_c",
+    "rh_pct",
+    "tvoc_ppb",
+    "eco2_ppm",
+    "dust_ugm3",
+]
+
+# Columns that also keep an hourly p90 (peak-preserving TVOC features)
+P90_COLS = ["tvoc_ppb"]
+P90_Q = 0.90
+
+HOUR_SEC = 3600
+
+# ======================================================
+# SQL
+# ======================================================
+
+def _stat_columns() -> List[str]:
+    cols: List[str] = []
+    for c in BASE_COLS:
+        cols += [f"{c}_n", f"{c}_sum", f"{c}_sumsq", f"{c}_min", f"{c}_max"]
+    cols += [f"{c}_p90" for c in P90_COLS]
+    return cols
+
+
+SQL_CREATE_HOURLY = (
+    "CREATE TABLE IF NOT EXISTS sensor_hourly (\n"
+    "    device_id TEXT NOT NULL,\n"
+    "    hour INTEGER NOT NULL,\n"
+    "    n INTEGER NOT NULL,\n"
+    + "".join(
+        f"    {c} {'INTEGER NOT NULL DEFAULT 0' if c.endswith('_n') else 'REAL'},\n"
+        for c in _stat_columns()
+    )
+    + "    PRIMARY KEY (device_id, hour)\n"
+    ") WITHOUT ROWID;"
+)
+
+SQL_CREATE_BATCH = (
+    "CREATE TEMP TABLE IF NOT EXISTS _ingest_batch "
+    f"(ts INTEGER NOT NULL, device_id TEXT, {', '.join(f'{c} REAL' for c in BASE_COLS)});"
+)
+
+SQL_INSERT_BATCH = (
+    f"INSERT INTO _ingest_batch (ts, device_id, {', '.join(BASE_COLS)}) "
+    f"VALUES (?, ?, {', '.join('?' for _ in BASE_COLS)})"
+)
+
+
+def _agg_select(source: str, where: str = "") -> str:
+    aggs = []
+    for c in BASE_COLS:
+        aggs += [
+            f"COUNT({c})",
+            f"TOTAL({c})",
+            f"TOTAL({c} * {c})",
+            f"MIN({c})",
+            f"MAX({c})",
+        ]
+    aggs += ["NULL" for _ in P90_COLS]
+    return (
+        f"SELECT device_id, ts - ts % {HOUR_SEC} AS hour, COUNT(*), {', '.join(aggs)} "
+        f"FROM {source} WHERE device_id IS NOT NULL {where} GROUP BY device_id, hour"
+    )
+
+
+def _upsert_sql(source: str) -> str:
+    sets = ["n = n + excluded.n"]
+    for c in BASE_COLS:
+        sets += [
+            f"{c}_n = {c}_n + excluded.{c}_n",
+            f"{c}_sum = {c}_sum + excluded.{c}_sum",
+            f"{c}_sumsq = {c}_sumsq + excluded.{c}_sumsq",
+            f"{c}_min = MIN(COALESCE({c}_min, excluded.{c}_min), COALESCE(excluded.{c}_min, {c}_min))",
+            f"{c}_max = MAX(COALESCE({c}_max, excluded.{c}_max), COALESCE(excluded.{c}_max, {c}_max))",
+        ]
+    cols = ["device_id", "hour", "n"] + _stat_columns()
+    # SELECT sudah punya WHERE, jadi ON CONFLICT tidak ambigu (SQLite upsert)
+    return (
+        f"INSERT INTO sensor_hourly ({', '.join(cols)}) {_agg_select(source)} "
+        f"ON CONFLICT(device_id, hour) DO UPDATE SET {', '.join(sets)}"
+    )
+
+
+SQL_UPSERT_FROM_BATCH = _upsert_sql("_ingest_batch")
+
+# ======================================================
+# SCHEMA
+# ======================================================
+
+def create_hourly_table(con: sqlite3.Connection) -> None:
+    con.execute(SQL_CREATE_HOURLY)
+    con.commit()
+
+
+# ======================================================
+# P90
+# ======================================================
+
+def quantile(values: Sequence[float], q: float = P90_Q) -> Optional[float]:
+    """Linear-interpolated quantile (same as pandas' default)."""
+    if not values:
+        return None
+    vals = sorted(values)
+    pos = (len(vals) - 1) * q
+    lo = math.floor(pos)
+    hi = min(lo + 1, len(vals) - 1)
+    return vals[lo] + (vals[hi] - vals[lo]) * (pos - lo)
+
+
+def refresh_p90(con: sqlite3.Connection, keys: Iterable[tuple]) -> None:
+    """
+    Recompute p90 for the given (device_id, hour) groups from that hour's
+    raw rows (≤ 3600 per group, served by the (ts, device_id) index).
+    """
+    cur = con.cursor()
+    for device_id, hour in keys:
+        for c in P90_COLS:
+            vals = [
+                r[0] for r in cur.execute(
+                    f"SELECT {c} FROM sensor WHERE ts >= ? AND ts < ? "
+                    f"AND device_id = ? AND {c} IS NOT NULL",
+                    (hour, hour + HOUR_SEC, device_id),
+                )
+            ]
+            cur.execute(
+                f"UPDATE sensor_hourly SET {c}_p90 = ? WHERE device_id = ? AND hour = ?",
+                (quantile(vals), device_id, hour),
+            )
+
+
+# ======================================================
+# WRITE PATH (called inside the writer transaction)
+# ======================================================
+
+def apply_batch(con: sqlite3.Connection, rows: list) -> int:
+    """
+    Insert raw rows into `sensor` and fold them into `sensor_hourly`.
+
+    Rows already stored (same ts + device_id) and in-batch duplicates are
+    dropped first, matching INSERT OR IGNORE, so they are never counted
+    twice. The caller commits.
+
+    The transaction is opened with BEGIN IMMEDIATE (unless the caller
+    already has one open): the batch reads `sensor` before writing, and a
+    deferred read-then-write transaction in WAL mode fails with
+    SQLITE_BUSY_SNAPSHOT (not retried by busy_timeout) when another
+    connection (shard writer, compaction, forecast sink) commits between
+    the read and the write.
+
+    Returns
+    -------
+    int
+        Number of new raw rows.
+    """
+    cur = con.cursor()
+    if not con.in_transaction:
+        cur.execute("BEGIN IMMEDIATE")  # ambil write lock dulu (busy_timeout berlaku di sini)
+    cur.execute(SQL_CREATE_BATCH)
+    cur.execute("DELETE FROM _ingest_batch")
+    cur.executemany(SQL_INSERT_BATCH, rows)
+
+    cur.execute("""
+        DELETE FROM _ingest_batch
+        WHERE rowid NOT IN (
+            SELECT MIN(rowid) FROM _ingest_batch GROUP BY ts, device_id
+        )
+    """)
+    cur.execute("""
+        DELETE FROM _ingest_batch
+        WHERE EXISTS (
+            SELECT 1 FROM sensor s
+            WHERE s.ts = _ingest_batch.ts AND s.device_id = _ingest_batch.device_id
+        )
+    """)
+
+    cols = ", ".join(["ts", "device_id"] + BASE_COLS)
+    cur.execute(f"INSERT OR IGNORE INTO sensor ({cols}) SELECT {cols} FROM _ingest_batch")
+    inserted = cur.rowcount
+
+    cur.execute(SQL_UPSERT_FROM_BATCH)
+
+    if P90_COLS:
+        keys = cur.execute(
+            f"SELECT DISTINCT device_id, ts - ts % {HOUR_SEC} FROM _ingest_batch "
+            "WHERE device_id IS NOT NULL"
+        ).fetchall()
+        refresh_p90(con, keys)
+
+    cur.execute("DELETE FROM _ingest_batch")
+    return inserted
+
+
+# ======================================================
+# BACKFILL
+# ======================================================
+
+def rollup_range(
+    con: sqlite3.Connection,
+    device_id: Optional[str] = None,
+    start_ts: Optional[int] = None,
+    end_ts: Optional[int] = None,
+    replace: bool = True,
+) -> int:
+    """
+    (Re)build hourly rows from the raw rows in [start_ts, end_ts).
+
+    replace=True overwrites existing hours (backfill); replace=False only
+    fills hours that have no rollup yet (compaction safety net). Hours
+    without raw rows (already compacted) are left untouched. The caller
+    commits.
+    """
+    where, params = [], []
+    if device_id is not None:
+        where.append("AND device_id = ?")
+        params.append(device_id)
+    if start_ts is not None:
+        where.append("AND ts >= ?")
+        params.append(int(start_ts))
+    if end_ts is not None:
+        where.append("AND ts < ?")
+        params.append(int(end_ts))
+    where_sql = " ".join(where)
+
+    cur = con.cursor()
+    keys = cur.execute(
+        f"SELECT DISTINCT device_id, ts - ts % {HOUR_SEC} FROM sensor "
+        f"WHERE device_id IS NOT NULL {where_sql}",
+        params,
+    ).fetchall()
+    if not replace:
+        keys = [
+            k for k in keys
+            if cur.execute(
+                "SELECT 1 FROM sensor_hourly WHERE device_id = ? AND hour = ?", k
+            ).fetchone() is None
+        ]
+    if not keys:
+        return 0
+
+    cols = ", ".join(["device_id", "hour", "n"] + _stat_columns())
+    verb = "INSERT OR REPLACE" if replace else "INSERT OR IGNORE"
+    cur.execute(f"{verb} INTO sensor_hourly ({cols}) " + _agg_select("sensor", where_sql), params)
+    refresh_p90(con, keys)
+    return len(keys)
+
+
+def rebuild_hourly(con: sqlite3.Connection) -> int:
+    """
+    Rebuild `sensor_hourly` from all raw rows (existing databases).
+    Hours whose raw rows were already compacted away are kept.
+    """
+    create_hourly_table(con)
+    n = rollup_range(con, replace=True)
+    con.commit()
+    return n
+
+
+# ======================================================
+# READ PATH
+# ======================================================
+
+def load_hourly(
+    con: sqlite3.Connection,
+    device_id: Optional[str] = None,
+    start_ts: Optional[int] = None,
+    end_ts: Optional[int] = None,
+) -> pd.DataFrame:
+    """
+    Load hourly aggregates without touching minute rows.
+
+    Returns
+    -------
+    pd.DataFrame
+        UTC DatetimeIndex (hour start). Columns per base col `c`:
+        `c` (mean), `c_std`, `c_min`, `c_max`, `c_count`, plus `c_p90`
+        for P90_COLS. With device_id=None a `device_id` column is kept.
+    """
+    where, params = [], []
+    if device_id is not None:
+        where.append("device_id = ?")
+        params.append(device_id)
+    if start_ts is not None:
+        where.append("hour >= ?")
+        params.append(int(start_ts) - int(start_ts) % HOUR_SEC)
+    if end_ts is not None:
+        where.append("hour <= ?")
+        params.append(int(end_ts))
+
+    sql = "SELECT * FROM sensor_hourly"
+    if where:
+        sql += " WHERE " + " AND ".join(where)
+    sql += " ORDER BY device_id, hour"
+
+    raw = pd.read_sql_query(sql, con, params=params)
+
+    out = pd.DataFrame(index=pd.to_datetime(raw["hour"], unit="s", utc=True))
+    out.index.name = "ts"
+    if device_id is None:
+        out["device_id"] = raw["device_id"].to_numpy()
+
+    for c in BASE_COLS:
+        n = raw[f"{c}_n"].to_numpy(dtype=float)
+        s = raw[f"{c}_sum"].to_numpy(dtype=float)
+        ss = raw[f"{c}_sumsq"].to_numpy(dtype=float)
+        with np.errstate(divide="ignore", invalid="ignore"):
+            mean = s / n
+            var = (ss - s * s / n) / (n - 1)
+        out[c] = mean
+        out[f"{c}_std"] = var.clip(min=0) ** 0.5
+        out[f"{c}_min"] = raw[f"{c}_min"].to_numpy()
+        out[f"{c}_max"] = raw[f"{c}_max"].to_numpy()
+        out[f"{c}_count"] = n.astype(int)
+    for c in P90_COLS:
+        out[f"{c}_p90"] = raw[f"{c}_p90"].to_numpy()
+
+    return out
+
+
+# ======================================================
+# CLI
+# ======================================================
+
+if __name__ == "__main__":
+    import argparse
+
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--db", default="data/sensor.db")
+    ap.add_argument("--rebuild", action="store_true", help="backfill sensor_hourly dari tabel sensor")
+    ap.add_argument("--device", default=None)
+    args = ap.parse_args()
+
+    with sqlite3.connect(args.db) as con:
+        if args.rebuild:
+            n = rebuild_hourly(con)
+            print(f"✅ sensor_hourly rebuilt: {n} device-hours")
+        df = load_hourly(con, args.device)
+
+    print(f"📊 Hourly rows: {len(df)}")
+    print(df.tail(5))
@@ -0,0 +1,304 @@
+"""
+sqlite_store.py
+===============
+Storage profiles for the SQLite sensor store (data/sensor.db).
+
+Profiles
+--------
+legacy : rowid table + UNIQUE INDEX uniq_ts_dev (ts, device_id),
+         WAL with SQLite default pragmas (the original layout).
+tuned  : WITHOUT ROWID table clustered on PRIMARY KEY (device_id, ts),
+         so per-device time-range scans read contiguous pages; plus a
+         (ts) index for cross-device "latest rows" queries, synchronous
+         NORMAL, mmap, larger page cache, bounded WAL and passive
+         checkpoints driven by the writer.
+
+Used by:
+- mqtt/mqtt_ingest_sqlite.py
+- ai/db/sensor_hourly.py (same `sensor` table in both profiles)
+
+Run:
+    python -m ai.db.sqlite_store info       --db data/sensor.db
+    python -m ai.db.sqlite_store migrate    --db data/sensor.db --profile tuned
+    python -m ai.db.sqlite_store checkpoint --db data/sensor.db
+    python -m ai.db.sqlite_store bench      --days 365 --devices 4
+"""
+
+from __future__ import annotations
+import os
+import sqlite3
+import time
+from typing import Dict, List, Optional
+
+# ======================================================
+# CONFIG
+# ======================================================
+
+DEFAULT_PROFILE = "tuned"
+
+SENSOR_COLS = [
+    "ts",
+    "device_id",
+    "temp_c",
+    "rh_pct",
+    "tvoc_ppb",
+    "eco2_ppm",
+    "dust_ugm3",
+]
+
+PROFILES: Dict[str, dict] = {
+    "legacy": {
+        "schema": [
+            """
+            CREATE TABLE IF NOT EXISTS sensor (
+                ts INTEGER NOT NULL,
+                device_id TEXT,
+                temp_c REAL,
+                rh_pct REAL,
+                tvoc_ppb REAL,
+                eco2_ppm REAL,
+                dust_ugm3 REAL
+            );
+            """,
+            "CREATE UNIQUE INDEX IF NOT EXISTS uniq_ts_dev ON sensor (ts, device_id);",
+        ],
+        "pragmas": [
+            "PRAGMA journal_mode=WAL;",
+        ],
+    },
+    "tuned": {
+        "schema": [
+            """
+            CREATE TABLE IF NOT EXISTS sensor (
+                ts INTEGER NOT NULL,
+                device_id TEXT NOT NULL,
+                temp_c REAL,
+                rh_pct REAL,
+                tvoc_ppb REAL,
+                eco2_ppm REAL,
+                dust_ugm3 REAL,
+                PRIMARY KEY (device_id, ts)
+            ) WITHOUT ROWID;
+            """,
+            "CREATE INDEX IF NOT EXISTS idx_sensor_ts ON sensor (ts);",
+        ],
+        "pragmas": [
+            "PRAGMA journal_mode=WAL;",
+            "PRAGMA synchronous=NORMAL;",         # WAL: durable at checkpoint, no fsync per commit
+            "PRAGMA mmap_size=268435456;",        # 256 MB
+            "PRAGMA cache_size=-65536;",          # 64 MB
+            "PRAGMA temp_store=MEMORY;",
+            "PRAGMA wal_autocheckpoint=1000;",    # pages
+            "PRAGMA journal_size_limit=67108864;",  # truncate WAL back to 64 MB
+            "PRAGMA busy_timeout=5000;",
+        ],
+    },
+}
+
+# Passive checkpoint cadence for long-running writers (seconds)
+CHECKPOINT_INTERVAL_SEC = 300
+
+
+# ======================================================
+# CONNECT / SCHEMA
+# ======================================================
+
+def apply_pragmas(con: sqlite3.Connection, profile: str = DEFAULT_PROFILE) -> None:
+    for pragma in PROFILES[profile]["pragmas"]:
+        con.execute(pragma)
+
+
+def connect(path: str, profile: str = DEFAULT_PROFILE, **kwargs) -> sqlite3.Connection:
+    con = sqlite3.connect(path, **kwargs)
+    apply_pragmas(con, profile)
+    return con
+
+
+def create_sensor_table(con: sqlite3.Connection, profile: str = DEFAULT_PROFILE) -> None:
+    """Create `sensor` if missing. An existing table keeps its layout."""
+    for stmt in PROFILES[profile]["schema"]:
+        con.execute(stmt)
+    con.commit()
+
+
+def detect_profile(con: sqlite3.Connection) -> Optional[str]:
+    row = con.execute(
+        "SELECT sql FROM sqlite_master WHERE type='table' AND name='sensor'"
+    ).fetchone()
+    if row is None:
+        return None
+    return "tuned" if "WITHOUT ROWID" in row[0].upper() else "legacy"
+
+
+def checkpoint(con: sqlite3.Connection, mode: str = "PASSIVE") -> tuple:
+    """
+    Run a WAL checkpoint. PASSIVE never blocks readers/writers;
+    TRUNCATE also shrinks the -wal file (needs a quiet moment).
+
+    Returns (busy, wal_pages, checkpointed_pages).
+    """
+    return con.execute(f"PRAGMA wal_checkpoint({mode});").fetchone()
+
+
+# ======================================================
+# MIGRATION
+# ======================================================
+
+def migrate(path: str, profile: str = DEFAULT_PROFILE) -> dict:
+    """
+    Rebuild `sensor` in the target profile layout (in one transaction),
+    then checkpoint/truncate the WAL and VACUUM.
+    """
+    con = sqlite3.connect(path)
+    current = detect_profile(con)
+    if current is None:
+        create_sensor_table(con, profile)
+        con.close()
+        return {"from": None, "to": profile, "rows": 0}
+    if current == profile:
+        apply_pragmas(con, profile)
+        checkpoint(con, "TRUNCATE")
+        con.close()
+        return {"from": current, "to": profile, "rows": None}
+
+    cols = ", ".join(SENSOR_COLS)
+    t0 = time.perf_counter()
+    con.execute("BEGIN IMMEDIATE")
+    con.execute("ALTER TABLE sensor RENAME TO sensor_old")
+    for idx in ("uniq_ts_dev", "idx_sensor_ts"):
+        con.execute(f"DROP INDEX IF EXISTS {idx}")
+    for stmt in PROFILES[profile]["schema"]:
+        con.execute(stmt)
+    # tuned: device_id NOT NULL; baris lama tanpa device_id ikut default ingest
+    dev = "COALESCE(device_id, 'esp32')" if profile == "tuned" else "device_id"
+    con.execute(
+        f"INSERT OR IGNORE INTO sensor ({cols}) "
+        f"SELECT ts, {dev}, temp_c, rh_pct, tvoc_ppb, eco2_ppm, dust_ugm3 "
+        "FROM sensor_old ORDER BY device_id, ts"
+    )
+    rows = con.execute("SELECT COUNT(*) FROM sensor").fetchone()[0]
+    con.execute("DROP TABLE sensor_old")
+    con.commit()
+
+    apply_pragmas(con, profile)
+    checkpoint(con, "TRUNCATE")
+    con.execute("VACUUM")
+    checkpoint(con, "TRUNCATE")
+    con.close()
+    return {"from": current, "to": profile, "rows": rows, "seconds": time.perf_counter() - t0}
+
+
+def file_sizes(path: str) -> Dict[str, int]:
+    return {
+        suffix or "db": (os.path.getsize(path + suffix) if os.path.exists(path + suffix) else 0)
+        for suffix in ("", "-wal")
+    }
+
+
+# ======================================================
+# BENCHMARK
+# ======================================================
+
+def _synthetic_rows(devices: List[str], days: int, end_ts: int):
+    start = end_ts - days * 86400
+    for ts in range(start, end_ts, 60):
+        for d in devices:
+            yield (ts, d, 28.0, 65.0, 400.0, 700.0, 0.0)
+
+
+def bench(days: int = 365, n_devices: int = 4, batch: int = 500, workdir: str = "/tmp") -> None:
+    devices = [f"esp32-{i:02d}" for i in range(1, n_devices + 1)]
+    end_ts = 1_760_000_000 - 1_760_000_000 % 60
+    sql_insert = (
+        f"INSERT OR IGNORE INTO sensor ({', '.join(SENSOR_COLS)}) VALUES ({', '.join('?' for _ in SENSOR_COLS)})"
+    )
+
+    for profile in PROFILES:
+        path = os.path.join(workdir, f"bench_sensor_{profile}.db")
+        for suffix in ("", "-wal", "-shm"):
+            if os.path.exists(path + suffix):
+                os.remove(path + suffix)
+
+        con = connect(path, profile)
+        create_sensor_table(con, profile)
+
+        # insert: one commit per `batch` rows, as the ingest writer does
+        n, t0, buf = 0, time.perf_counter(), []
+        for row in _synthetic_rows(devices, days, end_ts):
+            buf.append(row)
+            if len(buf) >= batch:
+                con.executemany(sql_insert, buf)
+                con.commit()
+                n += len(buf)
+                buf = []
+        if buf:
+            con.executemany(sql_insert, buf)
+            con.commit()
+            n += len(buf)
+        t_ins = time.perf_counter() - t0
+        checkpoint(con, "TRUNCATE")
+        con.close()
+
+        # range scans on a fresh connection (per-device, last N days)
+        con = connect(path, profile)
+        print(f"\n=== profile={profile} ===")
+        print(f"   insert: {n:,} rows in {t_ins:.1f}s → {n / t_ins:,.0f} rows/s")
+        print(f"   size  : {file_sizes(path)['db'] / 1e6:.1f} MB")
+        for label, span in (("24h", 1), ("30d", 30), ("365d", 365)):
+            span = min(span, days)
+            params = (devices[-1], end_ts - span * 86400, end_ts)
+            best_fetch = best_agg = float("inf")
+            for _ in range(3):
+                t0 = time.perf_counter()
+                rows = con.execute(
+                    "SELECT ts, temp_c, rh_pct, tvoc_ppb, eco2_ppm, dust_ugm3 FROM sensor "
+                    "WHERE device_id = ? AND ts >= ? AND ts < ? ORDER BY ts",
+                    params,
+                ).fetchall()
+                best_fetch = min(best_fetch, time.perf_counter() - t0)
+
+                # scan inside SQLite only (no Python row objects)
+                t0 = time.perf_counter()
+                con.execute(
+                    "SELECT COUNT(*), AVG(temp_c), MAX(tvoc_ppb) FROM sensor "
+                    "WHERE device_id = ? AND ts >= ? AND ts < ?",
+                    params,
+                ).fetchone()
+                best_agg = min(best_agg, time.perf_counter() - t0)
+            print(
+                f"   scan {label:>4s}: {len(rows):>8,} rows | fetch {best_fetch * 1000:8.1f} ms"
+                f" | in-db agg {best_agg * 1000:7.1f} ms"
+            )
+        con.close()
+
+
+# ======================================================
+# CLI
+# ======================================================
+
+if __name__ == "__main__":
+    import argparse
+
+    ap = argparse.ArgumentParser()
+    ap.add_argument("cmd", choices=["info", "migrate", "checkpoint", "bench"])
+    ap.add_argument("--db", default="data/sensor.db")
+    ap.add_argument("--profile", default=DEFAULT_PROFILE, choices=list(PROFILES))
+    ap.add_argument("--days", type=int, default=365)
+    ap.add_argument("--devices", type=int, default=4)
+    args = ap.parse_args()
+
+    if args.cmd == "bench":
+        bench(args.days, args.devices)
+    elif args.cmd == "migrate":
+        print("📦 Before:", file_sizes(args.db))
+        print("✅ Migrated:", migrate(args.db, args.profile))
+        print("📦 After :", file_sizes(args.db))
+    elif args.cmd == "checkpoint":
+        with sqlite3.connect(args.db) as con:
+            print("✅ Checkpoint (busy, wal_pages, done):", checkpoint(con, "TRUNCATE"))
+        print("📦 Sizes:", file_sizes(args.db))
+    else:
+        with sqlite3.connect(args.db) as con:
+            print("Profile:", detect_profile(con))
+            print("Rows   :", con.execute("SELECT COUNT(*) FROM sensor").fetchone()[0])
+        print("Sizes  :", file_sizes(args.db))
@@ -0,0 +1,217 @@
+"""
+multi_horizon.py
+================
+Fast inference for multi-horizon bundles (xgb_multi.pkl).
+
+The bundle model is a MultiOutputRegressor with one estimator per
+target/horizon (y_temp+1..+H, y_tvoc+1..+H). sklearn's own predict()
+loops over those estimators one by one and re-validates the input for
+each; here the input is wrapped in one DMatrix, the boosters are evaluated
+directly across a thread pool (XGBoost releases the GIL), and the horizon
+index maps are parsed once at load.
+
+Side effect: the model's own boosters are pinned to nthread=1 once, when
+the predictor is built (Booster.predict has no per-call thread count, and
+copying every booster would double the bundle's memory). Build one
+predictor per loaded model; a plain `model.predict` on the same model then
+also runs one thread per booster.
+
+Used by:
+- mqtt/forecast_mqtt_xgb_multi.py
+"""
+
+from __future__ import annotations
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Sequence
+
+import numpy as np
+
+# ======================================================
+# CONFIG
+# ======================================================
+
+TARGET_PREFIXES = {
+    "temp": "y_temp+",
+    "tvoc": "y_tvoc+",
+}
+
+
+# ======================================================
+# TARGET INDEX MAPS
+# ======================================================
+
+def parse_target_index(target_cols: Sequence[str], prefix: str) -> np.ndarray:
+    """
+    Column indices of `prefix` targets, ordered by horizon (+1..+H).
+    """
+    pairs = [
+        (int(c[len(prefix):]), i)
+        for i, c in enumerate(target_cols)
+        if c.startswith(prefix)
+    ]
+    pairs.sort()
+    return np.array([i for _, i in pairs], dtype=np.intp)
+
+
+def build_horizon_index(target_cols: Sequence[str]) -> Dict[str, np.ndarray]:
+    return {
+        name: parse_target_index(target_cols, prefix)
+        for name, prefix in TARGET_PREFIXES.items()
+    }
+
+
+# ======================================================
+# PREDICTOR
+# ======================================================
+
+def _resolve_jobs(n_jobs: int) -> int:
+    cpus = os.cpu_count() or 1
+    if n_jobs is None or n_jobs == 0:
+        return 1
+    if n_jobs < 0:
+        return max(1, cpus + 1 + n_jobs)
+    return min(n_jobs, cpus)
+
+
+class MultiHorizonPredictor:
+    """
+    Parallel drop-in for MultiOutputRegressor.predict().
+
+    Parameters
+    ----------
+    model : MultiOutputRegressor
+        Fitted model with `estimators_` (one per target column).
+    target_cols : list of str
+        Target column names, same order as `model.estimators_`.
+    n_jobs : int
+        Worker threads (-1 = all cores).
+
+    Notes
+    -----
+    Sets nthread=1 on the model's boosters in place (shared, not copied);
+    parallelism is across boosters, not inside one.
+    """
+
+    def __init__(self, model, target_cols: Sequence[str], n_jobs: int = -1):
+        self.model = model
+        self.target_cols = list(target_cols)
+        self.n_jobs = _resolve_jobs(n_jobs)
+        self.horizon_index = build_horizon_index(self.target_cols)
+
+        estimators = getattr(model, "estimators_", None)
+        if estimators is None:
+            raise ValueError("Model must be a fitted MultiOutputRegressor")
+
+        # XGBoost boosters → Booster.predict on a shared DMatrix (no sklearn
+        # overhead). Each booster runs single-threaded; parallelism is across
+        # boosters. nthread diset sekali di booster milik model (bukan copy:
+        # ~20k booster xgb_multi.pkl akan menggandakan memori).
+        self._boosters = []
+        for est in estimators:
+            if hasattr(est, "get_booster"):
+                booster = est.get_booster()
+                booster.set_param({"nthread": 1})
+                self._boosters.append(booster)
+            else:
+                self._boosters.append(None)
+        self._estimators = list(estimators)
+
+        # Contiguous estimator chunks, one per worker
+        n = len(self._estimators)
+        n_chunks = max(1, min(self.n_jobs, n))
+        bounds = np.linspace(0, n, n_chunks + 1, dtype=int)
+        self._chunks = [(int(a), int(b)) for a, b in zip(bounds[:-1], bounds[1:]) if b > a]
+
+    def _predict_chunk(self, X: np.ndarray, dmat, out: np.ndarray, start: int, stop: int) -> None:
+        for j in range(start, stop):
+            booster = self._boosters[j]
+            if booster is not None:
+                # columns are already in training order (FEATS)
+                out[:, j] = booster.predict(dmat, validate_features=False)
+            else:
+                out[:, j] = self._estimators[j].predict(X)
+
+    def predict(self, X) -> np.ndarray:
+        """
+        Returns
+        -------
+        np.ndarray
+            Shape: (n_rows, n_targets), same layout as model.predict(X)
+        """
+        X = np.ascontiguousarray(np.asarray(X, dtype=np.float32))
+        out = np.empty((X.shape[0], len(self._estimators)), dtype=np.float32)
+
+        dmat = None
+        if any(b is not None for b in self._boosters):
+            import xgboost as xgb
+            dmat = xgb.DMatrix(X, nthread=1)
+
+        if len(self._chunks) == 1:
+            self._predict_chunk(X, dmat, out, *self._chunks[0])
+            return out
+
+        with ThreadPoolExecutor(max_workers=len(self._chunks)) as pool:
+            futures = [pool.submit(self._predict_chunk, X, dmat, out, a, b) for a, b in self._chunks]
+            for f in futures:
+                f.result()
+        return out
+
+    def predict_horizons(self, X) -> Dict[str, np.ndarray]:
+        """
+        Predict one row and split per target, ordered by horizon.
+
+        Returns
+        -------
+        dict
+            {"temp": array(H), "tvoc": array(H)}
+        """
+        yhat = self.predict(X).reshape(-1)
+        return {name: yhat[idx] for name, idx in self.horizon_index.items()}
+
+
+# ======================================================
+# SELF TEST / BENCHMARK
+# ======================================================
+
+if __name__ == "__main__":
+    import argparse
+
+    from sklearn.multioutput import MultiOutputRegressor
+    from xgboost import XGBRegressor
+
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--H", type=int, default=1440)
+    ap.add_argument("--features", type=int, default=200)
+    ap.add_argument("--n-estimators", type=int, default=80)
+    ap.add_argument("--jobs", type=int, default=-1)
+    args = ap.parse_args()
+
+    rng = np.random.default_rng(42)
+    X = rng.normal(size=(256, args.features)).astype(np.float32)
+    target_cols: List[str] = []
+    for h in range(1, args.H + 1):
+        target_cols.extend([f"y_temp+{h}", f"y_tvoc+{h}"])
+
+    # Fit one booster and reuse it for every target so the synthetic bundle builds fast
+    proto = XGBRegressor(n_estimators=args.n_estimators, max_depth=4, tree_method="hist", n_jobs=1)
+    proto.fit(X, rng.normal(size=len(X)))
+    model = MultiOutputRegressor(proto)
+    model.estimators_ = [proto] * len(target_cols)
+
+    row = X[[-1]]
+    predictor = MultiHorizonPredictor(model, target_cols, n_jobs=args.jobs)
+
+    t0 = time.perf_counter()
+    ref = model.predict(row)
+    t_seq = time.perf_counter() - t0
+
+    t0 = time.perf_counter()
+    fast = predictor.predict(row)
+    t_fast = time.perf_counter() - t0
+
+    assert np.allclose(ref, fast, atol=1e-5)
+    print(f"✅ H={args.H} boosters={len(target_cols)} workers={predictor.n_jobs}")
+    print(f"   sklearn predict : {t_seq:.3f}s")
+    print(f"   parallel predict: {t_fast:.3f}s")
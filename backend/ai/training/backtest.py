@@ -0,0 +1,778 @@
+#!/usr/bin/env python3
+"""
+backtest.py
+===========
+Walk-forward (rolling-origin) backtest for any model bundle in ai/models/.
+
+Per device, the last FOLDS × TEST_DAYS of history are cut into
+consecutive test windows. For every fold the bundle's model is re-fitted
+(sklearn `clone`, same hyper-parameters, same scaler type) on the history
+before the window (expanding, or the last --train-days), then forecasts
+are issued from every --stride origin inside the window and scored
+against what actually happened. --refit-every N re-uses one fit for N
+consecutive folds (still trained strictly before the first of them),
+--param overrides hyper-parameters of the re-fits (e.g. fewer trees for a
+quick comparison), --no-refit scores the saved model as-is (fast, but
+optimistic on windows it was trained on).
+
+Bundle kinds (detected from the bundle keys):
+    features    xgb_hourly_final.pkl (train_from_db.py) and the
+                train_rf_hourly.py bundle: hourly build_features() rows,
+                1-step model, rolled out recursively
+    window      rf_hourly_1step.pkl (predict_hourly_recursive.py):
+                flattened 24h per-column windows + hour sin/cos, recursive
+    window_agg  rf_hourly_fixed.pkl (train_predict_hourly_fix.py): hourly
+                mean / max / p90 aggregates, flattened windows, recursive
+    multi       xgb_multi.pkl (train_xgb_multi.py): minute lag features,
+                direct y_temp+h / y_tvoc+h targets (only the requested
+                horizons are re-fitted)
+
+Speed:
+- (device, fold) tasks run in a process pool; models are forced to one
+  thread per worker so the pool does not oversubscribe the CPU
+- features are built once per fold as numpy gathers at only the rows
+  needed (training rows + origins) instead of the per-row Python loops
+  of the training scripts
+- recursive rollouts advance ALL origins of a fold together: one
+  predict() call per step, not per origin and step
+
+Report: MAE per bundle / target / horizon (plus the persistence baseline,
+"value at the origin"), optionally per device and fold (--out CSV).
+
+Run (dari folder backend/):
+    python -m ai.training.backtest
+    python -m ai.training.backtest --bundle rf_hourly_fixed xgb_hourly_final --folds 12 --test-days 7
+    python -m ai.training.backtest --data ai/data/sensor_dataset --last-days 365 --out /tmp/backtest.csv
+"""
+
+from __future__ import annotations
+import argparse
+import glob
+import os
+import sys
+import time
+import warnings
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from typing import Dict, List, Optional, Sequence
+
+import joblib
+import numpy as np
+import pandas as pd
+from sklearn.base import clone
+
+# PATH FIX (allow ai.*)
+sys.path.append(str(Path(__file__).resolve().parents[2]))  # backend/
+
+from ai.db.sensor_dataset import load_sensor_frame
+from ai.features.build_features import BASE_COLS, LAGS, ROLL_WINDOWS, build_features, get_feature_names
+
+# ======================================================
+# CONFIG
+# ======================================================
+
+AI_DIR = Path(__file__).resolve().parents[1]
+MODELS_DIR = AI_DIR / "models"
+DATA_PATH = os.getenv("SENSOR_DATA", str(AI_DIR / "data" / "sensor.csv"))
+
+FOLDS = int(os.getenv("BACKTEST_FOLDS", "8"))
+TEST_DAYS = float(os.getenv("BACKTEST_TEST_DAYS", "7"))
+TRAIN_DAYS = float(os.getenv("BACKTEST_TRAIN_DAYS", "0"))        # 0 = expanding window
+STRIDE = os.getenv("BACKTEST_STRIDE", "6h")                     # jarak antar origin
+HORIZONS = os.getenv("BACKTEST_HORIZONS", "1h,3h,6h,12h,24h,72h,168h")
+TRAIN_STRIDE_MIN = int(os.getenv("BACKTEST_TRAIN_STRIDE_MIN", "10"))  # multi: 1 dari N baris menit
+REFIT_EVERY = int(os.getenv("BACKTEST_REFIT_EVERY", "1"))       # refit tiap N fold
+JOBS = int(os.getenv("BACKTEST_JOBS", str(os.cpu_count() or 1)))
+
+MIN_TRAIN_ROWS = 48
+
+
+# ======================================================
+# HELPERS
+# ======================================================
+
+def _fill_empty(df: pd.DataFrame) -> pd.DataFrame:
+    """Columns without any value → 0.0 (the training scripts fill missing columns with 0)."""
+    empty = [c for c in df.columns if df[c].isna().all()]
+    return df.fillna({c: 0.0 for c in empty}) if empty else df
+
+
+def _minute_grid(raw: pd.DataFrame, cols: Sequence[str]) -> pd.DataFrame:
+    """Raw rows → regular 1-minute grid (mean per minute, NaN where missing)."""
+    df = _fill_empty(raw.reindex(columns=list(cols)).astype("float64"))
+    df = df.groupby(df.index.floor("1min")).mean()
+    return df.asfreq("1min")
+
+
+def _hour_features(times: pd.DatetimeIndex) -> np.ndarray:
+    hour = times.hour.to_numpy(dtype=np.float64)
+    return np.column_stack([np.sin(2 * np.pi * hour / 24), np.cos(2 * np.pi * hour / 24)])
+
+
+def _single_thread(model) -> None:
+    """n_jobs=1 on the model (and fitted sub-estimators): parallelism is the pool."""
+    if model is None or not hasattr(model, "get_params"):
+        return
+    fixed = {k: 1 for k in model.get_params() if k.endswith("n_jobs")}
+    if fixed:
+        model.set_params(**fixed)
+    for est in getattr(model, "estimators_", None) or []:
+        if hasattr(est, "get_params"):
+            _single_thread(est)
+
+
+def _set_params(model, params: dict) -> None:
+    """Hyper-parameter overrides; `n_estimators` also reaches `estimator__n_estimators`."""
+    if not params:
+        return
+    valid = model.get_params()
+    fixed = {}
+    for k, v in params.items():
+        if k in valid:
+            fixed[k] = v
+        elif f"estimator__{k}" in valid:
+            fixed[f"estimator__{k}"] = v
+        else:
+            raise ValueError(f"unknown parameter for {type(model).__name__}: {k}")
+    model.set_params(**fixed)
+
+
+def parse_params(items: Optional[Sequence[str]]) -> dict:
+    """['n_estimators=50', 'max_depth=6'] → {"n_estimators": 50, "max_depth": 6}."""
+    out = {}
+    for item in items or []:
+        k, _, v = item.partition("=")
+        for cast in (int, float):
+            try:
+                v = cast(v)
+                break
+            except ValueError:
+                continue
+        out[k.strip()] = v
+    return out
+
+
+def _windows(values: np.ndarray, length: int) -> np.ndarray:
+    """(n, C) → view (n-length+1, length, C); row k = values[k:k+length]."""
+    return np.lib.stride_tricks.sliding_window_view(values, length, axis=0).transpose(0, 2, 1)
+
+
+def parse_horizons(spec: str) -> List[tuple]:
+    """'1h,24h,30min' → [(label, Timedelta), ...] sorted by length."""
+    out = []
+    for part in str(spec).split(","):
+        part = part.strip()
+        if part:
+            out.append((part, pd.Timedelta(part)))
+    return sorted(out, key=lambda x: x[1])
+
+
+# ======================================================
+# BUNDLE KINDS
+# ======================================================
+
+class _Kind:
+    """
+    Adapter between a saved bundle and the backtest loop.
+
+    prepare()  : raw device rows → regular grid frame at `freq`
+    train_xy() : training matrix for rows whose target lies before `cut`
+    forecast() : predictions (n_origins, n_horizons, n_targets)
+    actual()   : observed values at the same shape (NaN = not scored)
+    """
+
+    name = ""
+    freq = pd.Timedelta("1h")
+    recursive = True
+    max_step = None   # direct model: horizon terjauh yang punya estimator
+
+    def __init__(self, bundle: dict):
+        self.bundle = bundle
+        self.scaler = bundle.get("scaler")
+        self.params: dict = {}   # --param overrides (refit only)
+
+    # ---- model --------------------------------------------------------
+    def fit(self, X: np.ndarray, Y: np.ndarray):
+        model = clone(self.bundle["model"])
+        _set_params(model, self.params)
+        _single_thread(model)
+        scaler = clone(self.scaler) if self.scaler is not None else None
+        if scaler is not None:
+            X = scaler.fit_transform(X)
+        model.fit(X, Y)
+        return model, scaler
+
+    def saved_model(self):
+        model = self.bundle["model"]
+        _single_thread(model)
+        return model, self.scaler
+
+    @staticmethod
+    def _predict(model, scaler, X: np.ndarray) -> np.ndarray:
+        if scaler is not None:
+            X = scaler.transform(X)
+        return np.asarray(model.predict(X), dtype=np.float64).reshape(len(X), -1)
+
+    # ---- scoring ------------------------------------------------------
+    def actual(self, frame: pd.DataFrame, origins: np.ndarray, steps: np.ndarray) -> np.ndarray:
+        vals = frame[self.target_cols].to_numpy(dtype=np.float64)
+        pos = origins[:, None] + steps[None, :]
+        ok = pos < len(vals)
+        out = np.full(pos.shape + (len(self.target_cols),), np.nan)
+        out[ok] = vals[pos[ok]]
+        return out
+
+    def naive(self, frame: pd.DataFrame, origins: np.ndarray, steps: np.ndarray) -> np.ndarray:
+        vals = frame[self.target_cols].to_numpy(dtype=np.float64)
+        return np.repeat(vals[origins][:, None, :], len(steps), axis=1)
+
+    # ---- recursive rollout (1-step models) ----------------------------
+    def forecast(self, model, scaler, frame: pd.DataFrame, origins: np.ndarray, steps: np.ndarray) -> np.ndarray:
+        state = self._state(frame)
+        hist = _windows(state, self.history)[origins - self.history + 1].copy()   # (n_o, L, C)
+        t0 = frame.index[origins]
+        tgt_pos = [self.state_cols.index(c) for c in self.feedback_cols]
+
+        out = np.full((len(origins), len(steps), len(self.target_cols)), np.nan)
+        want = {int(s): k for k, s in enumerate(steps)}
+        for s in range(int(steps.max())):
+            X = self._rows(hist, t0 + s * self.freq)
+            pred = self._predict(model, scaler, X)        # nilai di origin + s + 1
+            if s + 1 in want:
+                out[:, want[s + 1], :] = pred
+            new = hist[:, -1, :].copy()                   # kolom non-target: persistence
+            new[:, tgt_pos] = pred[:, : len(tgt_pos)]
+            self._feedback(new, pred)
+            hist = np.concatenate([hist[:, 1:, :], new[:, None, :]], axis=1)
+        return out
+
+    def _state(self, frame: pd.DataFrame) -> np.ndarray:
+        return frame[self.state_cols].to_numpy(dtype=np.float64)
+
+    def _feedback(self, new: np.ndarray, pred: np.ndarray) -> None:
+        pass
+
+
+class FeaturesKind(_Kind):
+    """build_features() hourly rows → next hour (train_from_db / train_rf_hourly)."""
+
+    name = "features"
+
+    def __init__(self, bundle: dict):
+        super().__init__(bundle)
+        self.target_cols = list(bundle.get("target_cols") or bundle.get("targets"))
+        self.state_cols = list(BASE_COLS)
+        self.feedback_cols = self.target_cols
+        self.history = max(LAGS + ROLL_WINDOWS) + 1
+        # train_rf_hourly: agregasi jam "preserve spikes" (tvoc max), sisanya mean
+        self.tvoc_max = "targets" in bundle and "target_cols" not in bundle
+
+    def prepare(self, raw: pd.DataFrame) -> pd.DataFrame:
+        if self.tvoc_max:
+            dfm = _minute_grid(raw, BASE_COLS).ffill(limit=60)
+            dfh = dfm.resample("1h").mean()
+            dfh["tvoc_ppb"] = dfm["tvoc_ppb"].resample("1h").max()
+        else:
+            df = _fill_empty(raw.reindex(columns=BASE_COLS).astype("float64"))
+            dfh = df.resample("1h").mean()
+        return dfh.asfreq("1h")
+
+    def _state(self, frame: pd.DataFrame) -> np.ndarray:
+        return frame[BASE_COLS].ffill().bfill().to_numpy(dtype=np.float64)   # = build_features fill
+
+    def train_xy(self, frame: pd.DataFrame, start: int, cut: int):
+        part = frame.iloc[start:cut].dropna(how="all")
+        if len(part) < MIN_TRAIN_ROWS:
+            return None, None
+        X = build_features(part)
+        y = part[self.target_cols].reindex(X.index).shift(-1)
+        ok = y.notna().all(axis=1).to_numpy() & np.isfinite(X.to_numpy()).all(axis=1)
+        return X.to_numpy(dtype=np.float64)[ok], y.to_numpy(dtype=np.float64)[ok]
+
+    def _rows(self, hist: np.ndarray, times: pd.DatetimeIndex) -> np.ndarray:
+        """Vectorized build_features() rows for the LAST entry of each history."""
+        n, _, C = hist.shape
+        cur = hist[:, -1, :]
+        lags = np.stack([hist[:, -1 - l, :] for l in LAGS], axis=2)          # (n, C, L)
+        rolls = []
+        for w in ROLL_WINDOWS:
+            win = hist[:, -w:, :]
+            rolls.append(np.stack([win.mean(axis=1), win.std(axis=1, ddof=1)], axis=2))
+        rolls = np.stack(rolls, axis=2)                                     # (n, C, W, 2)
+
+        hour = times.hour.to_numpy(dtype=np.float64)
+        dow = times.dayofweek.to_numpy(dtype=np.float64)
+        cyc = np.column_stack([
+            np.sin(2 * np.pi * hour / 24), np.cos(2 * np.pi * hour / 24),
+            np.sin(2 * np.pi * dow / 7), np.cos(2 * np.pi * dow / 7),
+        ])
+        return np.hstack([cur, lags.reshape(n, -1), rolls.reshape(n, -1), cyc])
+
+
+class WindowKind(_Kind):
+    """Flattened per-column hourly windows (predict_hourly_recursive.py)."""
+
+    name = "window"
+
+    def __init__(self, bundle: dict):
+        super().__init__(bundle)
+        self.history = int(bundle.get("lag_hours", 24))
+        self.state_cols = list(bundle.get("use_cols") or BASE_COLS)
+        self.target_cols = list(bundle.get("target_cols") or ["temp_c", "tvoc_ppb"])
+        self.feedback_cols = self.target_cols
+
+    def prepare(self, raw: pd.DataFrame) -> pd.DataFrame:
+        dfm = _minute_grid(raw, self.state_cols).interpolate(limit_direction="both")
+        return dfm.resample("1h").mean().asfreq("1h")
+
+    def _flatten(self, win: np.ndarray) -> np.ndarray:
+        n, L, C = win.shape
+        return win.transpose(0, 2, 1).reshape(n, C * L)   # per kolom: lag berurutan
+
+    def train_xy(self, frame: pd.DataFrame, start: int, cut: int):
+        # sama seperti skrip training: window i-L..i-1, jam dari baris i, target baris i+1
+        L = self.history
+        i = np.arange(max(start + L, L), cut - 1)
+        if len(i) < MIN_TRAIN_ROWS:
+            return None, None
+        state = self._state(frame)
+        X = np.hstack([self._flatten(_windows(state, L)[i - L]), _hour_features(frame.index[i])])
+        Y = frame[self.target_cols].to_numpy(dtype=np.float64)[i + 1]
+        ok = np.isfinite(X).all(axis=1) & np.isfinite(Y).all(axis=1)
+        return X[ok], Y[ok]
+
+    def _rows(self, hist: np.ndarray, times: pd.DatetimeIndex) -> np.ndarray:
+        # sama seperti loop forecast: window berakhir di origin, jam origin + s
+        return np.hstack([self._flatten(hist), _hour_features(times)])
+
+
+class WindowAggKind(WindowKind):
+    """Hourly mean/max/p90 aggregates, row-major windows (train_predict_hourly_fix.py)."""
+
+    name = "window_agg"
+
+    def __init__(self, bundle: dict):
+        _Kind.__init__(self, bundle)
+        self.history = int(bundle.get("lag_hours", 24))
+        self.state_cols = list(bundle["cols_feats"])
+        self.target_cols = ["temp_mean", "tvoc_max"]
+        self.feedback_cols = self.target_cols
+
+    def prepare(self, raw: pd.DataFrame) -> pd.DataFrame:
+        dfm = _minute_grid(raw, BASE_COLS).ffill(limit=60).bfill(limit=60)
+        r = dfm.resample("1h")
+        agg = pd.DataFrame({
+            "temp_mean": r["temp_c"].mean(),
+            "rh_mean": r["rh_pct"].mean(),
+            "eco2_mean": r["eco2_ppm"].mean(),
+            "dust_mean": r["dust_ugm3"].mean(),
+            "tvoc_max": r["tvoc_ppb"].max(),
+            "tvoc_p90": r["tvoc_ppb"].quantile(0.90),
+        })
+        return agg.asfreq("1h")
+
+    def _flatten(self, win: np.ndarray) -> np.ndarray:
+        n, L, C = win.shape
+        return win.reshape(n, L * C)   # window[cols].values.flatten(): per jam semua kolom
+
+    def _feedback(self, new: np.ndarray, pred: np.ndarray) -> None:
+        if "tvoc_p90" in self.state_cols:
+            new[:, self.state_cols.index("tvoc_p90")] = pred[:, 1]   # p90 ≈ max prediksi (sama seperti skrip)
+
+
+class MultiKind(_Kind):
+    """Direct multi-horizon minute model (train_xgb_multi.py)."""
+
+    name = "multi"
+    freq = pd.Timedelta("1min")
+    recursive = False
+
+    PREFIX = {"temp_c": "y_temp+", "tvoc_ppb": "y_tvoc+"}
+
+    def __init__(self, bundle: dict):
+        super().__init__(bundle)
+        self.lags = [int(l) for l in bundle.get("lag_minutes", [])]
+        self.base_cols = list(bundle.get("base_cols") or BASE_COLS)
+        self.target_cols = ["temp_c", "tvoc_ppb"]
+        self.history = (max(self.lags) if self.lags else 0) + 1
+        self.all_targets = list(bundle["target_cols"])
+        self.max_step = int(bundle.get("H") or max(int(c.rsplit("+", 1)[1]) for c in self.all_targets))
+
+        names = list(self.base_cols)
+        names += [f"{c}_lag{l}" for c in self.base_cols for l in self.lags]
+        names += ["sin_day", "cos_day"]
+        feats = list(bundle.get("features") or names)
+        self._order = np.array([names.index(f) for f in feats], dtype=np.intp)
+
+    def prepare(self, raw: pd.DataFrame) -> pd.DataFrame:
+        return _minute_grid(raw, self.base_cols).interpolate(limit_direction="both")
+
+    def _rows_at(self, frame: pd.DataFrame, pos: np.ndarray) -> np.ndarray:
+        V = frame[self.base_cols].to_numpy(dtype=np.float64)
+        blocks = [V[pos]]
+        for c in range(V.shape[1]):
+            for l in self.lags:
+                p = pos - l
+                col = np.full(len(pos), np.nan)
+                col[p >= 0] = V[p[p >= 0], c]
+                blocks.append(col[:, None])
+        blocks.append(_hour_features(frame.index[pos]))
+        return np.hstack(blocks)[:, self._order]
+
+    def _columns(self, steps: np.ndarray) -> List[List[Optional[int]]]:
+        """Estimator index per (target, step); None = horizon beyond the bundle's H."""
+        return [
+            [self.all_targets.index(f"{self.PREFIX[t]}{int(s)}") if f"{self.PREFIX[t]}{int(s)}" in self.all_targets else None
+             for s in steps]
+            for t in self.target_cols
+        ]
+
+    # refit: hanya estimator untuk horizon yang diminta
+    def fit_direct(self, frame: pd.DataFrame, start: int, cut: int, steps: np.ndarray):
+        cols = self._columns(steps)
+        proto = self.bundle["model"]
+        proto = getattr(proto, "estimator", proto)
+        vals = frame[self.target_cols].to_numpy(dtype=np.float64)
+
+        models, train_rows = {}, 0
+        for t, row in enumerate(cols):
+            for k, j in enumerate(row):
+                if j is None:
+                    continue
+                s = int(steps[k])
+                pos = np.arange(max(start, self.history), cut - s, TRAIN_STRIDE_MIN)
+                if len(pos) < MIN_TRAIN_ROWS:
+                    continue
+                X = self._rows_at(frame, pos)
+                y = vals[pos + s, t]
+                ok = np.isfinite(X).all(axis=1) & np.isfinite(y)
+                est = clone(proto)
+                _set_params(est, self.params)
+                _single_thread(est)
+                est.fit(X[ok], y[ok])
+                models[j] = est
+                train_rows = max(train_rows, int(ok.sum()))
+        return models, train_rows
+
+    def saved_direct(self):
+        ests = list(self.bundle["model"].estimators_)
+        for e in ests:
+            _single_thread(e)
+        return dict(enumerate(ests))
+
+    def forecast_direct(self, models: dict, frame: pd.DataFrame, origins: np.ndarray, steps: np.ndarray) -> np.ndarray:
+        X = self._rows_at(frame, origins)
+        out = np.full((len(origins), len(steps), len(self.target_cols)), np.nan)
+        for t, row in enumerate(self._columns(steps)):
+            for k, j in enumerate(row):
+                if j is not None and j in models:
+                    out[:, k, t] = models[j].predict(X)
+        return out
+
+
+def detect_kind(bundle: dict) -> _Kind:
+    if not isinstance(bundle, dict) or "model" not in bundle:
+        raise ValueError("not a model bundle (dict with 'model')")
+    if any(str(c).startswith("y_") for c in bundle.get("target_cols", [])):
+        return MultiKind(bundle)
+    if "cols_feats" in bundle:
+        return WindowAggKind(bundle)
+    if "use_cols" in bundle:
+        return WindowKind(bundle)
+    feats = bundle.get("feature_names") or bundle.get("features")
+    if feats and list(feats) == get_feature_names():
+        return FeaturesKind(bundle)
+    raise ValueError("unknown bundle layout: " + ", ".join(sorted(bundle)))
+
+
+# ======================================================
+# WORKER
+# ======================================================
+
+_worker_kind: Optional[_Kind] = None
+
+
+def _init_worker(bundle_path: str, params: Optional[dict] = None) -> None:
+    global _worker_kind
+    warnings.simplefilter("ignore")   # InconsistentVersionWarning dll. tiap worker
+    _worker_kind = detect_kind(joblib.load(bundle_path))
+    _worker_kind.params = dict(params or {})
+
+
+def _score(kind: _Kind, frame: pd.DataFrame, origins: np.ndarray, steps: np.ndarray, pred: np.ndarray) -> np.ndarray:
+    """(3, n_horizons, n_targets): sum |e|, sum |e_naive| (value at origin), n."""
+    act = kind.actual(frame, origins, steps)
+    naive = kind.naive(frame, origins, steps)
+    ok = np.isfinite(pred) & np.isfinite(act) & np.isfinite(naive)
+    return np.stack([
+        np.where(ok, np.abs(pred - act), 0.0).sum(axis=0),
+        np.where(ok, np.abs(naive - act), 0.0).sum(axis=0),
+        ok.sum(axis=0).astype(np.float64),
+    ])
+
+
+def run_task(task: dict) -> List[dict]:
+    """
+    One device, one or more consecutive folds: fit once on the history
+    before the FIRST fold (no leakage into any of them), then forecast
+    and score every fold of the group.
+    """
+    kind = _worker_kind
+    frame, steps = task["frame"], task["steps"]
+    first_cut = task["windows"][0][1]
+    t0 = time.perf_counter()
+
+    train_rows = 0
+    if isinstance(kind, MultiKind):
+        if task["refit"]:
+            models, train_rows = kind.fit_direct(frame, task["start"], first_cut, steps)
+        else:
+            models = kind.saved_direct()
+        predict = lambda o: kind.forecast_direct(models, frame, o, steps)
+    else:
+        model = scaler = None
+        if task["refit"]:
+            X, Y = kind.train_xy(frame, task["start"], first_cut)
+            if X is not None and len(X) >= MIN_TRAIN_ROWS:
+                model, scaler = kind.fit(X, Y)
+                train_rows = int(len(X))
+        else:
+            model, scaler = kind.saved_model()
+        predict = lambda o: kind.forecast(model, scaler, frame, o, steps)
+    t_fit = time.perf_counter() - t0
+
+    results = []
+    for fold, cut, end in task["windows"]:
+        origins = np.arange(cut, end, task["stride"])
+        origins = origins[origins >= kind.history - 1]
+        r = {"device_id": task["device_id"], "fold": fold, "train_rows": train_rows,
+             "origins": int(len(origins)), "sums": None, "fit_seconds": t_fit}
+        fitted = not task["refit"] or train_rows > 0
+        if len(origins) and fitted:
+            r["sums"] = _score(kind, frame, origins, steps, predict(origins))
+        results.append(r)
+    return results
+
+
+# ======================================================
+# DRIVER
+# ======================================================
+
+def _tasks(kind: _Kind, frames: Dict[str, pd.DataFrame], steps: np.ndarray, stride: int,
+           folds: int, test_days: float, train_days: float, refit: bool,
+           refit_every: int = 1) -> List[dict]:
+    test_len = int(round(pd.Timedelta(days=test_days) / kind.freq))
+    train_len = int(round(pd.Timedelta(days=train_days) / kind.freq)) if train_days > 0 else 0
+    context = kind.history + int(steps.max())
+    group = max(1, refit_every) if refit else folds   # tanpa refit: semua fold satu task
+
+    tasks = []
+    for dev, frame in frames.items():
+        # fold terakhir berakhir max-horizon sebelum data habis → semua horizon
+        # dinilai pada origin yang sama
+        n = len(frame)
+        last = n - int(steps.max())
+        windows = []
+        for k in range(folds):
+            cut = last - (folds - k) * test_len
+            if cut > kind.history:
+                windows.append((k, cut, cut + test_len))
+
+        for g in range(0, len(windows), group):
+            part = windows[g:g + group]
+            first_cut, last_end = part[0][1], part[-1][2]
+            start = max(0, first_cut - train_len) if train_len else 0
+            # kirim hanya potongan yang dibutuhkan (train + test + horizon)
+            lo = start if refit else max(0, first_cut - context)
+            hi = min(n, last_end + int(steps.max()))
+            tasks.append({
+                "device_id": dev,
+                "frame": frame.iloc[lo:hi],
+                "start": start - lo,
+                "windows": [(k, cut - lo, end - lo) for k, cut, end in part],
+                "steps": steps, "stride": stride, "refit": refit,
+                "cost": first_cut - start,
+            })
+
+    # training terbesar dulu → pool lebih seimbang di akhir
+    tasks.sort(key=lambda t: -t["cost"])
+    return tasks
+
+
+def backtest_bundle(
+    bundle_path: str,
+    raw: pd.DataFrame,
+    horizons: Sequence[tuple],
+    folds: int = FOLDS,
+    test_days: float = TEST_DAYS,
+    train_days: float = TRAIN_DAYS,
+    stride: str = STRIDE,
+    refit: bool = True,
+    refit_every: int = REFIT_EVERY,
+    params: Optional[dict] = None,
+    jobs: int = JOBS,
+) -> dict:
+    """
+    Walk-forward backtest of one bundle on `raw` (ts-indexed sensor rows,
+    optional device_id column).
+
+    Returns {"kind", "summary" (DataFrame per target/horizon),
+             "folds" (DataFrame per device/fold/target/horizon), "seconds"}.
+    """
+    t0 = time.perf_counter()
+    with warnings.catch_warnings():
+        warnings.simplefilter("ignore")
+        kind = detect_kind(joblib.load(bundle_path))
+
+    keep = [(label, td) for label, td in horizons if td >= kind.freq and td % kind.freq == pd.Timedelta(0)]
+    if kind.max_step:
+        keep = [(label, td) for label, td in keep if td / kind.freq <= kind.max_step]
+    if not keep:
+        raise ValueError(f"no horizon fits the bundle (step {kind.freq}, max {kind.max_step or '-'} steps)")
+    labels = [label for label, _ in keep]
+    steps = np.array([int(td / kind.freq) for _, td in keep], dtype=np.int64)
+    stride_steps = max(1, int(pd.Timedelta(stride) / kind.freq))
+
+    if "device_id" in raw.columns:
+        groups = {str(d): g.drop(columns=["device_id"]) for d, g in raw.groupby("device_id", sort=True)}
+    else:
+        groups = {"all": raw}
+    frames = {d: kind.prepare(g.sort_index()) for d, g in groups.items()}
+    t_prep = time.perf_counter() - t0
+
+    tasks = _tasks(kind, frames, steps, stride_steps, folds, test_days, train_days, refit, refit_every)
+    if not tasks:
+        raise RuntimeError("not enough history for a single fold (reduce --folds / --test-days)")
+
+    workers = max(1, min(jobs, len(tasks)))
+    if workers == 1:
+        _init_worker(bundle_path, params)
+        results = [r for t in tasks for r in run_task(t)]
+    else:
+        with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=(bundle_path, params)) as pool:
+            results = [r for rs in pool.map(run_task, tasks) for r in rs]
+
+    rows = []
+    for r in results:
+        if r["sums"] is None:
+            continue
+        for hi, label in enumerate(labels):
+            for ti, target in enumerate(kind.target_cols):
+                s_abs, s_naive, n = r["sums"][:, hi, ti]
+                rows.append({
+                    "device_id": r["device_id"], "fold": r["fold"], "target": target,
+                    "horizon": label, "step": int(steps[hi]), "n": int(n),
+                    "sum_abs": s_abs, "sum_abs_naive": s_naive, "train_rows": r["train_rows"],
+                })
+    per_fold = pd.DataFrame(rows)
+    if per_fold.empty:
+        raise RuntimeError("no fold produced a scored forecast")
+    per_fold = per_fold.sort_values(["device_id", "fold", "target", "step"], ignore_index=True)
+
+    per_fold["mae"] = per_fold["sum_abs"] / per_fold["n"].where(per_fold["n"] > 0)
+    per_fold["mae_naive"] = per_fold["sum_abs_naive"] / per_fold["n"].where(per_fold["n"] > 0)
+
+    summary = per_fold.groupby(["target", "step", "horizon"], sort=True)[["sum_abs", "sum_abs_naive", "n"]].sum()
+    summary["mae"] = summary["sum_abs"] / summary["n"].where(summary["n"] > 0)
+    summary["mae_naive"] = summary["sum_abs_naive"] / summary["n"].where(summary["n"] > 0)
+    summary = summary.reset_index()[["target", "horizon", "mae", "mae_naive", "n"]]
+
+    return {
+        "kind": kind.name,
+        "summary": summary,
+        "folds": per_fold.drop(columns=["sum_abs", "sum_abs_naive"]),
+        "tasks": len(tasks),
+        "fold_runs": len(results),
+        "workers": workers,
+        "prep_seconds": t_prep,
+        "seconds": time.perf_counter() - t0,
+    }
+
+
+def _resolve_bundles(names: Optional[Sequence[str]]) -> List[str]:
+    if not names:
+        return sorted(glob.glob(str(MODELS_DIR / "*.pkl")))
+    out = []
+    for n in names:
+        p = n if os.path.exists(n) else str(MODELS_DIR / (n if n.endswith(".pkl") else f"{n}.pkl"))
+        if not os.path.exists(p):
+            raise FileNotFoundError(f"❌ bundle not found: {n}")
+        out.append(p)
+    return out
+
+
+# ======================================================
+# MAIN
+# ======================================================
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--bundle", nargs="*", default=None, help="name or path (default: every *.pkl in ai/models)")
+    ap.add_argument("--data", default=DATA_PATH, help="CSV atau folder dataset Parquet")
+    ap.add_argument("--device", default=None)
+    ap.add_argument("--last-days", type=float, default=365)
+    ap.add_argument("--folds", type=int, default=FOLDS)
+    ap.add_argument("--test-days", type=float, default=TEST_DAYS)
+    ap.add_argument("--train-days", type=float, default=TRAIN_DAYS, help="0 = expanding window")
+    ap.add_argument("--stride", default=STRIDE, help="jarak antar origin forecast (e.g. 6h)")
+    ap.add_argument("--horizons", default=HORIZONS)
+    ap.add_argument("--no-refit", action="store_true", help="score the saved model without re-fitting per fold")
+    ap.add_argument("--refit-every", type=int, default=REFIT_EVERY,
+                    help="fit once per N consecutive folds (trained before the first of them)")
+    ap.add_argument("--param", action="append", default=[],
+                    help="hyper-parameter override for re-fits, e.g. --param n_estimators=50")
+    ap.add_argument("--jobs", type=int, default=JOBS)
+    ap.add_argument("--out", default=None, help="CSV with MAE per bundle/device/fold/target/horizon")
+    args = ap.parse_args()
+
+    bundles = _resolve_bundles(args.bundle)
+    horizons = parse_horizons(args.horizons)
+
+    print("=" * 70)
+    print("🔁 WALK-FORWARD BACKTEST")
+    print("=" * 70)
+    raw = load_sensor_frame(args.data, device_id=args.device, last_days=args.last_days)
+    n_dev = raw["device_id"].nunique() if "device_id" in raw.columns else 1
+    print(f"📂 {args.data}: {len(raw):,} rows, {n_dev} device(s), {raw.index.min()} → {raw.index.max()}")
+    print(f"   folds={args.folds} × {args.test_days:g}d, train={'expanding' if args.train_days <= 0 else f'{args.train_days:g}d'}, "
+          f"stride={args.stride}, refit={'no' if args.no_refit else f'every {args.refit_every} fold(s)'}, "
+          f"jobs={args.jobs}" + (f", params={parse_params(args.param)}" if args.param else ""))
+
+    reports = []
+    summaries = {}
+    for path in bundles:
+        name = Path(path).stem
+        try:
+            res = backtest_bundle(
+                path, raw, horizons,
+                folds=args.folds, test_days=args.test_days, train_days=args.train_days,
+                stride=args.stride, refit=not args.no_refit, refit_every=args.refit_every,
+                params=parse_params(args.param), jobs=args.jobs,
+            )
+        except Exception as e:
+            print(f"⚠️ {name}: skipped ({e})")
+            continue
+
+        print(f"\n📊 {name} [{res['kind']}] — {res['fold_runs']} folds×devices, {res['tasks']} tasks "
+              f"on {res['workers']} workers, "
+              f"{res['seconds']:.1f}s (prep {res['prep_seconds']:.1f}s)")
+        table = res["summary"].pivot(index="horizon", columns="target", values="mae")
+        table = table.reindex([l for l, _ in horizons if l in table.index])
+        naive = res["summary"].pivot(index="horizon", columns="target", values="mae_naive").reindex(table.index)
+        print(table.join(naive, rsuffix=" (naive)").round(3).to_string())
+        summaries[name] = res["summary"].assign(bundle=name)
+        reports.append(res["folds"].assign(bundle=name))
+
+    if args.out and reports:
+        out = pd.concat(reports, ignore_index=True)
+        out.to_csv(args.out, index=False)
+        print(f"\n✅ saved: {args.out} ({len(out)} rows)")
+
+    if len(summaries) > 1:
+        both = pd.concat(summaries.values(), ignore_index=True)
+        print("\n📊 MAE by bundle")
+        print(both.pivot_table(index=["target", "horizon"], columns="bundle", values="mae", sort=False).round(3).to_string())
+
+
+if __name__ == "__main__":
+    main()
@@ -1,105 +1,516 @@
 # eval_live.py — evaluasi live TEMP & TVOC (tanpa dust) [WIB print]
-import json, os, csv
-from collections import deque
+"""
+Live evaluation: match forecasts (TOPIC_OUT) with actual readings
+(TOPIC_IN) on (device_id, ts) and log the errors.
+
+Matcher
+-------
+- predictions and actuals are kept in dicts keyed by (device_id, ts),
+  so whichever side arrives second finds its partner in O(1); several
+  predictions for the same ts (different runs / horizons) all match
+- stale entries expire by event time: anything older than the newest
+  actual ts minus EVAL_TTL_SEC is dropped (min-heap for predictions,
+  arrival-ordered deque for actuals), EVAL_MAX_PENDING caps memory
+- matched rows are buffered and written every EVAL_FLUSH_ROWS rows or
+  EVAL_FLUSH_SEC seconds: one CSV open per flush, optional SQLite
+  (EVAL_SQLITE) via one executemany per flush
+- rolling MAE per horizon: fixed window (EVAL_MAE_WINDOW) with running
+  sums, O(1) per matched row
+- one lock guards the matcher (and its RollingMAE): on_message runs on the
+  paho thread while main() flushes/prints from the main thread
+
+Prediction payloads: single {"ts_pred", "horizon_min", "temp_c_pred",
+"tvoc_ppb_pred"}, a list of those, {"points": [...]}, or the batch
+format of mqtt/forecast_mqtt_xgb_multi.py {"generated_at", "forecast":
+[{"ts", ...}]}, or its packed chunks (ai/utils/forecast_payload.py),
+reassembled per topic first. "device_id" (top-level or per point) is
+optional.
+
+Run (dari folder backend/ai):
+    python training/eval_live.py
+    python training/eval_live.py --bench 200000
+"""
+import json, os, csv, sys, time, heapq, sqlite3, threading
+from collections import deque, defaultdict
 from datetime import datetime, timezone
+from pathlib import Path
 from zoneinfo import ZoneInfo
 import paho.mqtt.client as mqtt
 
+# ===== PATH FIX (allow ai.*) =====
+sys.path.append(str(Path(__file__).resolve().parents[2]))  # backend/
+
+from ai.utils.forecast_payload import ForecastAssembler, is_forecast_chunk, to_points
+
 BROKER     = "broker.emqx.io"
 PORT       = 1883
 TOPIC_IN   = "jlksafkjdsalkcjalkdsfljahahjoiqjwoiejiwqueoiwqueiwfhkjbj217482140173498309ureckjdbcbdsajfb"     # aktual dari ESP32
 TOPIC_OUT  = "iot/ruang1/forecast"   # prediksi dari PC
 OUT_CSV    = "data/eval_live.csv"
+OUT_SQLITE = os.getenv("EVAL_SQLITE", "")   # kosong = CSV saja
+
+DEFAULT_DEVICE = "esp32-01"
+TTL_SEC        = int(os.getenv("EVAL_TTL_SEC", "3600"))
+MAX_PENDING    = int(os.getenv("EVAL_MAX_PENDING", "500000"))
+FLUSH_ROWS     = int(os.getenv("EVAL_FLUSH_ROWS", "500"))
+FLUSH_SEC      = float(os.getenv("EVAL_FLUSH_SEC", "5"))
+MAE_WINDOW     = int(os.getenv("EVAL_MAE_WINDOW", "200"))
+VERBOSE        = os.getenv("EVAL_VERBOSE", "0") == "1"   # print tiap baris match
 
 WIB = ZoneInfo("Asia/Jakarta")
 
-pred_q   = deque(maxlen=2000)
-actual_q = deque(maxlen=2000)
+CSV_HEADER = [
+    "ts_actual","ts_pred","horizon_min",
+    "temp_c","temp_c_pred","tvoc_ppb","tvoc_ppb_pred",
+    "e_temp","e_tvoc","device_id"
+]
 
-os.makedirs("data", exist_ok=True)
-if not os.path.exists(OUT_CSV):
-    with open(OUT_CSV, "w", newline="") as f:
-        w = csv.writer(f)
-        w.writerow([
-            "ts_actual","ts_pred","horizon_min",
-            "temp_c","temp_c_pred","tvoc_ppb","tvoc_ppb_pred",
-            "e_temp","e_tvoc"
-        ])
+SQL_CREATE = """
+CREATE TABLE IF NOT EXISTS eval_live (
+    device_id TEXT NOT NULL,
+    ts INTEGER NOT NULL,
+    horizon_min INTEGER NOT NULL,
+    temp_c REAL, temp_c_pred REAL,
+    tvoc_ppb REAL, tvoc_ppb_pred REAL,
+    e_temp REAL, e_tvoc REAL,
+    PRIMARY KEY (device_id, ts, horizon_min)
+)
+"""
+SQL_INSERT = "INSERT OR REPLACE INTO eval_live VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)"
 
 def _fmt_wib(epoch_s: int) -> str:
     return datetime.fromtimestamp(epoch_s, timezone.utc).astimezone(WIB).strftime("%Y-%m-%d %H:%M:%S%z")
 
-def on_connect(client, userdata, flags, reason_code, properties=None):
-    print("connected:", reason_code)
-    client.subscribe([(TOPIC_IN, 0), (TOPIC_OUT, 0)])
-    print("listening:", TOPIC_IN, "and", TOPIC_OUT)
+def _epoch_s(v) -> int:
+    v = float(v)
+    return int(v / 1000) if v > 1e12 else int(v)   # ms → s
+
+
+# ======================================================
+# ROLLING MAE (per horizon, O(1) per update)
+# ======================================================
+
+class RollingMAE:
+    """MAE over the last `window` errors of each horizon, via running sums."""
+
+    def __init__(self, window: int = MAE_WINDOW):
+        self.window = window
+        self._errs = defaultdict(lambda: deque())   # horizon → deque[(|e_temp|, |e_tvoc|)]
+        self._sums = defaultdict(lambda: [0.0, 0.0])
+
+    def update(self, horizon: int, e_temp: float, e_tvoc: float) -> None:
+        q, s = self._errs[horizon], self._sums[horizon]
+        a_t, a_v = abs(e_temp), abs(e_tvoc)
+        if a_t != a_t or a_v != a_v:   # NaN (sensor kosong) tidak dihitung
+            return
+        q.append((a_t, a_v))
+        s[0] += a_t
+        s[1] += a_v
+        if len(q) > self.window:
+            o_t, o_v = q.popleft()
+            s[0] -= o_t
+            s[1] -= o_v
+
+    def get(self, horizon: int) -> dict:
+        q, s = self._errs.get(horizon), self._sums.get(horizon)
+        if not q:
+            return {"n": 0, "mae_temp": float("nan"), "mae_tvoc": float("nan")}
+        return {"n": len(q), "mae_temp": s[0] / len(q), "mae_tvoc": s[1] / len(q)}
+
+    def snapshot(self) -> dict:
+        return {h: self.get(h) for h in sorted(self._errs)}
+
+
+# ======================================================
+# BUFFERED WRITER (CSV + opsional SQLite)
+# ======================================================
+
+class EvalWriter:
+    def __init__(self, csv_path: str = OUT_CSV, sqlite_path: str = OUT_SQLITE,
+                 flush_rows: int = FLUSH_ROWS, flush_sec: float = FLUSH_SEC):
+        self.csv_path = csv_path
+        self.flush_rows = flush_rows
+        self.flush_sec = flush_sec
+        self._buf = []
+        self._last_flush = time.monotonic()
+        self._lock = threading.Lock()
+        self.rows_written = 0
+        self.flushes = 0
+
+        os.makedirs(os.path.dirname(csv_path) or ".", exist_ok=True)
+        self.columns = CSV_HEADER
+        if not os.path.exists(csv_path) or os.path.getsize(csv_path) == 0:
+            with open(csv_path, "w", newline="") as f:
+                csv.writer(f).writerow(CSV_HEADER)
+        else:
+            with open(csv_path, newline="") as f:
+                header = next(csv.reader(f), [])
+            if "device_id" not in header:
+                self.columns = CSV_HEADER[:-1]   # file lama: kolom lama tetap
+
+        self.con = None
+        if sqlite_path:
+            self.con = sqlite3.connect(sqlite_path, check_same_thread=False)
+            self.con.execute("PRAGMA journal_mode=WAL")
+            self.con.execute(SQL_CREATE)
+            self.con.commit()
+
+    def add(self, row: list) -> None:
+        with self._lock:
+            self._buf.append(row)
+        self.maybe_flush()
+
+    def maybe_flush(self) -> int:
+        with self._lock:
+            due = len(self._buf) >= self.flush_rows or (
+                self._buf and time.monotonic() - self._last_flush >= self.flush_sec
+            )
+        return self.flush() if due else 0
+
+    def flush(self) -> int:
+        with self._lock:
+            rows, self._buf = self._buf, []
+            self._last_flush = time.monotonic()
+            if not rows:
+                return 0
+            n_cols = len(self.columns)
+            with open(self.csv_path, "a", newline="") as f:
+                csv.writer(f).writerows(r[:n_cols] for r in rows)
+            if self.con is not None:
+                # row: ts_actual, ts_pred, horizon, temp, temp_pred, tvoc, tvoc_pred, e_temp, e_tvoc, device
+                self.con.executemany(SQL_INSERT, [(r[9], r[0], *r[2:9]) for r in rows])
+                self.con.commit()
+            self.rows_written += len(rows)
+            self.flushes += 1
+            return len(rows)
+
+    def close(self) -> None:
+        self.flush()
+        if self.con is not None:
+            self.con.close()
+            self.con = None
+
+
+# ======================================================
+# MATCHER
+# ======================================================
+
+class LiveMatcher:
+    def __init__(self, writer: EvalWriter, ttl_sec: int = TTL_SEC,
+                 max_pending: int = MAX_PENDING, mae_window: int = MAE_WINDOW):
+        self.writer = writer
+        self.ttl = ttl_sec
+        self.max_pending = max_pending
+        self.mae = RollingMAE(mae_window)
+        self.lock = threading.RLock()   # paho thread (add_*) vs main thread (flush)
+
+        self.preds = {}          # (device, ts) → {horizon: pred}
+        self.actuals = {}        # (device, ts) → actual
+        self._pred_heap = []     # (ts, device) untuk expiry
+        self._actual_q = deque() # (ts, device) urutan datang
+        self.n_preds = 0         # prediksi pending (semua horizon)
+        self.newest = None       # ts aktual terbaru (jam event)
+
+        # metrics
+        self.matched = 0
+        self.expired_preds = 0
+        self.expired_actuals = 0
 
-def try_match_and_log():
-    if not pred_q or not actual_q:
-        return
+    # --------------------------------------------------
+    # input
+    # --------------------------------------------------
+    def add_prediction(self, device: str, ts: int, horizon: int,
+                       temp_pred: float, tvoc_pred: float) -> None:
+        with self.lock:
+            self._add_prediction(device, ts, horizon, temp_pred, tvoc_pred)
 
-    pred_by_ts = {p["ts_pred"]: p for p in list(pred_q)}
-    logged = 0
+    def add_actual(self, device: str, ts: int, temp: float, tvoc: float) -> None:
+        with self.lock:
+            self._add_actual(device, ts, temp, tvoc)
 
-    for a in list(actual_q):
-        ts = a["ts"]
-        if ts in pred_by_ts:
-            p = pred_by_ts[ts]
+    def _add_prediction(self, device, ts, horizon, temp_pred, tvoc_pred) -> None:
+        key = (device, ts)
+        a = self.actuals.get(key)
+        if a is not None:
+            self._log(device, a, ts, horizon, temp_pred, tvoc_pred)
+            return
+        if self.newest is not None and ts < self.newest - self.ttl:
+            self.expired_preds += 1   # sudah terlalu lama, aktualnya tidak akan datang
+            return
 
-            e_temp = a["temp_c"] - p["temp_c_pred"]
-            e_tvoc = a["tvoc_ppb"] - p["tvoc_ppb_pred"]
+        slot = self.preds.get(key)
+        if slot is None:
+            slot = self.preds[key] = {}
+            heapq.heappush(self._pred_heap, (ts, device))
+        if horizon not in slot:
+            self.n_preds += 1
+        slot[horizon] = (temp_pred, tvoc_pred)
 
-            with open(OUT_CSV, "a", newline="") as f:
-                w = csv.writer(f)
-                w.writerow([
-                    a["ts"], p["ts_pred"], p["horizon_min"],
-                    a["temp_c"], p["temp_c_pred"], a["tvoc_ppb"], p["tvoc_ppb_pred"],
-                    e_temp, e_tvoc
-                ])
+        if self.n_preds > self.max_pending:
+            self._evict_preds(limit_ts=None)
 
+    def _add_actual(self, device, ts, temp, tvoc) -> None:
+        key = (device, ts)
+        a = (temp, tvoc)
+        if key not in self.actuals:
+            self._actual_q.append((ts, device))
+        self.actuals[key] = a   # tetap disimpan sampai TTL (prediksi horizon lain bisa datang)
+
+        slot = self.preds.pop(key, None)
+        if slot:
+            self.n_preds -= len(slot)
+            for horizon, (tp, vp) in slot.items():
+                self._log(device, a, ts, horizon, tp, vp)
+
+        if self.newest is None or ts > self.newest:
+            self.newest = ts
+            self.expire()
+        elif len(self.actuals) > self.max_pending:
+            self.expire()
+
+    # --------------------------------------------------
+    # expiry
+    # --------------------------------------------------
+    def _evict_preds(self, limit_ts) -> None:
+        heap = self._pred_heap
+        while heap and (
+            (limit_ts is not None and heap[0][0] < limit_ts)
+            or (limit_ts is None and self.n_preds > self.max_pending)
+        ):
+            ts, device = heapq.heappop(heap)
+            slot = self.preds.pop((device, ts), None)   # None = sudah match
+            if slot:
+                self.n_preds -= len(slot)
+                self.expired_preds += len(slot)
+
+    def expire(self) -> None:
+        if self.newest is None:
+            return
+        limit = self.newest - self.ttl
+        self._evict_preds(limit)
+
+        q = self._actual_q
+        while q and (q[0][0] < limit or len(self.actuals) > self.max_pending):
+            ts, device = q.popleft()
+            if self.actuals.pop((device, ts), None) is not None:
+                self.expired_actuals += 1
+
+    # --------------------------------------------------
+    # output
+    # --------------------------------------------------
+    def _log(self, device, a, ts, horizon, temp_pred, tvoc_pred) -> None:
+        temp, tvoc = a
+        e_temp = temp - temp_pred
+        e_tvoc = tvoc - tvoc_pred
+        self.writer.add([ts, ts, horizon, temp, temp_pred, tvoc, tvoc_pred, e_temp, e_tvoc, device])
+        self.mae.update(horizon, e_temp, e_tvoc)
+        self.matched += 1
+
+        if VERBOSE:
             print(
-                f"[EVAL] ts(WIB)={_fmt_wib(ts)} | "
-                f"T: act={a['temp_c']:.3f} pred={p['temp_c_pred']:.3f} err={e_temp:.3f}  ||  "
-                f"TVOC: act={a['tvoc_ppb']:.3f} pred={p['tvoc_ppb_pred']:.3f} err={e_tvoc:.3f}"
+                f"[EVAL] {device} ts(WIB)={_fmt_wib(ts)} h={horizon}m | "
+                f"T: act={temp:.3f} pred={temp_pred:.3f} err={e_temp:.3f}  ||  "
+                f"TVOC: act={tvoc:.3f} pred={tvoc_pred:.3f} err={e_tvoc:.3f}"
             )
 
-            pred_q.remove(p)
-            actual_q.remove(a)
-            logged += 1
+    def flush(self) -> int:
+        with self.lock:
+            n = self.writer.maybe_flush()
+            if n:
+                self.print_summary(n)
+            return n
+
+    def metrics(self) -> dict:
+        with self.lock:
+            return self._metrics()
+
+    def _metrics(self) -> dict:
+        return {
+            "matched": self.matched,
+            "pending_preds": self.n_preds,
+            "pending_actuals": len(self.actuals),
+            "expired_preds": self.expired_preds,
+            "expired_actuals": self.expired_actuals,
+            "rows_written": self.writer.rows_written,
+            "flushes": self.writer.flushes,
+        }
+
+    def print_summary(self, n_flushed: int, top: int = 6) -> None:
+        with self.lock:
+            self._print_summary(n_flushed, top)
+
+    def _print_summary(self, n_flushed: int, top: int) -> None:
+        snap = self.mae.snapshot()
+        parts = [f"h={h}m T={m['mae_temp']:.3f} TVOC={m['mae_tvoc']:.1f} (n={m['n']})"
+                 for h, m in list(snap.items())[:top]]
+        more = f" … +{len(snap) - top} horizons" if len(snap) > top else ""
+        m = self._metrics()
+        print(f"[EVAL] logged {n_flushed} rows → {self.writer.csv_path} | matched={m['matched']} "
+              f"pending={m['pending_preds']}/{m['pending_actuals']} "
+              f"expired={m['expired_preds']}/{m['expired_actuals']}")
+        if parts:
+            print("[EVAL] rolling MAE: " + " | ".join(parts) + more)
+
+
+# ======================================================
+# MQTT
+# ======================================================
+
+matcher = None
+assembler = ForecastAssembler()
+
+def _iter_predictions(d):
+    """Yield (device, ts, horizon, temp_pred, tvoc_pred) from any prediction payload."""
+    if isinstance(d, list):
+        points, base = d, {}
+    elif "forecast" in d or "points" in d:
+        points, base = d.get("forecast") or d.get("points") or [], d
+    else:
+        points, base = [d], {}
+
+    device_default = base.get("device_id", DEFAULT_DEVICE)
+    generated_at = base.get("generated_at")
+    for p in points:
+        ts = p.get("ts_pred", p.get("ts"))
+        if ts is None:
+            continue
+        ts = _epoch_s(ts)
+        if "horizon_min" in p:
+            horizon = int(p["horizon_min"])
+        elif generated_at is not None:
+            horizon = max(0, (ts - _epoch_s(generated_at)) // 60)
+        else:
+            horizon = 0
+        yield (
+            p.get("device_id", device_default), ts, horizon,
+            float(p["temp_c_pred"]), float(p["tvoc_ppb_pred"]),
+        )
 
-    if logged:
-        print(f"[EVAL] logged {logged} rows → {OUT_CSV}")
+def on_connect(client, userdata, flags, reason_code, properties=None):
+    print("connected:", reason_code)
+    client.subscribe([(TOPIC_IN, 0), (TOPIC_OUT, 0)])
+    print("listening:", TOPIC_IN, "and", TOPIC_OUT)
 
 def on_message(client, userdata, msg):
     try:
-        d = json.loads(msg.payload.decode("utf-8"))
+        if msg.topic == TOPIC_OUT and is_forecast_chunk(msg.payload):
+            fc = assembler.add(msg.payload, msg.topic)
+            if fc is None:
+                return                     # tunggu chunk lainnya
+            d = {"generated_at": fc["generated_at"], "forecast": to_points(fc)}
+        else:
+            d = json.loads(msg.payload.decode("utf-8"))
 
-        if msg.topic == TOPIC_OUT and "ts_pred" in d:
-            pred_q.append({
-                "ts_pred": int(d["ts_pred"]),
-                "horizon_min": int(d.get("horizon_min", 0)),
-                "temp_c_pred": float(d["temp_c_pred"]),
-                "tvoc_ppb_pred": float(d["tvoc_ppb_pred"]),
-            })
+        if msg.topic == TOPIC_OUT:
+            for dev, ts, h, tp, vp in _iter_predictions(d):
+                matcher.add_prediction(dev, ts, h, tp, vp)
 
         elif msg.topic == TOPIC_IN and "ts" in d:
-            actual_q.append({
-                "ts": int(d["ts"]),
-                "temp_c": float(d.get("temp_c", "nan")),
-                "tvoc_ppb": float(d.get("tvoc_ppb", "nan")),
-            })
+            matcher.add_actual(
+                d.get("device_id", DEFAULT_DEVICE),
+                _epoch_s(d["ts"]),
+                float(d.get("temp_c", "nan")),
+                float(d.get("tvoc_ppb", "nan")),
+            )
 
-        try_match_and_log()
+        matcher.flush()
 
     except Exception as e:
         print("on_message error:", e)
 
 def main():
+    global matcher
+    matcher = LiveMatcher(EvalWriter(OUT_CSV, OUT_SQLITE))
+
     cli = mqtt.Client(mqtt.CallbackAPIVersion.VERSION2, client_id="pc-eval-live")
     cli.on_connect = on_connect
     cli.on_message = on_message
     cli.connect(BROKER, PORT, keepalive=60)
-    cli.loop_forever()
+    cli.loop_start()
+    try:
+        while True:
+            time.sleep(1.0)
+            matcher.flush()   # flush berkala walau tidak ada pesan baru
+    except KeyboardInterrupt:
+        pass
+    finally:
+        cli.loop_stop()
+        cli.disconnect()
+        matcher.writer.close()
+        print("📊", matcher.metrics())
+
+
+# ======================================================
+# BENCHMARK (tanpa broker)
+# ======================================================
+
+def _legacy_bench(preds, actuals, out_csv):
+    """Old try_match_and_log loop on the same stream (deque scan + remove + open per row)."""
+    pred_q, actual_q = deque(maxlen=2000), deque(maxlen=2000)
+    with open(out_csv, "w", newline="") as f:
+        csv.writer(f).writerow(CSV_HEADER[:-1])
+    matched = 0
+    for kind, item in _interleave(preds, actuals):
+        (pred_q if kind == "p" else actual_q).append(item)
+        pred_by_ts = {p["ts_pred"]: p for p in list(pred_q)}
+        for a in list(actual_q):
+            if a["ts"] in pred_by_ts:
+                p = pred_by_ts[a["ts"]]
+                with open(out_csv, "a", newline="") as f:
+                    csv.writer(f).writerow([a["ts"], p["ts_pred"], p["horizon_min"], a["temp_c"],
+                                            p["temp_c_pred"], a["tvoc_ppb"], p["tvoc_ppb_pred"],
+                                            a["temp_c"] - p["temp_c_pred"], a["tvoc_ppb"] - p["tvoc_ppb_pred"]])
+                pred_q.remove(p)
+                actual_q.remove(a)
+                matched += 1
+    return matched
+
+def _interleave(preds, actuals, batch=1000):
+    """Forecast batches (`batch` points) followed by the actuals they cover."""
+    ai = 0
+    for i in range(0, len(preds), batch):
+        for p in preds[i:i + batch]:
+            yield "p", p
+        last_ts = preds[min(i + batch, len(preds)) - 1]["ts_pred"]
+        while ai < len(actuals) and actuals[ai]["ts"] <= last_ts:
+            yield "a", actuals[ai]
+            ai += 1
+
+if __name__ == "__main__" and "--bench" in sys.argv:
+    import random
+    import tempfile
+
+    n = int(sys.argv[sys.argv.index("--bench") + 1])
+    n_dev = 4
+    t0_ts = 1763450400
+    preds, actuals = [], []
+    for k in range(n):
+        dev = f"esp32-{k % n_dev:02d}"
+        ts = t0_ts + (k // n_dev) * 60
+        preds.append({"device_id": dev, "ts_pred": ts, "horizon_min": 60 * (1 + k % 24),
+                      "temp_c_pred": 28 + random.random(), "tvoc_ppb_pred": 100 + random.random()})
+        actuals.append({"device_id": dev, "ts": ts, "temp_c": 28.5, "tvoc_ppb": 100.5})
+
+    tmp = tempfile.mkdtemp()
+    print(f"📊 {n:,} predictions + {n:,} actuals, {n_dev} devices")
+
+    t0 = time.perf_counter()
+    m = LiveMatcher(EvalWriter(os.path.join(tmp, "new.csv"), os.path.join(tmp, "eval.db")))
+    for kind, x in _interleave(preds, actuals):
+        if kind == "p":
+            m.add_prediction(x["device_id"], x["ts_pred"], x["horizon_min"], x["temp_c_pred"], x["tvoc_ppb_pred"])
+        else:
+            m.add_actual(x["device_id"], x["ts"], x["temp_c"], x["tvoc_ppb"])
+    m.writer.close()
+    t_new = time.perf_counter() - t0
+    print(f"✅ indexed : {t_new:.2f}s ({2 * n / t_new:,.0f} msg/s) {m.metrics()}")
+    print(f"   MAE h=60m: {m.mae.get(60)}")
+
+    n_old = min(n, 20000)   # legacy O(n²) — dibatasi supaya selesai
+    t0 = time.perf_counter()
+    matched = _legacy_bench(preds[:n_old], actuals[:n_old], os.path.join(tmp, "old.csv"))
+    t_old = time.perf_counter() - t0
+    print(f"   legacy  : {t_old:.2f}s for {n_old:,}+{n_old:,} ({2 * n_old / t_old:,.0f} msg/s) matched={matched}")
 
-if __name__ == "__main__":
+elif __name__ == "__main__":
     main()
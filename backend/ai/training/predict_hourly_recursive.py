@@ -10,9 +10,11 @@ localize them as UTC and then convert to Asia/Jakarta (+07:00).
 """
 
 import os
+import sys
 import joblib
 import numpy as np
 import pandas as pd
+from pathlib import Path
 import matplotlib
 matplotlib.use("Agg")
 import matplotlib.pyplot as plt
@@ -20,7 +22,14 @@ from sklearn.ensemble import RandomForestRegressor
 from sklearn.preprocessing import StandardScaler
 from sklearn.model_selection import train_test_split
 
-DATA_CSV = "data/sensor.csv"
+# PATH FIX (allow ai.*)
+sys.path.append(str(Path(__file__).resolve().parents[2]))  # backend/
+
+from ai.db.predictions import DEFAULT_DEVICE, store_forecast
+from ai.db.sensor_dataset import load_sensor_frame
+from ai.utils.forecast_export import export_forecast, forecast_frame, wait_exports
+
+DATA_CSV = os.getenv("SENSOR_DATA", "data/sensor.csv")   # CSV atau folder dataset Parquet
 OUT_DIR = "predictions"
 MODEL_DIR = "models"
 os.makedirs(OUT_DIR, exist_ok=True)
@@ -36,35 +45,11 @@ TARGET_COLS = ["temp_c", "tvoc_ppb"]
 if not os.path.exists(DATA_CSV):
     raise SystemExit("data/sensor.csv not found")
 
-df_raw = pd.read_csv(DATA_CSV)
-if "ts" not in df_raw.columns:
-    raise SystemExit("CSV must contain 'ts' column")
-
-# robust timestamp parsing (try epoch seconds first, then ISO)
-ts_raw = df_raw["ts"]
-ts_num = pd.to_numeric(ts_raw, errors="coerce")
-ts_from_num = pd.to_datetime(ts_num, unit="s", utc=True, errors="coerce")
-ts_from_iso = pd.to_datetime(ts_raw, utc=True, errors="coerce")
-ts = ts_from_iso.fillna(ts_from_num)
-
-n_invalid = int(ts.isna().sum())
-if n_invalid > 0:
-    print(f"[WARN] {n_invalid} invalid timestamps will be dropped for training/prediction")
+# CSV (timestamp parser bersama) atau dataset Parquet (ai/db/sensor_dataset.py)
+df = load_sensor_frame(DATA_CSV, columns=USE_COLS)
 
-df = df_raw.loc[~ts.isna()].copy().reset_index(drop=True)
-ts = ts.loc[~ts.isna()].reset_index(drop=True)
-
-# remove tz info (make naive) — we'll treat these as UTC later when saving WIB
-try:
-    ts = ts.dt.tz_convert(None)
-except Exception:
-    try:
-        ts = ts.dt.tz_localize(None)
-    except Exception:
-        pass
-
-df.index = ts
-df = df.sort_index()
+# naive UTC — we'll treat these as UTC later when saving WIB
+df.index = df.index.tz_convert(None)
 
 # ---------- validate required columns ----------
 for c in TARGET_COLS:
@@ -164,34 +149,29 @@ for h in range(FORECAST_HOURS):
 
 # ---------- save original CSV (naive timestamps) ----------
 df_pred = pd.DataFrame(pred_rows).set_index("timestamp")
-out_csv_orig = os.path.join(OUT_DIR, "pred_7days_hourly_recursive.csv")
-df_pred.to_csv(out_csv_orig)
-print("Saved hourly predictions (original, naive timestamps) ->", out_csv_orig)
-
-# ---------- convert timestamps to WIB and save two variants ----------
-# Reset index to column so we can localize/convert
-df_pred_reset = df_pred.reset_index()
-# treat naive timestamps as UTC (assumption) then convert to Asia/Jakarta
-df_pred_reset["timestamp"] = pd.to_datetime(df_pred_reset["timestamp"])
-df_pred_reset["timestamp_aj"] = df_pred_reset["timestamp"].dt.tz_localize("UTC").dt.tz_convert("Asia/Jakarta")
-
-# 1) Save with timezone info (+07:00)
-out_csv_wib = os.path.join(OUT_DIR, "pred_7days_hourly_recursive_wib.csv")
-df_wib = df_pred_reset[["timestamp_aj", "temp_c_pred", "tvoc_ppb_pred"]].rename(columns={"timestamp_aj": "timestamp"})
-df_wib.to_csv(out_csv_wib, index=False)
-print("Saved hourly predictions (WIB with tz) ->", out_csv_wib)
-
-# 2) Save naive-local (timestamp shifted to WIB but without tz info)
-out_csv_wib_naive = os.path.join(OUT_DIR, "pred_7days_hourly_recursive_wib_naive.csv")
-df_wib_naive = df_wib.copy()
-df_wib_naive["timestamp"] = pd.to_datetime(df_wib_naive["timestamp"]).dt.tz_convert("Asia/Jakarta").dt.tz_localize(None)
-df_wib_naive.to_csv(out_csv_wib_naive, index=False)
-print("Saved hourly predictions (WIB naive, no tz) ->", out_csv_wib_naive)
+
+# ---------- simpan ke tabel Prediction (PREDICTION_STORE=1) ----------
+store_forecast(
+    DEFAULT_DEVICE, last_time, 3600,
+    {"temp_c_pred": df_pred["temp_c_pred"], "tvoc_ppb_pred": df_pred["tvoc_ppb_pred"]},
+    "rf_hourly_1step",
+    meta={"source": "predict_hourly_recursive.py", "horizon_hours": FORECAST_HOURS, "lag_hours": LAG_HOURS},
+)
+# ---------- save original (naive UTC), WIB (+07:00) and WIB-naive in one export job ----------
+# treat naive timestamps as UTC (assumption); WIB columns are converted once in forecast_frame
+frame = forecast_frame(df_pred.index, df_pred)
+pred_cols = ["temp_c_pred", "tvoc_ppb_pred"]
+out_stem = os.path.join(OUT_DIR, "pred_7days_hourly_recursive")
+export_forecast(frame, {
+    out_stem:                {"timestamp": "timestamp_utc", **{c: c for c in pred_cols}},
+    out_stem + "_wib":       {"timestamp": "timestamp_wib", **{c: c for c in pred_cols}},
+    out_stem + "_wib_naive": {"timestamp": "timestamp_wib_naive", **{c: c for c in pred_cols}},
+})
 
 # ---------- quick plot using WIB-naive timestamps ----------
 plt.figure(figsize=(12, 5))
-plt.plot(df_wib_naive["timestamp"], df_wib_naive["temp_c_pred"], label="temp_c_pred")
-plt.plot(df_wib_naive["timestamp"], df_wib_naive["tvoc_ppb_pred"], label="tvoc_ppb_pred")
+plt.plot(frame["timestamp_wib_naive"], frame["temp_c_pred"], label="temp_c_pred")
+plt.plot(frame["timestamp_wib_naive"], frame["tvoc_ppb_pred"], label="tvoc_ppb_pred")
 plt.legend()
 plt.title("Recursive hourly forecast (7 days) — WIB")
 plt.xlabel("timestamp (WIB)")
@@ -200,4 +180,5 @@ plt.tight_layout()
 out_png = os.path.join(OUT_DIR, "pred_7days_hourly_recursive_wib.png")
 plt.savefig(out_png)
 print("Saved plot ->", out_png)
+wait_exports()
 print("Done.")
@@ -7,16 +7,25 @@ train_predict_hourly_fix.py
 - recursively forecasts 168 hours ahead and saves CSV (WIB) + PNG.
 """
 import os
+import sys
 import numpy as np
 import pandas as pd
 import joblib
+from pathlib import Path
 import matplotlib
 matplotlib.use("Agg")
 import matplotlib.pyplot as plt
 from sklearn.ensemble import RandomForestRegressor
 from sklearn.preprocessing import StandardScaler
 
-DATA_CSV = "data/sensor.csv"
+# PATH FIX (allow ai.*)
+sys.path.append(str(Path(__file__).resolve().parents[2]))  # backend/
+
+from ai.db.predictions import DEFAULT_DEVICE, store_forecast
+from ai.db.sensor_dataset import load_sensor_frame
+from ai.utils.forecast_export import export_forecast, forecast_frame, wait_exports
+
+DATA_CSV = os.getenv("SENSOR_DATA", "data/sensor.csv")   # CSV atau folder dataset Parquet
 OUT_DIR = "predictions"
 MODEL_DIR = "models"
 os.makedirs(OUT_DIR, exist_ok=True)
@@ -33,32 +42,11 @@ TARGET_TVOC = "tvoc_ppb_hour_max"
 if not os.path.exists(DATA_CSV):
     raise SystemExit("data/sensor.csv not found")
 
-df_raw = pd.read_csv(DATA_CSV)
-if "ts" not in df_raw.columns:
-    raise SystemExit("CSV must contain 'ts' column")
-
-# robust timestamp parsing
-ts_raw = df_raw["ts"]
-ts_num = pd.to_numeric(ts_raw, errors="coerce")
-ts_from_num = pd.to_datetime(ts_num, unit="s", utc=True, errors="coerce")
-ts_from_iso = pd.to_datetime(ts_raw, utc=True, errors="coerce")
-ts = ts_from_iso.fillna(ts_from_num)
-n_invalid = int(ts.isna().sum())
-if n_invalid > 0:
-    print(f"[WARN] {n_invalid} rows have invalid timestamps and will be dropped")
-df = df_raw.loc[~ts.isna()].copy().reset_index(drop=True)
-ts = ts.loc[~ts.isna()].reset_index(drop=True)
-
-# make naive timestamps (we'll treat as UTC then convert to WIB on save)
-try:
-    ts = ts.dt.tz_convert(None)
-except Exception:
-    try:
-        ts = ts.dt.tz_localize(None)
-    except Exception:
-        pass
-df.index = ts
-df = df.sort_index()
+# CSV (timestamp parser bersama) atau dataset Parquet (ai/db/sensor_dataset.py)
+df = load_sensor_frame(DATA_CSV, columns=USE_COLS)
+
+# naive UTC — we'll treat these as UTC later when saving WIB
+df.index = df.index.tz_convert(None)
 
 # ensure required columns exist (fill missing non-critical with forward fill)
 for c in USE_COLS:
@@ -186,30 +174,28 @@ for h in range(FORECAST_HOURS):
 
 df_pred = pd.DataFrame(preds).set_index("timestamp")
 
-# ---------------- save original naive CSV ----------------
-out_orig = os.path.join(OUT_DIR, "pred_7days_hourly_fixed.csv")
-df_pred.to_csv(out_orig)
-print("Saved:", out_orig)
-
-# ---------------- convert to WIB and save (with tz and naive) ----------------
-df_reset = df_pred.reset_index()
-df_reset["timestamp"] = pd.to_datetime(df_reset["timestamp"])
-df_reset["timestamp_aj"] = df_reset["timestamp"].dt.tz_localize("UTC").dt.tz_convert("Asia/Jakarta")
-out_wib = os.path.join(OUT_DIR, "pred_7days_hourly_fixed_wib.csv")
-df_wib = df_reset[["timestamp_aj","temp_c_pred","tvoc_ppb_pred"]].rename(columns={"timestamp_aj":"timestamp"})
-df_wib.to_csv(out_wib, index=False)
-print("Saved WIB:", out_wib)
-# naive WIB (no tz info)
-out_wib_naive = os.path.join(OUT_DIR, "pred_7days_hourly_fixed_wib_naive.csv")
-df_wib_naive = df_wib.copy()
-df_wib_naive["timestamp"] = pd.to_datetime(df_wib_naive["timestamp"]).dt.tz_convert("Asia/Jakarta").dt.tz_localize(None)
-df_wib_naive.to_csv(out_wib_naive, index=False)
-print("Saved WIB naive:", out_wib_naive)
+# ---------- simpan ke tabel Prediction (PREDICTION_STORE=1) ----------
+store_forecast(
+    DEFAULT_DEVICE, last_time, 3600,
+    {"temp_c_pred": df_pred["temp_c_pred"], "tvoc_ppb_pred": df_pred["tvoc_ppb_pred"]},
+    "rf_hourly_fixed",
+    meta={"source": "train_predict_hourly_fix.py", "horizon_hours": FORECAST_HOURS, "lag_hours": LAG_HOURS},
+)
+
+# ---------------- save naive (UTC), WIB (with tz) and WIB naive in one export job ----------------
+frame = forecast_frame(df_pred.index, df_pred)
+pred_cols = ["temp_c_pred", "tvoc_ppb_pred"]
+out_stem = os.path.join(OUT_DIR, "pred_7days_hourly_fixed")
+export_forecast(frame, {
+    out_stem:                {"timestamp": "timestamp_utc", **{c: c for c in pred_cols}},
+    out_stem + "_wib":       {"timestamp": "timestamp_wib", **{c: c for c in pred_cols}},
+    out_stem + "_wib_naive": {"timestamp": "timestamp_wib_naive", **{c: c for c in pred_cols}},
+})
 
 # ---------------- quick plot ----------------
 plt.figure(figsize=(12,5))
-plt.plot(df_wib_naive["timestamp"], df_wib_naive["temp_c_pred"], label="temp_c_pred")
-plt.plot(df_wib_naive["timestamp"], df_wib_naive["tvoc_ppb_pred"], label="tvoc_ppb_pred")
+plt.plot(frame["timestamp_wib_naive"], frame["temp_c_pred"], label="temp_c_pred")
+plt.plot(frame["timestamp_wib_naive"], frame["tvoc_ppb_pred"], label="tvoc_ppb_pred")
 plt.legend()
 plt.title("Forecast (7 days) — fixed hourly aggregation (WIB)")
 plt.xticks(rotation=30)
@@ -217,5 +203,6 @@ plt.tight_layout()
 out_png = os.path.join(OUT_DIR, "pred_7days_hourly_fixed_wib.png")
 plt.savefig(out_png)
 print("Saved plot:", out_png)
+wait_exports()
 
 print("Done.")
@@ -9,9 +9,11 @@ Hourly RandomForest training
 """
 
 import os
+import sys
 import joblib
 import numpy as np
 import pandas as pd
+from pathlib import Path
 
 from sklearn.ensemble import RandomForestRegressor
 from sklearn.multioutput import MultiOutputRegressor
@@ -23,11 +25,16 @@ from features.build_features import (
     get_feature_names,
 )
 
+# PATH FIX (allow ai.*)
+sys.path.append(str(Path(__file__).resolve().parents[2]))  # backend/
+
+from ai.db.sensor_dataset import load_sensor_frame
+
 # ======================================================
 # PATHS
 # ======================================================
 
-DATA_CSV = "data/sensor.csv"     # boleh nanti ganti dari DB
+DATA_CSV = os.getenv("SENSOR_DATA", "data/sensor.csv")     # CSV atau folder dataset Parquet
 MODEL_DIR = "models"
 os.makedirs(MODEL_DIR, exist_ok=True)
 
@@ -53,22 +60,9 @@ MIN_ROWS = 72   # minimal 3 hari hourly
 if not os.path.exists(DATA_CSV):
     raise SystemExit("❌ data/sensor.csv not found")
 
-df_raw = pd.read_csv(DATA_CSV)
-
-if "ts" not in df_raw.columns:
-    raise SystemExit("❌ CSV must contain 'ts' column")
-
-# robust timestamp parsing
-ts = pd.to_datetime(
-    pd.to_numeric(df_raw["ts"], errors="coerce"),
-    unit="s",
-    utc=True,
-    errors="coerce",
-)
-
-df = df_raw.loc[~ts.isna()].copy()
-df.index = ts.loc[~ts.isna()].dt.tz_convert(None)
-df = df.sort_index()
+# CSV (timestamp parser bersama, epoch / ISO) atau dataset Parquet
+df = load_sensor_frame(DATA_CSV, columns=BASE_COLS)
+df.index = df.index.tz_convert(None)
 
 # ensure columns exist
 for c in BASE_COLS:
@@ -21,7 +21,8 @@ from xgboost import XGBRegressor
 # ======================================================
 
 BASE_DIR = os.path.dirname(os.path.abspath(__file__))
-DATA_CSV = os.path.join(BASE_DIR, "..", "data", "sensor_clean.csv")
+# CSV atau folder dataset Parquet (ai/db/sensor_dataset.py)
+DATA_CSV = os.getenv("SENSOR_DATA", os.path.join(BASE_DIR, "..", "data", "sensor_clean.csv"))
 MODEL_DIR = os.path.join(BASE_DIR, "..", "models")
 os.makedirs(MODEL_DIR, exist_ok=True)
 
@@ -49,6 +50,7 @@ TARGET_COLS = [
 # ======================================================
 
 from ai.features.build_features import build_features, get_feature_names
+from ai.db.sensor_dataset import load_sensor_frame
 
 # ======================================================
 # LOAD CSV
@@ -59,42 +61,9 @@ def load_csv(path: str) -> pd.DataFrame:
         raise FileNotFoundError(f"CSV not found: {path}")
 
     print(f"📥 Loading CSV: {path}")
-    df = pd.read_csv(path)
+    df = load_sensor_frame(path, columns=TARGET_COLS)
     print(f"✅ Rows loaded: {len(df)}")
 
-    if "ts" not in df.columns:
-        raise RuntimeError("CSV must contain 'ts' column")
-
-    ts_raw = df["ts"].astype(str).str.strip()
-
-    # Try numeric parsing first
-    ts_num = pd.to_numeric(ts_raw, errors="coerce")
-
-    if ts_num.notna().sum() > 0:
-        sample = ts_num.dropna().iloc[0]
-
-        # Detect unit by magnitude
-        if sample > 1e18:
-            unit = "ns"
-        elif sample > 1e15:
-            unit = "us"
-        elif sample > 1e12:
-            unit = "ms"
-        else:
-            unit = "s"
-
-        print(f"🕒 Parsed ts as numeric ({unit})")
-        df["timestamp"] = pd.to_datetime(ts_num, unit=unit, utc=True)
-
-    else:
-        # Fallback: ISO datetime string
-        print("🕒 Parsed ts as datetime string")
-        df["timestamp"] = pd.to_datetime(ts_raw, errors="coerce", utc=True)
-
-    # Drop invalid timestamps
-    df = df.dropna(subset=["timestamp"])
-    df = df.set_index("timestamp").sort_index()
-
     print(f"⏱️  Time range: {df.index.min()} → {df.index.max()}")
 
     return df
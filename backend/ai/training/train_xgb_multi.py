@@ -1,10 +1,16 @@
 # train_xgb_multi.py — multi-horizon, tiny-mode friendly (per-minute)
-import os, joblib, argparse
+import os, sys, joblib, argparse
+from pathlib import Path
 import numpy as np
 import pandas as pd
 from sklearn.multioutput import MultiOutputRegressor
 from xgboost import XGBRegressor
 
+# PATH FIX (allow ai.*)
+sys.path.append(str(Path(__file__).resolve().parents[2]))  # backend/
+
+from ai.db.sensor_dataset import load_sensor_frame
+
 # ===================== CLI & CONFIG =====================
 ap = argparse.ArgumentParser()
 ap.add_argument("--H", type=int, default=10080, help="horizon menit (default 10080 = 1 minggu).")
@@ -12,7 +18,7 @@ ap.add_argument("--tiny-ok", action="store_true",
                 help="izinkan training walau data super pendek (untuk uji pipeline). "
                      "Model akan tetap disimpan walau akurasi tidak optimal.")
 ap.add_argument("--data", default=os.path.join("data", "sensor.csv"),
-                help="path CSV input (default: data/sensor.csv)")
+                help="path CSV input atau folder dataset Parquet (default: data/sensor.csv)")
 ap.add_argument("--lookback-days", type=int, default=365,
                 help="batas maksimal histori yang dipakai (default 365 hari)")
 ap.add_argument("--use-gpu", action="store_true", help="pakai GPU (tree_method=gpu_hist) jika tersedia")
@@ -34,25 +40,9 @@ print(">>> DEBUG args:", {"H": H, "tiny_ok": TINY_OK, "data": DATA_CSV, "lookbac
 if not os.path.exists(DATA_CSV):
     raise SystemExit(f"data file not found: {DATA_CSV}")
 
-df0 = pd.read_csv(DATA_CSV)
-assert "ts" in df0.columns or df0.index.name == "ts", "sensor.csv harus punya kolom 'ts'"
-
-# parse timestamp: dukung epoch detik atau ISO
-if "ts" in df0.columns:
-    ts_raw = df0["ts"]
-    ts_num = pd.to_numeric(ts_raw, errors="coerce")
-    idx_num = pd.to_datetime(ts_num, unit="s", utc=True)
-    idx_iso = pd.to_datetime(ts_raw, utc=True, errors="coerce")
-    idx = idx_iso.fillna(idx_num)
-else:
-    idx = pd.to_datetime(df0.index, unit="s", utc=True)
-
-idx = pd.DatetimeIndex(idx)
-if idx.tz is not None:
-    idx = idx.tz_convert("UTC")
-idx = idx.tz_localize(None)
-
-df0 = df0.set_index(idx).drop(columns=[c for c in df0.columns if c == "ts"]).sort_index()
+# CSV atau dataset Parquet; lookback dipush-down ke reader (hanya partisi/hari yang relevan)
+df0 = load_sensor_frame(DATA_CSV, last_days=LOOKBACK_DAYS, columns=BASE_COLS)
+df0.index = df0.index.tz_convert("UTC").tz_localize(None)
 
 # ===================== RESAMPLE 1min & LIMIT LOOKBACK =====================
 df = (
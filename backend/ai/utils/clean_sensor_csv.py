@@ -2,11 +2,20 @@
 """
 ai/utils/clean_sensor_csv.py - FIXED VERSION
 Properly handles Unix timestamp (seconds)
+
+Loads the whole file; for large exports use the chunked Parquet variant
+ai/utils/clean_sensor_stream.py.
 """
 
+import sys
 import pandas as pd
 from pathlib import Path
 
+# PATH FIX (allow ai.*)
+sys.path.append(str(Path(__file__).resolve().parents[2]))  # backend/
+
+from ai.utils.timestamps import parse_timestamps
+
 # ----------------------------------
 # PATH RESOLUTION
 # ----------------------------------
@@ -44,43 +53,16 @@ if "ts" not in df.columns:
 # ----------------------------------
 print("\n⏰ Parsing timestamps...")
 
-ts_raw = df["ts"]
-
-# Try to detect if numeric (Unix timestamp)
-ts_numeric = pd.to_numeric(ts_raw, errors="coerce")
-numeric_count = ts_numeric.notna().sum()
-
-if numeric_count > len(df) * 0.8:  # Majority numeric
-    print(f"✅ Detected numeric timestamps: {numeric_count}/{len(df)}")
-    
-    sample = ts_numeric.dropna().iloc[0]
-    print(f"   Sample value: {sample:.0f}")
-    
-    # Detect unit by magnitude
-    if sample > 1e18:
-        unit = "ns"
-        unit_name = "nanoseconds"
-    elif sample > 1e15:
-        unit = "us"
-        unit_name = "microseconds"
-    elif sample > 1e12:
-        unit = "ms"
-        unit_name = "milliseconds"
-    elif sample > 1e9:
-        unit = "s"
-        unit_name = "seconds"
-    else:
-        raise ValueError(f"Timestamp value too small: {sample}")
-    
-    print(f"   Detected unit: {unit_name}")
-    
-    # Parse with correct unit
-    df["ts"] = pd.to_datetime(ts_numeric, unit=unit, utc=True, errors="coerce")
-    
+# Satu pass vectorized: unit/format dideteksi dari sample (ai/utils/timestamps.py)
+ts_info = {}
+df["ts"] = parse_timestamps(df["ts"], info=ts_info)
+
+if ts_info["kind"] == "epoch":
+    print(f"✅ Detected numeric timestamps, unit: {ts_info['unit']}")
 else:
-    # Try parsing as datetime string
-    print("✅ Attempting string datetime parsing...")
-    df["ts"] = pd.to_datetime(ts_raw, utc=True, errors="coerce")
+    print(f"✅ Detected string timestamps, format: {ts_info['format']}")
+if ts_info["n_fallback"]:
+    print(f"   {ts_info['n_fallback']} rows needed the fallback parser")
 
 # ----------------------------------
 # VALIDATE
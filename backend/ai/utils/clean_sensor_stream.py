@@ -0,0 +1,266 @@
+#!/usr/bin/env python3
+"""
+clean_sensor_stream.py
+======================
+Streaming version of clean_sensor_csv.py / training/prep_data.py:
+raw CSV export → cleaned, typed Parquet dataset (ai/db/sensor_dataset.py)
+partitioned by device and UTC day, in bounded memory.
+
+Per chunk of CHUNK_ROWS:
+1. normalize columns (strip spaces / trailing ';'), parse ts (shared
+   parser, format detected once), coerce numerics, drop rows without ts
+2. merge with the carry-over rows, sort by (device, ts), drop duplicate
+   (device, ts) keeping the last
+3. per device, rows older than that device's watermark (its newest ts -
+   REORDER_SEC, floored to the resample step) are final and written;
+   newer rows are carried into the next chunk so small reorderings
+   across chunk boundaries are still sorted and deduplicated. Rows
+   arriving below their device's watermark (too late) are counted and
+   dropped. Watermarks are per device so exports sorted by device (all
+   of device A, then all of device B) are not dropped as late, and each
+   device's (device, day) partitions are closed against its own
+   watermark, so a device that stops reporting does not keep the other
+   devices' partitions buffered.
+4. optional --resample (e.g. 1min, like prep_data.py): per-device means
+   per bucket, gaps interpolated from the last written row of the
+   previous chunk (carried as state)
+
+State between chunks is only the carry-over window plus one row per
+device, so memory does not grow with the file.
+
+Run:
+    python -m ai.utils.clean_sensor_stream
+    python -m ai.utils.clean_sensor_stream --input data/sensor_raw.csv --resample 1min
+"""
+
+from __future__ import annotations
+import argparse
+import os
+import resource
+import time
+from typing import Dict, Optional
+
+import numpy as np
+import pandas as pd
+
+from ai.db.sensor_dataset import DATASET_DIR, PartitionWriter
+from ai.db.sensor_hourly import BASE_COLS
+from ai.utils.timestamps import parse_timestamps
+
+# ======================================================
+# CONFIG
+# ======================================================
+
+INPUT_CSV = os.path.abspath(
+    os.path.join(os.path.dirname(__file__), "..", "data", "sensor_raw.csv")
+)
+
+CHUNK_ROWS = int(os.getenv("CLEAN_CHUNK_ROWS", "200000"))
+REORDER_SEC = int(os.getenv("CLEAN_REORDER_SEC", "300"))
+DEFAULT_DEVICE = "esp32-01"
+
+COLS = ["device_id", "ts"] + BASE_COLS
+
+
+# ======================================================
+# CLEANER
+# ======================================================
+
+class StreamCleaner:
+    def __init__(self, reorder_sec: int = REORDER_SEC, resample: Optional[str] = None):
+        self.reorder = pd.Timedelta(seconds=reorder_sec)
+        self.step = pd.Timedelta(resample) if resample else None
+
+        self._carry = pd.DataFrame(columns=COLS)          # baris belum final, semua device
+        self._last_row: Dict[str, pd.DataFrame] = {}   # resample: bucket terakhir per device
+        self.watermarks: Dict[str, pd.Timestamp] = {}  # per device
+
+        # metrics
+        self.rows_in = 0
+        self.invalid_ts = 0
+        self.duplicates = 0
+        self.late = 0
+        self.late_by_device: Dict[str, int] = {}
+        self.rows_out = 0
+
+    @property
+    def watermark(self) -> Optional[pd.Timestamp]:
+        """Lowest device watermark (summary only; partitions close per device)."""
+        return min(self.watermarks.values()) if self.watermarks else None
+
+    # --------------------------------------------------
+    # normalize
+    # --------------------------------------------------
+    def _normalize(self, chunk: pd.DataFrame) -> pd.DataFrame:
+        chunk = chunk.rename(columns=lambda c: str(c).strip().strip(";"))
+        if "ts" not in chunk.columns:
+            raise ValueError("❌ Column 'ts' not found!")
+
+        out = pd.DataFrame({"ts": parse_timestamps(chunk["ts"])}, index=chunk.index)
+        if "device_id" in chunk.columns:
+            out["device_id"] = chunk["device_id"].astype("str").str.strip().str.rstrip(";")
+            out["device_id"] = out["device_id"].where(chunk["device_id"].notna(), DEFAULT_DEVICE)
+        else:
+            out["device_id"] = DEFAULT_DEVICE
+        for c in BASE_COLS:
+            out[c] = pd.to_numeric(chunk[c], errors="coerce") if c in chunk.columns else np.nan
+
+        self.rows_in += len(out)
+        valid = out["ts"].notna()
+        self.invalid_ts += int((~valid).sum())
+        return out.loc[valid, COLS]
+
+    # --------------------------------------------------
+    # push / flush
+    # --------------------------------------------------
+    def push(self, chunk: pd.DataFrame) -> pd.DataFrame:
+        """Add a raw chunk; return the rows that are now final."""
+        df = self._normalize(chunk)
+        if self.watermarks:
+            late = df["ts"] < df["device_id"].map(self.watermarks)   # device baru: NaT → tidak telat
+            if late.any():
+                counts = df.loc[late, "device_id"].value_counts()
+                for dev, n in counts.items():
+                    self.late_by_device[dev] = self.late_by_device.get(dev, 0) + int(n)
+                self.late += int(counts.sum())
+                df = df.loc[~late]
+
+        df = pd.concat([self._carry, df], ignore_index=True) if len(self._carry) else df
+        if df.empty:
+            return df
+        df = self._dedup(df)
+
+        wm = df.groupby("device_id", sort=False)["ts"].max() - self.reorder
+        wm = wm.dt.floor(self.step) if self.step is not None else wm
+        if self.watermarks:
+            old = wm.index.map(self.watermarks)                    # watermark tidak pernah mundur
+            wm = wm.where(old.isna() | (wm.to_numpy() > old), old)
+        self.watermarks.update(wm.to_dict())
+
+        final = df["ts"] < df["device_id"].map(self.watermarks)
+        self._carry = df.loc[~final].reset_index(drop=True)
+        return self._emit(df.loc[final])
+
+    def flush(self) -> pd.DataFrame:
+        df, self._carry = self._carry, pd.DataFrame(columns=COLS)
+        return self._emit(df) if len(df) else df
+
+    def _dedup(self, df: pd.DataFrame) -> pd.DataFrame:
+        df = df.sort_values(["device_id", "ts"], kind="stable")
+        before = len(df)
+        df = df.drop_duplicates(["device_id", "ts"], keep="last")
+        self.duplicates += before - len(df)
+        return df
+
+    def _emit(self, df: pd.DataFrame) -> pd.DataFrame:
+        if self.step is not None and len(df):
+            df = pd.concat(
+                [self._resample(dev, part) for dev, part in df.groupby("device_id", sort=False)],
+                ignore_index=True,
+            )
+        self.rows_out += len(df)
+        return df
+
+    def _resample(self, device_id: str, part: pd.DataFrame) -> pd.DataFrame:
+        buckets = part.groupby(part["ts"].dt.floor(self.step))[BASE_COLS].mean()
+        prev = self._last_row.get(device_id)
+        start = prev.index[0] if prev is not None else buckets.index[0]
+        grid = pd.date_range(start, buckets.index[-1], freq=self.step)
+
+        filled = buckets.reindex(grid)
+        if prev is not None:
+            filled.iloc[0] = prev.iloc[0]
+        filled = filled.interpolate(limit_direction="both")
+        if prev is not None:
+            filled = filled.iloc[1:]            # baris carry sudah ditulis chunk sebelumnya
+
+        self._last_row[device_id] = filled.iloc[[-1]]
+        out = filled.rename_axis("ts").reset_index()
+        out.insert(0, "device_id", device_id)
+        return out
+
+    def metrics(self) -> dict:
+        return {
+            "rows_in": self.rows_in,
+            "rows_out": self.rows_out,
+            "invalid_ts": self.invalid_ts,
+            "duplicates": self.duplicates,
+            "late": self.late,
+            "late_by_device": dict(self.late_by_device),
+            "carry": len(self._carry),
+        }
+
+
+# ======================================================
+# RUN
+# ======================================================
+
+def _write(writer: PartitionWriter, df: pd.DataFrame) -> None:
+    for dev, part in df.groupby("device_id", sort=False):
+        writer.write(dev, part)
+
+
+def clean_to_dataset(
+    input_csv: str = INPUT_CSV,
+    out_dir: str = DATASET_DIR,
+    chunk_rows: int = CHUNK_ROWS,
+    reorder_sec: int = REORDER_SEC,
+    resample: Optional[str] = None,
+) -> dict:
+    cleaner = StreamCleaner(reorder_sec, resample)
+    writer = PartitionWriter(out_dir)
+    t0 = time.perf_counter()
+    chunks = 0
+
+    try:
+        for chunk in pd.read_csv(input_csv, chunksize=chunk_rows):
+            _write(writer, cleaner.push(chunk))
+            # tiap device ditutup per watermark-nya sendiri: device yang berhenti
+            # kirim tidak menahan partisi device lain di memori
+            for dev, wm in cleaner.watermarks.items():
+                writer.close_before(wm, dev)
+            chunks += 1
+            del chunk
+        _write(writer, cleaner.flush())
+    finally:
+        writer.close()
+
+    seconds = time.perf_counter() - t0
+    return {
+        **cleaner.metrics(),
+        **writer.metrics(),
+        "chunks": chunks,
+        "seconds": seconds,
+        "rows_per_sec": cleaner.rows_in / seconds if seconds > 0 else 0.0,
+    }
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--input", default=INPUT_CSV)
+    ap.add_argument("--out", default=DATASET_DIR)
+    ap.add_argument("--chunk-rows", type=int, default=CHUNK_ROWS)
+    ap.add_argument("--reorder-sec", type=int, default=REORDER_SEC)
+    ap.add_argument("--resample", default=None, help="e.g. 1min (mean + interpolate, like prep_data.py)")
+    args = ap.parse_args()
+
+    if not os.path.exists(args.input):
+        raise FileNotFoundError(f"❌ CSV not found: {args.input}")
+
+    print("=" * 70)
+    print("🧹 SENSOR CSV STREAM CLEANER")
+    print("=" * 70)
+    print(f"📂 Input : {args.input}")
+    print(f"📂 Output: {args.out}")
+
+    stats = clean_to_dataset(args.input, args.out, args.chunk_rows, args.reorder_sec, args.resample)
+
+    print(f"✅ {stats['rows_in']:,} rows in → {stats['rows_out']:,} rows out "
+          f"({stats['rows_per_sec']:,.0f} rows/s, {stats['chunks']} chunks)")
+    print(f"   invalid ts={stats['invalid_ts']} duplicates={stats['duplicates']} late={stats['late']}")
+    print(f"   {stats['files']} parquet files, {stats['row_groups']} row groups")
+    print(f"📊 peak RSS: {resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024:.0f} MB")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,298 @@
+#!/usr/bin/env python3
+"""
+forecast_export.py
+==================
+One export stage for forecast files (CSV / Parquet / JSON), used instead
+of the dedup -> copy -> reset_index -> tz_localize/tz_convert -> to_csv
+chain that every forecast script repeated for its UTC, WIB and WIB-naive
+variants.
+
+`forecast_frame(ts_utc, series)` builds ONE frame with every time column
+the exports need, converted once and vectorized:
+
+    timestamp_utc         naive UTC (as produced by the models)
+    timestamp_wib         tz-aware Asia/Jakarta (+07:00)
+    timestamp_wib_naive   WIB wall time without tz (plots, old CSVs)
+    ts_epoch_utc          int64 seconds
+    <series>              forecast values, unchanged dtype
+
+Duplicate timestamps are dropped (first wins) and rows sorted only when
+the input is not already strictly increasing.
+
+`export_forecast(frame, outputs, formats)` writes every output in every
+requested format in one job: each output is a path stem plus a column
+selection/rename of the same frame (no per-variant copies; Parquet uses
+one Arrow table for all outputs). The job runs on a single background
+thread (FORECAST_EXPORT_BACKGROUND=1), so the caller continues with
+plotting / DB / MQTT while the files are written; `wait_exports()` (and
+interpreter exit) wait for pending jobs.
+
+Env:
+    FORECAST_EXPORT_FORMATS      comma list of csv,parquet,json (csv)
+    FORECAST_EXPORT_BACKGROUND   1 = write on the export thread (1)
+
+Used by:
+- mqtt/forecast_mqtt_xgb_multi.py
+- ai/training/predict_hourly_recursive.py, train_predict_hourly_fix.py
+
+Run:
+    python -m ai.utils.forecast_export --points 10080
+"""
+
+from __future__ import annotations
+import argparse
+import contextlib
+import io
+import os
+import tempfile
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Dict, List, Mapping, Sequence, Union
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+# ======================================================
+# CONFIG
+# ======================================================
+
+WIB = "Asia/Jakarta"
+EXTENSIONS = {"csv": ".csv", "parquet": ".parquet", "json": ".json"}
+
+FORMATS = tuple(
+    f.strip().lower() for f in os.getenv("FORECAST_EXPORT_FORMATS", "csv").split(",") if f.strip()
+)
+BACKGROUND = os.getenv("FORECAST_EXPORT_BACKGROUND", "1") == "1"
+
+# output stem -> kolom (list nama, atau {nama_output: kolom_frame})
+Outputs = Mapping[str, Union[Sequence[str], Mapping[str, str]]]
+
+
+# ======================================================
+# FRAME
+# ======================================================
+
+def forecast_frame(ts_utc, series: Mapping[str, object]) -> pd.DataFrame:
+    """Forecast timestamps (naive or aware UTC) + series -> export frame."""
+    ts = pd.DatetimeIndex(ts_utc)
+    if ts.tz is not None:
+        ts = ts.tz_convert(None)
+    values = {name: np.asarray(series[name]) for name in series}
+
+    # unik & terurut; jalur cepat kalau sudah strictly increasing (kasus normal)
+    ns = ts.asi8
+    if len(ns) > 1 and not (np.diff(ns) > 0).all():
+        _, first = np.unique(ns, return_index=True)
+        ts = ts[first]
+        values = {name: v[first] for name, v in values.items()}
+
+    wib = ts.tz_localize("UTC").tz_convert(WIB)   # hanya ganti dtype, nilai tetap UTC
+    return pd.DataFrame({
+        "timestamp_utc": ts,
+        "timestamp_wib": wib,
+        "timestamp_wib_naive": wib.tz_localize(None),   # satu-satunya konversi wall time
+        "ts_epoch_utc": ts.as_unit("s").asi8,
+        **values,
+    }, copy=False)
+
+
+def _columns(spec) -> Dict[str, str]:
+    return dict(spec) if isinstance(spec, Mapping) else {c: c for c in spec}
+
+
+# ======================================================
+# WRITERS
+# ======================================================
+
+def _wib_text(frame: pd.DataFrame) -> pd.Series:
+    """
+    timestamp_wib as text ("2025-11-18 21:00:00+07:00"). pandas formats
+    tz-aware values one by one (~15x slower than naive), so with a constant
+    offset (WIB: always +07:00) the naive wall time is formatted and the
+    offset appended once.
+    """
+    off = np.unique(frame["timestamp_wib_naive"].to_numpy().astype("M8[s]").astype(np.int64)
+                    - frame["timestamp_utc"].to_numpy().astype("M8[s]").astype(np.int64))
+    if len(off) != 1:
+        return frame["timestamp_wib"].astype(str)
+    sec = int(off[0])
+    suffix = f"{'-' if sec < 0 else '+'}{abs(sec) // 3600:02d}:{abs(sec) % 3600 // 60:02d}"
+    return frame["timestamp_wib_naive"].astype(str) + suffix
+
+
+def _write_csv(frame: pd.DataFrame, path: str, cols: Dict[str, str]) -> None:
+    frame.to_csv(path, columns=list(cols.values()), header=list(cols), index=False)
+
+
+def _write_json(frame: pd.DataFrame, path: str, cols: Dict[str, str]) -> None:
+    part = frame[list(cols.values())].set_axis(list(cols), axis=1)
+    # waktu sebagai teks yang sama dengan CSV (to_json mengubah tz-aware ke UTC "Z")
+    for c in part.columns:
+        if part[c].dtype.kind == "M":
+            part[c] = part[c].astype(str)
+    part.to_json(path, orient="records")
+
+
+def _write_parquet(table: pa.Table, path: str, cols: Dict[str, str]) -> None:
+    pq.write_table(table.select(list(cols.values())).rename_columns(list(cols)), path)
+
+
+def write_outputs(frame: pd.DataFrame, outputs: Outputs, formats: Sequence[str] = FORMATS,
+                  preview: Sequence[str] = (), label: str = "") -> List[str]:
+    """Write every output x format now (caller's thread); returns the written paths."""
+    formats = [f for f in formats if f in EXTENSIONS] or ["csv"]
+    table = pa.Table.from_pandas(frame, preserve_index=False) if "parquet" in formats else None
+    if "csv" in formats or "json" in formats:
+        text = frame.assign(timestamp_wib=_wib_text(frame))   # teks WIB dibuat sekali untuk semua output
+
+    written = []
+    for stem, spec in outputs.items():
+        cols = _columns(spec)
+        os.makedirs(os.path.dirname(stem) or ".", exist_ok=True)
+        for fmt in formats:
+            path = stem + EXTENSIONS[fmt]
+            if fmt == "csv":
+                _write_csv(text, path, cols)
+            elif fmt == "json":
+                _write_json(text, path, cols)
+            else:
+                _write_parquet(table, path, cols)
+            written.append(path)
+            print(f"✅ saved: {path} ({label + ', ' if label else ''}rows={len(frame)})")
+
+    if preview:
+        print_daily(frame, preview)
+    return written
+
+
+def print_daily(frame: pd.DataFrame, cols: Sequence[str], rows: int = 24) -> None:
+    """Preview the first `rows` rows of every WIB day (slices, no groupby)."""
+    day = frame["timestamp_wib_naive"].to_numpy().astype("M8[D]")
+    starts = np.flatnonzero(np.r_[True, day[1:] != day[:-1]])
+    for s in starts:
+        g = frame.iloc[s:s + rows].set_index("timestamp_wib")
+        g = g[g["timestamp_wib_naive"].to_numpy().astype("M8[D]") == day[s]]
+        print(f"\n=== {day[s]} (WIB) ===")
+        print(g[list(cols)])
+
+
+# ======================================================
+# BACKGROUND
+# ======================================================
+
+_pool = ThreadPoolExecutor(max_workers=1, thread_name_prefix="forecast-export")
+_pending: List[Future] = []
+
+
+def _run(frame, outputs, formats, preview, label) -> List[str]:
+    try:
+        return write_outputs(frame, outputs, formats, preview, label)
+    except Exception as e:
+        print(f"❌ forecast export failed: {e}")
+        raise
+
+
+def export_forecast(frame: pd.DataFrame, outputs: Outputs, formats: Sequence[str] = FORMATS,
+                    preview: Sequence[str] = (), label: str = "",
+                    background: bool = BACKGROUND) -> Future:
+    """
+    Queue one export job (all outputs, all formats). The frame must not be
+    modified afterwards. Returns a Future with the written paths.
+    """
+    if not background:
+        fut: Future = Future()
+        fut.set_result(_run(frame, outputs, formats, preview, label))
+        return fut
+    fut = _pool.submit(_run, frame, outputs, formats, preview, label)
+    _pending[:] = [f for f in _pending if not f.done()] + [fut]
+    return fut
+
+
+def wait_exports(timeout: float = None) -> None:
+    """Block until every queued export is written (errors were already printed)."""
+    for fut in list(_pending):
+        try:
+            fut.result(timeout)
+        except Exception:
+            pass
+    _pending.clear()
+
+
+# ======================================================
+# BENCHMARK (old per-variant chain vs one export job)
+# ======================================================
+
+def _legacy_export(df_out: pd.DataFrame, out_dir: str) -> None:
+    """Old save_csv_and_print_daily + training tail, for comparison."""
+    df_out = df_out[~df_out.index.duplicated(keep="first")].sort_index()
+    df_out.to_csv(os.path.join(out_dir, "legacy_utc.csv"))
+    df_wib = df_out.copy()
+    df_wib.index = df_wib.index.tz_localize("UTC").tz_convert(WIB)
+    df_wib.index.name = "timestamp_wib"
+    df_wib_csv = df_wib.reset_index()
+    df_wib_csv["timestamp_utc"] = df_wib_csv["timestamp_wib"].dt.tz_convert("UTC").dt.tz_localize(None)
+    df_wib_csv.to_csv(os.path.join(out_dir, "legacy_wib.csv"), index=False)
+    df_naive = df_wib_csv.copy()
+    df_naive["timestamp_wib"] = pd.to_datetime(df_naive["timestamp_wib"]).dt.tz_convert(WIB).dt.tz_localize(None)
+    df_naive.to_csv(os.path.join(out_dir, "legacy_wib_naive.csv"), index=False)
+    for day, g in df_wib.groupby(df_wib.index.date):
+        print(f"\n=== {day} (WIB) ===")
+        print(g[["temp_c_pred", "tvoc_ppb_pred"]].head(24))
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--points", type=int, default=10080)
+    ap.add_argument("--rounds", type=int, default=10)
+    args = ap.parse_args()
+
+    rng = np.random.default_rng(0)
+    ts = pd.Timestamp("2025-11-18 14:00") + pd.to_timedelta(np.arange(1, args.points + 1), "min")
+    series = {
+        "temp_c_pred": (27 + rng.normal(0, 1, args.points)).astype(np.float32),
+        "tvoc_ppb_pred": (390 + rng.normal(0, 20, args.points)).astype(np.float32),
+    }
+    preds = list(series)
+
+    with tempfile.TemporaryDirectory() as out_dir:
+        outputs = {
+            os.path.join(out_dir, "utc"): ["timestamp_utc", "ts_epoch_utc", *preds],
+            os.path.join(out_dir, "wib"): ["timestamp_wib", "timestamp_utc", "ts_epoch_utc", *preds],
+            os.path.join(out_dir, "wib_naive"): {"timestamp": "timestamp_wib_naive", **{p: p for p in preds}},
+        }
+        df_legacy = pd.DataFrame({"ts_epoch_utc": ts.as_unit("s").asi8, **series},
+                                 index=pd.Index(ts, name="timestamp_utc"))
+
+        legacy_ms, frame_ms, sync_ms, all_ms = [], [], [], []
+        quiet = contextlib.redirect_stdout(io.StringIO())     # tanpa log "saved" / preview
+        for _ in range(args.rounds):
+            with quiet:
+                t0 = time.perf_counter()
+                _legacy_export(df_legacy, out_dir)
+                legacy_ms.append((time.perf_counter() - t0) * 1e3)
+
+                t0 = time.perf_counter()
+                frame = forecast_frame(ts, series)
+                fut = export_forecast(frame, outputs, ("csv",), preview=preds, background=True)
+                frame_ms.append((time.perf_counter() - t0) * 1e3)
+                fut.result()
+                sync_ms.append((time.perf_counter() - t0) * 1e3)
+
+                t0 = time.perf_counter()
+                export_forecast(forecast_frame(ts, series), outputs, ("csv", "parquet", "json"),
+                                preview=preds, background=True).result()
+                all_ms.append((time.perf_counter() - t0) * 1e3)
+
+    print("=" * 70)
+    print(f"💾 FORECAST EXPORT ({args.points} points, 3 variants, {args.rounds} rounds, median)")
+    print("=" * 70)
+    print(f"old chain, 3 CSV              : {np.median(legacy_ms):7.1f} ms (caller blocked)")
+    print(f"export stage, 3 CSV           : {np.median(sync_ms):7.1f} ms total, "
+          f"caller blocked {np.median(frame_ms):.1f} ms")
+    print(f"export stage, CSV+Parquet+JSON: {np.median(all_ms):7.1f} ms total")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,293 @@
+#!/usr/bin/env python3
+"""
+forecast_payload.py
+===================
+Compact, chunked MQTT payload for forecast batches (replaces the JSON
+{"generated_at", "forecast": [{ts, temp_c_pred, tvoc_ppb_pred}, ...]}).
+
+A forecast is a base timestamp + step plus one float32 array per series,
+so the timestamps are not sent at all. The arrays are cut into chunks of
+at most FORECAST_CHUNK_BYTES; every chunk is self-describing:
+
+    header  "<3sBIIIiIIHHHB" (35 bytes, little-endian)
+            magic b"AQF", version, forecast_id, generated_at, base_ts,
+            step_sec, n_points, offset, count, seq, total, n_series
+    names   uint8 length + utf-8 "temp_c_pred,tvoc_ppb_pred"
+    values  n_series x count float32 (series-major)
+
+Point i of the forecast has ts = base_ts + i * step_sec. The payload
+never starts with "{", so JSON-only subscribers (payload_decode.py)
+skip it.
+
+`ForecastAssembler` puts the chunks back together per (topic, forecast_id)
+in any order, ignores duplicates (QoS 1 redelivery) and drops incomplete
+forecasts after FORECAST_ASSEMBLY_TTL seconds.
+
+Used by:
+- mqtt/forecast_publisher.py (encode), mqtt/forecast_mqtt_xgb_multi.py
+- mqtt/mqtt_tail_forecast.py, ai/training/eval_live.py (reassemble)
+
+Run:
+    python -m ai.utils.forecast_payload      # size/speed vs JSON
+"""
+
+from __future__ import annotations
+import json
+import os
+import struct
+import time
+from collections import OrderedDict
+from typing import Dict, List, Mapping, Optional
+
+import numpy as np
+
+# ======================================================
+# CONFIG
+# ======================================================
+
+MAGIC = b"AQF"
+VERSION = 1
+
+CHUNK_BYTES = int(os.getenv("FORECAST_CHUNK_BYTES", "8192"))
+ASSEMBLY_TTL = float(os.getenv("FORECAST_ASSEMBLY_TTL", "120"))
+MAX_PENDING = 64
+
+_HEAD = struct.Struct("<3sBIIIiIIHHHB")
+_MAX_COUNT = 0xFFFF
+
+
+# ======================================================
+# ENCODE / DECODE
+# ======================================================
+
+def encode_forecast(
+    base_ts: int,
+    step_sec: int,
+    series: Mapping[str, np.ndarray],
+    generated_at: Optional[int] = None,
+    forecast_id: Optional[int] = None,
+    max_bytes: int = CHUNK_BYTES,
+) -> List[bytes]:
+    """Forecast arrays -> list of chunk payloads, each at most `max_bytes`."""
+    names = list(series)
+    values = np.vstack([np.asarray(series[n], dtype="<f4") for n in names])
+    n_series, n_points = values.shape
+    name_bytes = ",".join(names).encode()
+    if len(name_bytes) > 255:
+        raise ValueError("series names longer than 255 bytes")
+
+    fixed = _HEAD.size + 1 + len(name_bytes)
+    per_chunk = min(_MAX_COUNT, (max_bytes - fixed) // (4 * n_series))
+    if per_chunk < 1:
+        raise ValueError(f"max_bytes={max_bytes} too small for {n_series} series")
+
+    total = max(1, -(-n_points // per_chunk))
+    if total > _MAX_COUNT:
+        raise ValueError(f"{n_points} points need {total} chunks (> {_MAX_COUNT})")
+
+    if generated_at is None:
+        generated_at = int(time.time())
+    if forecast_id is None:
+        forecast_id = int.from_bytes(os.urandom(4), "little")
+
+    chunks = []
+    for seq in range(total):
+        offset = seq * per_chunk
+        part = values[:, offset:offset + per_chunk]
+        head = _HEAD.pack(MAGIC, VERSION, forecast_id, int(generated_at), int(base_ts),
+                          int(step_sec), n_points, offset, part.shape[1], seq, total, n_series)
+        chunks.append(head + bytes([len(name_bytes)]) + name_bytes + np.ascontiguousarray(part).tobytes())
+    return chunks
+
+
+def is_forecast_chunk(payload: bytes) -> bool:
+    return payload[:3] == MAGIC
+
+
+def decode_chunk(payload: bytes) -> dict:
+    """One chunk -> header fields + {"names", "values" (n_series x count float32)}."""
+    if len(payload) < _HEAD.size + 1 or not is_forecast_chunk(payload):
+        raise ValueError("not a forecast chunk")
+    (magic, version, forecast_id, generated_at, base_ts, step_sec,
+     n_points, offset, count, seq, total, n_series) = _HEAD.unpack_from(payload)
+    if version != VERSION:
+        raise ValueError(f"unsupported forecast chunk version {version}")
+
+    pos = _HEAD.size
+    name_len = payload[pos]
+    names = payload[pos + 1:pos + 1 + name_len].decode().split(",")
+    pos += 1 + name_len
+    if len(names) != n_series or len(payload) != pos + 4 * n_series * count:
+        raise ValueError("forecast chunk size does not match its header")
+    if offset + count > n_points or seq >= total:
+        raise ValueError("forecast chunk offset/seq out of range")
+
+    return {
+        "forecast_id": forecast_id,
+        "generated_at": generated_at,
+        "base_ts": base_ts,
+        "step_sec": step_sec,
+        "n_points": n_points,
+        "offset": offset,
+        "count": count,
+        "seq": seq,
+        "total": total,
+        "names": names,
+        "values": np.frombuffer(payload, dtype="<f4", offset=pos).reshape(n_series, count),
+    }
+
+
+def to_points(forecast: dict) -> List[dict]:
+    """Assembled forecast -> legacy list [{"ts", <series>: value, ...}]."""
+    cols = [(name, arr.tolist()) for name, arr in forecast["series"].items()]
+    return [
+        {"ts": ts, **{name: vals[i] for name, vals in cols}}
+        for i, ts in enumerate(forecast["ts"].tolist())
+    ]
+
+
+def to_legacy_json(forecast: dict, freq: str = "1min") -> bytes:
+    """Same batch in the old single JSON message format (for size comparison)."""
+    return json.dumps({
+        "generated_at": forecast["generated_at"],
+        "freq": freq,
+        "forecast": to_points(forecast),
+    }).encode()
+
+
+# ======================================================
+# REASSEMBLY
+# ======================================================
+
+class _Pending:
+    __slots__ = ("head", "values", "seen", "first_seen")
+
+    def __init__(self, chunk: dict):
+        self.head = {k: chunk[k] for k in ("forecast_id", "generated_at", "base_ts", "step_sec",
+                                           "n_points", "total", "names")}
+        self.values = np.full((len(chunk["names"]), chunk["n_points"]), np.nan, dtype=np.float32)
+        self.seen = set()
+        self.first_seen = time.monotonic()
+
+
+class ForecastAssembler:
+    """Collect chunks per (key, forecast_id); `add` returns the forecast once complete."""
+
+    def __init__(self, ttl_sec: float = ASSEMBLY_TTL, max_pending: int = MAX_PENDING):
+        self.ttl = ttl_sec
+        self.max_pending = max_pending
+        self._pending: Dict[tuple, _Pending] = {}
+        self._done: "OrderedDict[tuple, None]" = OrderedDict()   # id selesai, untuk duplikat telat
+
+        # metrics
+        self.chunks = 0
+        self.completed = 0
+        self.duplicates = 0
+        self.expired = 0
+        self.invalid = 0
+
+    def add(self, payload: bytes, key: str = "") -> Optional[dict]:
+        try:
+            chunk = decode_chunk(payload)
+        except ValueError:
+            self.invalid += 1
+            return None
+        self.chunks += 1
+        self._expire()
+
+        pkey = (key, chunk["forecast_id"])
+        if pkey in self._done:
+            self.duplicates += 1
+            return None
+        p = self._pending.get(pkey)
+        if p is None:
+            if len(self._pending) >= self.max_pending:   # buang yang paling lama
+                oldest = min(self._pending, key=lambda k: self._pending[k].first_seen)
+                del self._pending[oldest]
+                self.expired += 1
+            p = self._pending[pkey] = _Pending(chunk)
+        elif (chunk["n_points"] != p.head["n_points"] or chunk["total"] != p.head["total"]
+              or chunk["names"] != p.head["names"]):
+            self.invalid += 1
+            return None
+
+        if chunk["seq"] in p.seen:
+            self.duplicates += 1
+            return None
+        p.seen.add(chunk["seq"])
+        p.values[:, chunk["offset"]:chunk["offset"] + chunk["count"]] = chunk["values"]
+
+        if len(p.seen) < p.head["total"]:
+            return None
+        del self._pending[pkey]
+        self._done[pkey] = None
+        if len(self._done) > 4 * self.max_pending:
+            self._done.popitem(last=False)
+        self.completed += 1
+        head = p.head
+        return {
+            "forecast_id": head["forecast_id"],
+            "generated_at": head["generated_at"],
+            "base_ts": head["base_ts"],
+            "step_sec": head["step_sec"],
+            "ts": head["base_ts"] + head["step_sec"] * np.arange(head["n_points"], dtype=np.int64),
+            "series": dict(zip(head["names"], p.values)),
+        }
+
+    def _expire(self) -> None:
+        cutoff = time.monotonic() - self.ttl
+        for k in [k for k, p in self._pending.items() if p.first_seen < cutoff]:
+            del self._pending[k]
+            self.expired += 1
+
+    def metrics(self) -> dict:
+        return {
+            "chunks": self.chunks,
+            "completed": self.completed,
+            "pending": len(self._pending),
+            "duplicates": self.duplicates,
+            "expired": self.expired,
+            "invalid": self.invalid,
+        }
+
+
+# ======================================================
+# SELF-TEST / BENCHMARK
+# ======================================================
+
+if __name__ == "__main__":
+    H = 10080
+    rng = np.random.default_rng(0)
+    series = {
+        "temp_c_pred": (27 + rng.normal(0, 1, H)).astype(np.float32),
+        "tvoc_ppb_pred": (390 + rng.normal(0, 20, H)).astype(np.float32),
+    }
+    base_ts = int(time.time()) // 60 * 60 + 60
+
+    t0 = time.perf_counter()
+    chunks = encode_forecast(base_ts, 60, series)
+    t_enc = time.perf_counter() - t0
+
+    asm = ForecastAssembler()
+    t0 = time.perf_counter()
+    out = None
+    for c in reversed(chunks):            # urutan terbalik + duplikat
+        out = asm.add(c) or out
+    asm.add(chunks[0])
+    t_dec = time.perf_counter() - t0
+    assert out is not None and np.array_equal(out["series"]["temp_c_pred"], series["temp_c_pred"])
+    assert out["ts"][-1] == base_ts + 60 * (H - 1)
+
+    t0 = time.perf_counter()
+    legacy = to_legacy_json(out)
+    t_json = time.perf_counter() - t0
+    packed = sum(len(c) for c in chunks)
+
+    print("=" * 70)
+    print(f"📦 FORECAST PAYLOAD ({H} points x {len(series)} series)")
+    print("=" * 70)
+    print(f"JSON   : 1 message, {len(legacy):,} bytes, encode {t_json * 1e3:.1f} ms")
+    print(f"packed : {len(chunks)} chunks <= {CHUNK_BYTES} B, {packed:,} bytes "
+          f"({len(legacy) / packed:.1f}x smaller), encode {t_enc * 1e3:.2f} ms, "
+          f"reassemble {t_dec * 1e3:.2f} ms")
+    print(f"📊 {asm.metrics()}")
@@ -0,0 +1,415 @@
+"""
+bulk_codec.py
+=============
+Request/response formats for /predict/bulk/{model_name}, chosen by
+content negotiation (Content-Type for the request, Accept for the response).
+
+Formats:
+    application/json                      (default) BulkPredictionRequest /
+                                          BulkPredictionResponse
+    application/x-ndjson                  one {"id", "data"} object per line
+                                          in, one {"id", "prediction"} per
+                                          line out (always streamed)
+    application/x-float32                 raw little-endian float32 frames:
+                                          8-byte shape header (uint32 rows,
+                                          uint32 cols), then rows*cols values
+                                          (row-major). No ids: row i = id i.
+                                          Responses are one frame per chunk.
+    application/vnd.apache.arrow.stream   Arrow IPC stream. Features either
+                                          as one FixedSizeList column "data"
+                                          (zero-copy) or as numeric columns in
+                                          feature order; optional "id" column.
+                                          Responses: one record batch per chunk.
+
+Binary bodies are decoded with np.frombuffer / Arrow buffers, so the predict
+matrix is a view on the request bytes (no per-row Python objects). Responses:
+float32 -> frame(s) with cols = outputs; Arrow -> "id" (if sent) and
+"prediction" (float32, FixedSizeList for multi-output models).
+
+Streaming (`spool` + `iter_chunks` + `stream_encoder`): the body is
+spooled (RAM up to BULK_SPOOL_MB, then a temp file), then read back in
+chunks of BULK_CHUNK_ROWS rows and every chunk is encoded as soon as it is
+predicted. NDJSON, float32 and Arrow (per record batch) are read chunk by
+chunk, so memory stays bounded by the chunk size; a JSON body is parsed
+whole (chunks are then slices), only the response side is bounded.
+"""
+
+import io
+import itertools
+import json
+import os
+import struct
+import tempfile
+from typing import Any, AsyncIterator, BinaryIO, Iterator, List, Optional, Tuple
+
+import numpy as np
+import pyarrow as pa
+
+from .schemas import BulkPredictionRequest, BulkPredictionResponse, BulkPredictionResponseItem
+
+JSON = "application/json"
+NDJSON = "application/x-ndjson"
+FLOAT32 = "application/x-float32"
+ARROW = "application/vnd.apache.arrow.stream"
+
+FORMATS = (JSON, NDJSON, FLOAT32, ARROW)
+
+CHUNK_ROWS = int(os.getenv("BULK_CHUNK_ROWS", "10000"))
+SPOOL_BYTES = int(float(os.getenv("BULK_SPOOL_MB", "32")) * 1024 * 1024)
+
+_HEADER = struct.Struct("<II")   # rows, cols
+
+
+class CodecError(ValueError):
+    """Malformed body or unsupported format; `status` is the HTTP code to return."""
+
+    def __init__(self, status: int, detail: str):
+        super().__init__(detail)
+        self.status = status
+        self.detail = detail
+
+
+# ======================================================
+# NEGOTIATION
+# ======================================================
+
+def _media_type(value: Optional[str]) -> str:
+    return (value or "").split(";")[0].strip().lower()
+
+
+def request_format(content_type: Optional[str]) -> str:
+    media = _media_type(content_type)
+    if media in ("", JSON):
+        return JSON
+    if media in FORMATS:
+        return media
+    raise CodecError(415, f"Unsupported Content-Type '{media}'. Use one of: {', '.join(FORMATS)}")
+
+
+def response_format(accept: Optional[str], request_fmt: str) -> str:
+    """First supported type in Accept (in order); '*/*' or no Accept -> same as the request."""
+    if not accept:
+        return request_fmt
+    for part in accept.split(","):
+        media = _media_type(part)
+        if media in FORMATS:
+            return media
+        if media in ("*/*", "application/*"):
+            return request_fmt
+    raise CodecError(406, f"Not acceptable: '{accept}'. Supported: {', '.join(FORMATS)}")
+
+
+# ======================================================
+# DECODE
+# ======================================================
+
+def decode(body: bytes, fmt: str) -> Tuple[np.ndarray, Any]:
+    """Body -> (X, ids). ids: list (JSON/NDJSON), pyarrow array (Arrow) or None."""
+    if fmt == FLOAT32:
+        return _decode_float32(body), None
+    if fmt == ARROW:
+        return _decode_arrow(body)
+    if fmt == NDJSON:
+        return _decode_ndjson_lines(body.splitlines())
+    try:
+        request = BulkPredictionRequest.model_validate_json(body)
+    except ValueError as e:
+        raise CodecError(422, str(e))
+    try:
+        X = np.array([item.data for item in request.items], dtype=float)
+    except ValueError as e:
+        raise CodecError(422, f"JSON items: {e}")
+    if X.ndim != 2 and len(request.items):
+        raise CodecError(422, "JSON items: every 'data' must be a flat list of the same length")
+    return X, [item.id for item in request.items]
+
+
+def _decode_float32(body: bytes) -> np.ndarray:
+    if len(body) < _HEADER.size:
+        raise CodecError(400, "float32 body shorter than the 8-byte shape header")
+    rows, cols = _HEADER.unpack_from(body)
+    expected = _HEADER.size + rows * cols * 4
+    if len(body) != expected:
+        raise CodecError(400, f"float32 body: header says {rows}x{cols} "
+                              f"({expected} bytes), got {len(body)} bytes")
+    # view on the request bytes, no copy
+    return np.frombuffer(body, dtype="<f4", count=rows * cols, offset=_HEADER.size).reshape(rows, cols)
+
+
+def _decode_arrow(body: bytes) -> Tuple[np.ndarray, Any]:
+    try:
+        table = pa.ipc.open_stream(pa.py_buffer(body)).read_all()
+    except pa.ArrowInvalid as e:
+        raise CodecError(400, f"Invalid Arrow IPC stream: {e}")
+    return _arrow_rows(table)
+
+
+def _arrow_rows(table: pa.Table) -> Tuple[np.ndarray, Any]:
+    ids = table.column("id").combine_chunks() if "id" in table.column_names else None
+
+    if "data" in table.column_names:
+        col = table.column("data").combine_chunks()
+        if not pa.types.is_fixed_size_list(col.type):
+            raise CodecError(400, "Arrow column 'data' must be FixedSizeList<float>")
+        if col.null_count:
+            raise CodecError(400, "Arrow column 'data' contains nulls")
+        values = col.flatten()
+        try:
+            flat = values.to_numpy(zero_copy_only=True)
+        except pa.ArrowInvalid:
+            flat = values.to_numpy(zero_copy_only=False)
+        return flat.reshape(len(col), col.type.list_size), ids
+
+    # satu kolom per fitur (urutan kolom = urutan fitur); perlu satu copy
+    cols = [c for c in table.column_names if c != "id"]
+    if not cols:
+        raise CodecError(400, "Arrow table has no feature columns")
+    try:
+        X = np.column_stack([table.column(c).to_numpy() for c in cols])
+    except (pa.ArrowInvalid, ValueError) as e:
+        raise CodecError(400, f"Arrow feature columns: {e}")
+    if not np.issubdtype(X.dtype, np.number):
+        raise CodecError(400, "Arrow feature columns must be numeric")
+    return X, ids
+
+
+def _decode_ndjson_lines(lines: List[bytes], first_line: int = 1) -> Tuple[np.ndarray, List[Optional[str]]]:
+    ids, rows = [], []
+    for n, line in enumerate(lines, first_line):
+        if not line.strip():
+            continue
+        try:
+            obj = json.loads(line)
+            rows.append(obj["data"])
+            ids.append(None if obj.get("id") is None else str(obj["id"]))
+        except (ValueError, KeyError, TypeError, AttributeError) as e:
+            raise CodecError(400, f"NDJSON line {n}: expected {{\"id\", \"data\"}} object ({e})")
+    try:
+        X = np.array(rows, dtype=float)
+    except ValueError as e:
+        raise CodecError(400, f"NDJSON rows: {e}")
+    if X.ndim != 2 and len(rows):
+        raise CodecError(400, "NDJSON rows: every 'data' must be a flat list of the same length")
+    return X, ids
+
+
+# ======================================================
+# ENCODE
+# ======================================================
+
+def encode(model_name: str, preds: np.ndarray, ids: Any, fmt: str) -> Tuple[Any, str]:
+    """Predictions -> (body, media type). JSON returns a BulkPredictionResponse."""
+    if fmt == JSON:
+        return _encode_json(model_name, np.asarray(preds), ids), JSON
+    encoder = stream_encoder(fmt, model_name)
+    return encoder.begin() + encoder.chunk(preds, ids) + encoder.end(), encoder.media_type
+
+
+def _encode_json(model_name: str, preds: np.ndarray, ids: Any) -> BulkPredictionResponse:
+    values: List[Any] = preds.tolist()
+    return BulkPredictionResponse(
+        model=model_name,
+        results=[BulkPredictionResponseItem(id=i, prediction=v)
+                 for i, v in zip(_id_list(ids, len(values)), values)],
+    )
+
+
+def _id_list(ids: Any, n: int) -> List[Optional[str]]:
+    if ids is None:
+        return [None] * n
+    if isinstance(ids, (pa.Array, pa.ChunkedArray)):
+        return [None if v is None else str(v) for v in ids.to_pylist()]
+    return list(ids)
+
+
+# ======================================================
+# STREAMING
+# ======================================================
+
+async def spool(stream: AsyncIterator[bytes]) -> BinaryIO:
+    """
+    Copy the request body into a SpooledTemporaryFile (RAM up to
+    BULK_SPOOL_MB, then disk) before the response starts. The body cannot
+    be read while a StreamingResponse is running: Starlette's disconnect
+    listener consumes the remaining request messages.
+    """
+    f = tempfile.SpooledTemporaryFile(max_size=SPOOL_BYTES)
+    async for part in stream:
+        f.write(part)
+    f.seek(0)
+    return f
+
+
+def iter_chunks(f: BinaryIO, fmt: str, chunk_rows: int = CHUNK_ROWS) -> Iterator[Tuple[np.ndarray, Any]]:
+    """Spooled body -> (X, ids) chunks of at most `chunk_rows` rows, read as needed."""
+    if fmt == FLOAT32:
+        yield from _iter_float32(f, chunk_rows)
+    elif fmt == NDJSON:
+        yield from _iter_ndjson(f, chunk_rows)
+    elif fmt == ARROW:
+        yield from _iter_arrow(f, chunk_rows)
+    else:
+        X, ids = decode(f.read(), fmt)
+        for start in range(0, len(X), chunk_rows):
+            stop = start + chunk_rows
+            yield X[start:stop], ids[start:stop]
+
+
+def _iter_float32(f: BinaryIO, chunk_rows: int):
+    header = f.read(_HEADER.size)
+    if len(header) < _HEADER.size:
+        raise CodecError(400, "float32 body shorter than the 8-byte shape header")
+    rows, cols = _HEADER.unpack(header)
+    size = f.seek(0, os.SEEK_END)
+    expected = _HEADER.size + rows * cols * 4
+    if size != expected:
+        raise CodecError(400, f"float32 body: header says {rows}x{cols} "
+                              f"({expected} bytes), got {size} bytes")
+    f.seek(_HEADER.size)
+    for start in range(0, rows if cols else 0, chunk_rows):
+        n = min(chunk_rows, rows - start)
+        yield np.frombuffer(f.read(n * cols * 4), dtype="<f4").reshape(n, cols), None
+
+
+def _iter_ndjson(f: BinaryIO, chunk_rows: int):
+    line_no = 1                      # nomor baris pertama chunk, untuk pesan error
+    while True:
+        lines = list(itertools.islice(f, chunk_rows))
+        if not lines:
+            return
+        yield _decode_ndjson_lines(lines, line_no)
+        line_no += len(lines)
+
+
+def _iter_arrow(f: BinaryIO, chunk_rows: int):
+    try:
+        reader = pa.ipc.open_stream(f)
+        for batch in reader:
+            for start in range(0, batch.num_rows, chunk_rows):
+                yield _arrow_rows(pa.Table.from_batches([batch.slice(start, chunk_rows)]))
+    except pa.ArrowInvalid as e:
+        raise CodecError(400, f"Invalid Arrow IPC stream: {e}")
+
+
+class _NdjsonEncoder:
+    media_type = NDJSON
+
+    def begin(self) -> bytes:
+        return b""
+
+    def chunk(self, preds: np.ndarray, ids: Any) -> bytes:
+        values = np.asarray(preds).tolist()
+        dumps = json.dumps
+        return "".join(
+            dumps({"id": i, "prediction": v}) + "\n" for i, v in zip(_id_list(ids, len(values)), values)
+        ).encode()
+
+    def end(self) -> bytes:
+        return b""
+
+    def error(self, detail: str) -> Optional[bytes]:
+        return (json.dumps({"error": detail}) + "\n").encode()
+
+
+class _JsonEncoder(_NdjsonEncoder):
+    """BulkPredictionResponse written incrementally: header, items per chunk, closing brackets."""
+    media_type = JSON
+
+    def __init__(self, model_name: str):
+        self.model_name = model_name
+        self._first = True
+
+    def begin(self) -> bytes:
+        return ('{"model": ' + json.dumps(self.model_name) + ', "results": [').encode()
+
+    def chunk(self, preds: np.ndarray, ids: Any) -> bytes:
+        values = np.asarray(preds).tolist()
+        if not values:
+            return b""
+        items = ", ".join(json.dumps({"id": i, "prediction": v})
+                          for i, v in zip(_id_list(ids, len(values)), values))
+        sep, self._first = ("" if self._first else ", "), False
+        return (sep + items).encode()
+
+    def end(self) -> bytes:
+        return b"]}"
+
+    def error(self, detail: str) -> Optional[bytes]:
+        return ('], "error": ' + json.dumps(detail) + "}").encode()
+
+
+class _Float32Encoder:
+    media_type = FLOAT32
+
+    def begin(self) -> bytes:
+        return b""
+
+    def chunk(self, preds: np.ndarray, ids: Any) -> bytes:
+        out = np.ascontiguousarray(preds, dtype="<f4")
+        cols = out.shape[1] if out.ndim == 2 else 1
+        return _HEADER.pack(out.shape[0], cols) + out.tobytes()
+
+    def end(self) -> bytes:
+        return b""
+
+    def error(self, detail: str) -> Optional[bytes]:
+        return None   # tidak ada tempat untuk pesan error di frame biner
+
+
+class _ArrowEncoder:
+    media_type = ARROW
+
+    def __init__(self, model_name: str):
+        self.model_name = model_name
+        self._sink = io.BytesIO()
+        self._writer = None
+
+    def _take(self) -> bytes:
+        data = self._sink.getvalue()
+        self._sink.seek(0)
+        self._sink.truncate()
+        return data
+
+    def begin(self) -> bytes:
+        return b""
+
+    def chunk(self, preds: np.ndarray, ids: Any) -> bytes:
+        out = np.ascontiguousarray(preds, dtype=np.float32)
+        if out.ndim == 2:
+            prediction = pa.FixedSizeListArray.from_arrays(pa.array(out.reshape(-1)), out.shape[1])
+        else:
+            prediction = pa.array(out)
+
+        arrays, names = [prediction], ["prediction"]
+        if ids is not None:
+            if not isinstance(ids, (pa.Array, pa.ChunkedArray)):
+                ids = pa.array(ids, pa.string())
+            arrays.insert(0, ids)
+            names.insert(0, "id")
+        table = pa.Table.from_arrays(arrays, names=names)
+
+        if self._writer is None:
+            schema = table.schema.with_metadata({"model": self.model_name})
+            self._writer = pa.ipc.new_stream(self._sink, schema)
+        self._writer.write_table(table)
+        return self._take()
+
+    def end(self) -> bytes:
+        if self._writer is None:
+            return b""
+        self._writer.close()
+        return self._take()
+
+    def error(self, detail: str) -> Optional[bytes]:
+        return None
+
+
+def stream_encoder(fmt: str, model_name: str):
+    """Encoder with begin() / chunk(preds, ids) / end() / error(detail) returning bytes."""
+    if fmt == NDJSON:
+        return _NdjsonEncoder()
+    if fmt == JSON:
+        return _JsonEncoder(model_name)
+    if fmt == FLOAT32:
+        return _Float32Encoder()
+    return _ArrowEncoder(model_name)
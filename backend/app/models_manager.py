@@ -1,9 +1,40 @@
+"""
+models_manager.py
+=================
+Lazy, memory-budgeted model registry for routes_predict.
+
+- models are unpickled on first use (`get_model`), not at import/startup
+- resident models are kept in LRU order; when the resident total would
+  exceed MODEL_MEMORY_BUDGET_MB, the least recently used unpinned models
+  are evicted (before loading, using the last known / file size as
+  estimate, and again after loading with the measured size)
+- MODEL_PRELOAD (comma separated) names a pinned set: loaded by
+  `load_models()` at startup and never evicted
+- per model: load time, size, last use, hits, loads and evictions
+
+Size = RSS growth during the load (captures native XGBoost boosters that
+Python's allocator does not see), never less than the pickle's file size.
+A load that first imports a library (sklearn, xgboost) would count the
+library too, so then only the file size is used.
+
+Env:
+    MODEL_MEMORY_BUDGET_MB   resident budget for all models (1024)
+    MODEL_PRELOAD            pinned models, e.g. "rf_hourly_fixed" ("")
+"""
+
 from pathlib import Path
+import gc
+import os
+import sys
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional
+
 import joblib
-from typing import Dict, Any
 
-BASE_DIR = Path(__file__).resolve().parent.parent  # points to backend/ai
-MODELS_DIR = BASE_DIR / "models"
+BASE_DIR = Path(__file__).resolve().parent.parent  # points to backend/
+MODELS_DIR = BASE_DIR / "ai" / "models"
 
 # Map model names to filenames
 MODEL_FILES = {
@@ -12,37 +43,237 @@ MODEL_FILES = {
     "rf_hourly_fixed": "rf_hourly_fixed.pkl",
 }
 
-MODELS: Dict[str, Any] = {}
 DEFAULT_MODEL_NAME = "xgb_multi"
 
+MEMORY_BUDGET = int(float(os.getenv("MODEL_MEMORY_BUDGET_MB", "1024")) * 1024 * 1024)
+PRELOAD = [n.strip() for n in os.getenv("MODEL_PRELOAD", "").split(",") if n.strip()]
 
-def load_models() -> None:
-    """Load all models into memory."""
-    global MODELS
-    MODELS = {}
+_PAGE = os.sysconf("SC_PAGE_SIZE") if hasattr(os, "sysconf") else 4096
+
+
+def _rss_bytes() -> Optional[int]:
+    """Current resident set size (Linux /proc), None when unavailable."""
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * _PAGE
+    except (OSError, ValueError, IndexError):
+        return None
+
+
+class _Entry:
+    def __init__(self, name: str, path: Path):
+        self.name = name
+        self.path = path
+        self.obj: Any = None
+        self.pinned = False
+        self.size_bytes = 0          # terukur saat load terakhir
+        self.load_seconds = None
+        self.loaded_at = None
+        self.last_used = None
+        self.hits = 0
+        self.loads = 0
+        self.evictions = 0
+        self.error = None
+        self.lock = threading.Lock()  # satu load per model sekaligus
 
-    for name, filename in MODEL_FILES.items():
-        path = MODELS_DIR / filename
-        if not path.exists():
-            print(f"[WARN] Model file not found for '{name}': {path}")
-            continue
+    @property
+    def loaded(self) -> bool:
+        return self.obj is not None
 
+    def file_bytes(self) -> int:
         try:
-            print(f"[INFO] Loading model '{name}' from {path}")
-            model = joblib.load(path)
-            MODELS[name] = model
-            print(f"[INFO] Loaded model '{name}' successfully.")
+            return self.path.stat().st_size
+        except OSError:
+            return 0
+
+    def estimate(self) -> int:
+        return self.size_bytes or self.file_bytes()
+
+    def status(self) -> Dict[str, Any]:
+        return {
+            "file": str(self.path),
+            "exists": self.path.exists(),
+            "loaded": self.loaded,
+            "pinned": self.pinned,
+            "size_bytes": self.size_bytes if self.loaded else 0,
+            "last_size_bytes": self.size_bytes,
+            "file_bytes": self.file_bytes(),
+            "load_seconds": self.load_seconds,
+            "loaded_at": self.loaded_at,
+            "last_used": self.last_used,
+            "hits": self.hits,
+            "loads": self.loads,
+            "evictions": self.evictions,
+            "error": self.error,
+        }
+
+
+class ModelRegistry:
+    def __init__(self, files: Dict[str, str], models_dir: Path = MODELS_DIR,
+                 budget_bytes: int = MEMORY_BUDGET, pinned: Optional[List[str]] = None):
+        self.budget = budget_bytes
+        self._entries = {name: _Entry(name, models_dir / fn) for name, fn in files.items()}
+        self._lru: "OrderedDict[str, _Entry]" = OrderedDict()   # resident, terlama di depan
+        self._lock = threading.Lock()
+        for name in pinned or []:
+            if name in self._entries:
+                self._entries[name].pinned = True
+            else:
+                print(f"[WARN] MODEL_PRELOAD: unknown model '{name}'")
+
+    # --------------------------------------------------
+    # access
+    # --------------------------------------------------
+    def get(self, name: str) -> Any:
+        entry = self._entries.get(name)
+        if entry is None:
+            raise KeyError(f"Model '{name}' does not exist.")
+
+        with self._lock:
+            if entry.loaded:
+                self._touch(entry)
+                return entry.obj
+
+        with entry.lock:
+            obj = entry.obj               # request lain mungkin sudah memuat
+            if obj is None:
+                obj = self._load(entry)
+        with self._lock:
+            if entry.loaded:
+                self._touch(entry)
+        return obj                        # tetap valid walau sempat tergusur
+
+    def _touch(self, entry: _Entry) -> None:
+        entry.hits += 1
+        entry.last_used = time.time()
+        self._lru.move_to_end(entry.name)
+
+    # --------------------------------------------------
+    # load / evict
+    # --------------------------------------------------
+    def _load(self, entry: _Entry) -> Any:
+        if not entry.path.exists():
+            entry.error = "file not found"
+            raise KeyError(f"Model '{entry.name}' file not found: {entry.path}")
+
+        with self._lock:
+            self._evict_for(entry.estimate(), keep=entry.name)
+
+        print(f"[INFO] Loading model '{entry.name}' from {entry.path}")
+        rss0, mods0 = _rss_bytes(), len(sys.modules)
+        t0 = time.perf_counter()
+        try:
+            obj = joblib.load(entry.path)
         except Exception as e:
-            print(f"[ERROR] Failed to load model '{name}': {e}")
+            entry.error = str(e)
+            print(f"[ERROR] Failed to load model '{entry.name}': {e}")
+            raise KeyError(f"Model '{entry.name}' failed to load: {e}")
+        seconds = time.perf_counter() - t0
+        rss1 = _rss_bytes()
+
+        grown = 0
+        if rss0 is not None and rss1 is not None and len(sys.modules) == mods0:
+            grown = rss1 - rss0   # tanpa import baru: pertumbuhan = model
+        with self._lock:
+            entry.obj = obj
+            entry.size_bytes = max(grown, entry.file_bytes())
+            entry.load_seconds = seconds
+            entry.loaded_at = time.time()
+            entry.last_used = entry.loaded_at
+            entry.loads += 1
+            entry.error = None
+            self._lru[entry.name] = entry
+            self._evict_for(0, keep=entry.name)
+
+        print(f"[INFO] Loaded model '{entry.name}' in {seconds:.2f}s "
+              f"(~{entry.size_bytes / 1e6:.1f} MB, resident {self.resident_bytes() / 1e6:.1f} MB)")
+        return obj
+
+    def _evict_for(self, incoming: int, keep: Optional[str] = None) -> None:
+        """Evict LRU unpinned models until resident + incoming fits the budget (lock held)."""
+        freed = False
+        for name in list(self._lru):
+            if self._resident() + incoming <= self.budget:
+                break
+            entry = self._lru[name]
+            if entry.pinned or name == keep:
+                continue
+            del self._lru[name]
+            entry.obj = None
+            entry.evictions += 1
+            freed = True
+            print(f"[INFO] Evicted model '{name}' (LRU, ~{entry.size_bytes / 1e6:.1f} MB)")
+        if freed:
+            gc.collect()
+        if not incoming and self._resident() > self.budget:
+            print(f"[WARN] Model memory over budget: {self._resident() / 1e6:.1f} MB "
+                  f"> {self.budget / 1e6:.1f} MB (pinned / in use)")
+
+    def unload(self, name: str) -> bool:
+        with self._lock:
+            entry = self._lru.pop(name, None)
+            if entry is None:
+                return False
+            entry.obj = None
+        gc.collect()
+        return True
+
+    def preload(self, names: Optional[List[str]] = None) -> None:
+        """Load `names` (default: the pinned set). Failures are logged, not raised."""
+        for name in names if names is not None else [e.name for e in self._entries.values() if e.pinned]:
+            try:
+                self.get(name)
+            except KeyError as e:
+                print(f"[WARN] {e}")
+
+    # --------------------------------------------------
+    # status
+    # --------------------------------------------------
+    def _resident(self) -> int:
+        return sum(e.size_bytes for e in self._lru.values())
+
+    def resident_bytes(self) -> int:
+        with self._lock:
+            return self._resident()
+
+    def status(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "budget_bytes": self.budget,
+                "resident_bytes": self._resident(),
+                "process_rss_bytes": _rss_bytes(),
+                "lru_order": list(self._lru),
+                "models": {name: e.status() for name, e in self._entries.items()},
+            }
+
+
+REGISTRY = ModelRegistry(MODEL_FILES, MODELS_DIR, MEMORY_BUDGET, PRELOAD)
+
+
+def load_models() -> None:
+    """Preload the pinned set (MODEL_PRELOAD); other models load on first use."""
+    REGISTRY.preload()
+
+
+def get_bundle(name: str):
+    """Loaded object for `name` (the saved bundle dict), loading it if needed."""
+    return REGISTRY.get(name)
 
 
 def get_model(name: str):
-    """Return model by name or raise KeyError."""
-    if name not in MODELS:
-        raise KeyError(f"Model '{name}' not loaded or does not exist.")
-    return MODELS[name]
+    """Return the estimator of `name` (bundle["model"] for bundle dicts) or raise KeyError."""
+    obj = REGISTRY.get(name)
+    if isinstance(obj, dict) and "model" in obj:
+        return obj["model"]
+    return obj
 
 
 def list_models() -> Dict[str, bool]:
     """Return dict of model_name -> loaded_status."""
-    return {name: (name in MODELS) for name in MODEL_FILES.keys()}
+    status = REGISTRY.status()["models"]
+    return {name: s["loaded"] for name, s in status.items()}
+
+
+def models_status() -> Dict[str, Any]:
+    """Registry state for /models: budget, resident bytes, per-model load/size/use."""
+    return REGISTRY.status()
@@ -1,4 +1,6 @@
-from fastapi import APIRouter, HTTPException
+from fastapi import APIRouter, HTTPException, Query, Request, Response
+from fastapi.responses import StreamingResponse
+from starlette.concurrency import run_in_threadpool
 import numpy as np
 
 from .schemas import (
@@ -6,12 +8,15 @@ from .schemas import (
     PredictionResponse,
     BulkPredictionRequest,
     BulkPredictionResponse,
-    BulkPredictionResponseItem,
 )
-from .models_manager import get_model, DEFAULT_MODEL_NAME
+from . import bulk_codec
+from .models_manager import get_model, load_models, DEFAULT_MODEL_NAME
 
 router = APIRouter()
 
+# Pinned models (MODEL_PRELOAD) load now; the rest lazily on first request
+load_models()
+
 @router.get("/health", tags=["system"])
 def health_check():
     """Simple health endpoint."""
@@ -19,8 +24,9 @@ def health_check():
 
 @router.get("/models", tags=["system"])
 def list_available_models():
-    from .models_manager import list_models
-    return {"models": list_models(), "default": DEFAULT_MODEL_NAME}
+    """Registry state: loaded/resident, size, load time and last use per model."""
+    from .models_manager import models_status
+    return {**models_status(), "default": DEFAULT_MODEL_NAME}
 
 
 @router.post("/predict", response_model=PredictionResponse, tags=["predict"])
@@ -35,38 +41,123 @@ def predict_with_model(model_name: str, request: PredictionRequest):
     return _predict_for_model(model_name, request)
 
 
-@router.post("/predict/bulk/{model_name}", response_model=BulkPredictionResponse, tags=["predict"])
-def predict_bulk(model_name: str, request: BulkPredictionRequest):
-    """Bulk prediction for a specific model."""
+@router.post(
+    "/predict/bulk/{model_name}",
+    response_model=BulkPredictionResponse,
+    tags=["predict"],
+    openapi_extra={
+        "requestBody": {
+            "required": True,
+            "content": {
+                bulk_codec.JSON: {"schema": BulkPredictionRequest.model_json_schema()},
+                bulk_codec.NDJSON: {"schema": {"type": "string"}},
+                bulk_codec.FLOAT32: {"schema": {"type": "string", "format": "binary"}},
+                bulk_codec.ARROW: {"schema": {"type": "string", "format": "binary"}},
+            },
+        }
+    },
+    responses={
+        200: {
+            "content": {
+                bulk_codec.NDJSON: {"schema": {"type": "string"}},
+                bulk_codec.FLOAT32: {"schema": {"type": "string", "format": "binary"}},
+                bulk_codec.ARROW: {"schema": {"type": "string", "format": "binary"}},
+            }
+        }
+    },
+)
+async def predict_bulk(
+    model_name: str,
+    request: Request,
+    stream: bool = False,
+    chunk_rows: int = Query(bulk_codec.CHUNK_ROWS, ge=1, le=1_000_000),
+):
+    """
+    Bulk prediction for a specific model.
+
+    Request format from Content-Type, response format from Accept
+    (JSON, NDJSON, raw float32 or Arrow IPC, see bulk_codec). JSON is the default.
+    `stream=true` (always for NDJSON responses) predicts in chunks of
+    `chunk_rows` and sends each chunk as soon as it is done.
+    """
     try:
-        model = get_model(model_name)
+        req_fmt = bulk_codec.request_format(request.headers.get("content-type"))
+        resp_fmt = bulk_codec.response_format(request.headers.get("accept"), req_fmt)
+        model = await run_in_threadpool(get_model, model_name)
+    except bulk_codec.CodecError as e:
+        raise HTTPException(status_code=e.status, detail=e.detail)
     except KeyError as e:
         raise HTTPException(status_code=404, detail=str(e))
 
-    # Each item.data is one row of features
-    X = np.array([item.data for item in request.items])
-    preds = model.predict(X)
+    if stream or resp_fmt == bulk_codec.NDJSON:
+        return await _stream_bulk(model, model_name, request, req_fmt, resp_fmt, chunk_rows)
 
-    # Preds may be 1D or 2D
-    results = []
-    for item, pred in zip(request.items, preds):
-        # if array, convert to list, else to float
-        if hasattr(pred, "__len__") and not isinstance(pred, (float, int)):
-            pred_value = [float(x) for x in pred]
-        else:
-            pred_value = float(pred)
-        results.append(
-            BulkPredictionResponseItem(
-                id=item.id,
-                prediction=pred_value,
-            )
-        )
+    body = await request.body()
+    try:
+        # decode, predict and encode off the event loop
+        X, ids = await run_in_threadpool(bulk_codec.decode, body, req_fmt)
+        preds = await run_in_threadpool(_predict_rows, model, X)
+    except bulk_codec.CodecError as e:
+        raise HTTPException(status_code=e.status, detail=e.detail)
 
-    return BulkPredictionResponse(model=model_name, results=results)
+    content, media_type = await run_in_threadpool(bulk_codec.encode, model_name, preds, ids, resp_fmt)
+    if media_type == bulk_codec.JSON:
+        return content
+    return Response(content=content, media_type=media_type)
 
 
 # ------------- internal helper -----------------
 
+def _predict_rows(model, X: np.ndarray) -> np.ndarray:
+    if len(X) == 0:
+        return np.empty(0, dtype=np.float32)
+    try:
+        return model.predict(X)
+    except ValueError as e:   # mis. jumlah fitur tidak cocok
+        raise bulk_codec.CodecError(422, f"Prediction failed: {e}")
+
+
+async def _stream_bulk(model, model_name: str, request: Request,
+                       req_fmt: str, resp_fmt: str, chunk_rows: int) -> StreamingResponse:
+    spooled = await bulk_codec.spool(request.stream())
+    chunks = bulk_codec.iter_chunks(spooled, req_fmt, chunk_rows)
+
+    def next_chunk():
+        for X, ids in chunks:
+            if len(X):
+                return ids, _predict_rows(model, X)
+        return None
+
+    # chunk pertama diprediksi sebelum header dikirim, supaya body/fitur yang salah masih dapat 4xx
+    try:
+        first = await run_in_threadpool(next_chunk)
+    except bulk_codec.CodecError as e:
+        spooled.close()
+        raise HTTPException(status_code=e.status, detail=e.detail)
+    encoder = bulk_codec.stream_encoder(resp_fmt, model_name)
+
+    async def body():
+        try:
+            yield encoder.begin()
+            item = first
+            while item is not None:
+                ids, preds = item
+                yield await run_in_threadpool(encoder.chunk, preds, ids)
+                item = await run_in_threadpool(next_chunk)
+            yield encoder.end()
+        except bulk_codec.CodecError as e:
+            # status sudah terkirim: laporkan di body (JSON/NDJSON) atau putus koneksi (biner)
+            tail = encoder.error(e.detail)
+            if tail is None:
+                raise
+            print(f"[WARN] /predict/bulk/{model_name} stream aborted: {e.detail}")
+            yield tail
+        finally:
+            spooled.close()
+
+    return StreamingResponse(body(), media_type=encoder.media_type)
+
+
 def _predict_for_model(model_name: str, request: PredictionRequest) -> PredictionResponse:
     try:
         model = get_model(model_name)
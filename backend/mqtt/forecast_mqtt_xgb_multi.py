@@ -1,18 +1,28 @@
 # forecast_mqtt_xgb_multi.py — multi-horizon 168 jam, simpan CSV (WIB) & (opsional) publish MQTT
-import json, os, time
+import atexit, json, os, sys, time
 from datetime import datetime, timezone
-from zoneinfo import ZoneInfo  # <- TAMBAHAN: untuk konversi WIB
+from pathlib import Path
 
 import joblib
 import numpy as np
 import pandas as pd
-import paho.mqtt.client as mqtt
+
+# ===== PATH FIX (allow ai.*) =====
+sys.path.append(str(Path(__file__).resolve().parents[1]))  # backend/
+
+from ai.db.predictions import store_forecast
+from ai.inference.multi_horizon import MultiHorizonPredictor
+from ai.utils.forecast_export import export_forecast, forecast_frame, wait_exports
+from ai.utils.timestamps import parse_timestamps
+from forecast_publisher import ForecastPublisher
 
 # ===== MQTT (opsional) =====
 BROKER      = "broker.emqx.io"
 PORT        = 1883
 TOPIC_OUT   = "uninus/iot/air_quality/esp32-01"
 CLIENT_ID   = "pc-forecast-xgb-168h"
+DEVICE_ID   = TOPIC_OUT.rsplit("/", 1)[-1]
+PUBLISH_FORMAT = os.getenv("FORECAST_MQTT_FORMAT", "packed")   # packed (chunk float32) | json (lama)
 
 # ===== LOAD MODEL =====
 BUNDLE = joblib.load(os.path.join("models", "xgb_multi.pkl"))
@@ -24,6 +34,13 @@ LAGS        = BUNDLE.get("lag_minutes", [])
 FREQ        = BUNDLE.get("freq", "1H")
 BASE_COLS   = BUNDLE.get("base_cols", ["temp_c","rh_pct","tvoc_ppb","eco2_ppm","dust_ugm3"])
 
+# evaluasi booster per horizon secara paralel; index horizon di-parse sekali di sini.
+# Catatan: PREDICTOR men-set nthread=1 pada booster MODEL (sekali, dibagi — tidak di-copy)
+PREDICT_JOBS = int(os.getenv("FORECAST_PREDICT_JOBS", "-1"))
+PREDICTOR    = MultiHorizonPredictor(MODEL, TARGET_COLS, n_jobs=PREDICT_JOBS)
+IDX_TEMP     = PREDICTOR.horizon_index["temp"]
+IDX_TVOC     = PREDICTOR.horizon_index["tvoc"]
+
 CSV_OUT = "data/forecast_10080m.csv"  # akan disimpan dengan index WIB
 
 def build_latest_features_from_csv(csv_path="data/sensor.csv"):
@@ -35,24 +52,14 @@ def build_latest_features_from_csv(csv_path="data/sensor.csv"):
     # ---- Robust timestamp handling ----
     idx = None
     if "ts" in df0.columns:
-        ts = pd.to_datetime(df0["ts"], utc=True, errors="coerce")
-        if ts.isna().all():
-            ts = pd.to_datetime(pd.to_numeric(df0["ts"], errors="coerce"), unit="s", utc=True)
-        ts = ts.dt.tz_convert(None)  # jadikan tz-naive (diasumsikan UTC)
+        ts = parse_timestamps(df0["ts"]).dt.tz_convert(None)  # jadikan tz-naive (diasumsikan UTC)
         idx = pd.DatetimeIndex(ts)
         df0 = df0.drop(columns=["ts"])
     else:
         first_col = df0.columns[0]
-        ts_try = pd.to_datetime(df0[first_col], utc=True, errors="coerce")
-        if ts_try.notna().sum() >= max(2, int(0.5 * len(df0))):
-            ts = ts_try.dt.tz_convert(None)
-            idx = pd.DatetimeIndex(ts)
-            df0 = df0.drop(columns=[first_col])
-        else:
-            ts_num = pd.to_numeric(df0[first_col], errors="coerce")
-            ts = pd.to_datetime(ts_num, unit="s", utc=True, errors="coerce").tz_convert(None)
-            idx = pd.DatetimeIndex(ts)
-            df0 = df0.drop(columns=[first_col])
+        ts = parse_timestamps(df0[first_col]).dt.tz_convert(None)
+        idx = pd.DatetimeIndex(ts)
+        df0 = df0.drop(columns=[first_col])
 
     if idx is None or idx.isna().all():
         raise SystemExit("Gagal membaca timestamp dari sensor.csv. Pastikan ada kolom 'ts' atau kolom pertama adalah timestamp.")
@@ -96,95 +103,81 @@ def build_latest_features_from_csv(csv_path="data/sensor.csv"):
     return last_row, last_hour
 
 def make_forecast_df(row_last: pd.DataFrame, last_hour: pd.Timestamp) -> pd.DataFrame:
-    yhat = MODEL.predict(row_last).reshape(-1)
-
-    # pisahkan index kolom temp & tvoc dan urutkan berdasarkan horizon
-    def parse_targets(prefix):
-        pairs = [(i, c) for i, c in enumerate(TARGET_COLS) if c.startswith(prefix)]
-        pairs.sort(key=lambda x: int(x[1].split("+")[1]))  # urut +1..+H
-        return [i for i, _ in pairs]
-
-    idx_temp = parse_targets("y_temp+")
-    idx_tvoc = parse_targets("y_tvoc+")
-
-    temp_preds = yhat[idx_temp]
-    tvoc_preds = yhat[idx_tvoc]
-
-    # daftar waktu prediksi (NAIVE → dianggap UTC)
-    ts_list = [last_hour + pd.Timedelta(minutes=m) for m in range(1, H+1)]
-
+    yhat = PREDICTOR.predict(row_last.to_numpy(dtype=np.float32)).reshape(-1)
 
-    df_out = pd.DataFrame({
-        "timestamp_utc": ts_list,                          # kolom waktu UTC (naive)
-        "ts_epoch_utc": [int(t.timestamp()) for t in ts_list],
-        "temp_c_pred": temp_preds,
-        "tvoc_ppb_pred": tvoc_preds,
-    }).set_index("timestamp_utc")  # index masih UTC-naive (anggap UTC)
-    return df_out
+    # index temp & tvoc sudah terurut +1..+H (IDX_TEMP / IDX_TVOC)
+    temp_preds = yhat[IDX_TEMP]
+    tvoc_preds = yhat[IDX_TVOC]
 
-from zoneinfo import ZoneInfo
-WIB = ZoneInfo("Asia/Jakarta")
+    # daftar waktu prediksi (NAIVE → dianggap UTC); kolom UTC/WIB/epoch dibuat sekali di forecast_frame
+    ts = last_hour + pd.to_timedelta(np.arange(1, H + 1), unit="min")
+    return forecast_frame(ts, {"temp_c_pred": temp_preds, "tvoc_ppb_pred": tvoc_preds})
 
-# pastikan di atas file sudah ada:
-# from zoneinfo import ZoneInfo
-WIB = ZoneInfo("Asia/Jakarta")
+PRED_COLS = ["temp_c_pred", "tvoc_ppb_pred"]
+EXPORTS = {
+    "data/forecast_latest":   ["timestamp_utc", "ts_epoch_utc", *PRED_COLS],                   # UTC (standar)
+    "data/forecast_168h_wib": ["timestamp_wib", "timestamp_utc", "ts_epoch_utc", *PRED_COLS],  # WIB + UTC + epoch
+}
 
 def save_csv_and_print_daily(df_out: pd.DataFrame):
-    os.makedirs("data", exist_ok=True)
-
-    # pastikan unik & terurut (berdasarkan index UTC-naive "timestamp_utc")
-    df_out = df_out[~df_out.index.duplicated(keep="first")].sort_index()
-
-    # === simpan versi UTC (standar) ===
-    latest_path = "data/forecast_latest.csv"
-    df_out.to_csv(latest_path)  # index bernama "timestamp_utc"
-    print(f"✅ saved: {latest_path} (UTC, rows={len(df_out)})")
-
-    # === konversi ke WIB dan simpan ===
-    df_wib = df_out.copy()
-    df_wib.index = df_wib.index.tz_localize("UTC").tz_convert(WIB)
-    df_wib.index.name = "timestamp_wib"
-
-    # buat CSV yang memuat WIB + UTC + epoch untuk kemudahan downstream
-    df_wib_csv = df_wib.reset_index()
-    df_wib_csv["timestamp_utc"] = df_wib_csv["timestamp_wib"].dt.tz_convert("UTC").dt.tz_localize(None)
-
-    cols = ["timestamp_wib", "timestamp_utc", "ts_epoch_utc", "temp_c_pred", "tvoc_ppb_pred"]
-    wib_path = "data/forecast_168h_wib.csv"
-    df_wib_csv[cols].to_csv(wib_path, index=False)
-    print(f"✅ saved: {wib_path} (WIB, rows={len(df_wib_csv)})")
-
-    # === preview ringkas per-hari (WIB) ===
-    for day, g in df_wib.groupby(df_wib.index.date):
-        print(f"\n=== {day} (WIB) ===")
-        print(g[["temp_c_pred", "tvoc_ppb_pred"]].head(24))
+    # tulis semua varian (CSV / Parquet / JSON sesuai FORECAST_EXPORT_FORMATS) + preview per-hari
+    # di thread export; forecast lanjut ke DB / MQTT tanpa menunggu disk
+    return export_forecast(df_out, EXPORTS, preview=PRED_COLS)
 
 
 # ===== MQTT batch publish (opsional) =====
+# satu koneksi untuk seluruh proses (reconnect otomatis), bukan connect/disconnect per batch
+_publisher = None
+
+def get_publisher() -> ForecastPublisher:
+    global _publisher
+    if _publisher is None:
+        _publisher = ForecastPublisher(BROKER, PORT, client_id=CLIENT_ID)
+        if not _publisher.start():
+            print(f"⚠️ MQTT {BROKER}:{PORT} not connected yet, chunks will be queued")
+        atexit.register(_publisher.close)
+    return _publisher
+
 def publish_batch(df_out: pd.DataFrame):
-    cli = mqtt.Client(mqtt.CallbackAPIVersion.VERSION2, client_id=CLIENT_ID)
-    cli.connect(BROKER, PORT, keepalive=60)
-
-    payload = {
-        "generated_at": int(time.time()),
-        "freq": "1min",
-        "horizon_hours": H,
-        # kirim epoch UTC (tetap standar)
-        "forecast": [
-            {"ts": int(ts), "temp_c_pred": float(r.temp_c_pred), "tvoc_ppb_pred": float(r.tvoc_ppb_pred)}
-            for ts, r in zip(df_out["ts_epoch_utc"].values, df_out.reset_index()[["temp_c_pred","tvoc_ppb_pred"]].itertuples(index=False))
-        ],
-    }
-    cli.publish(TOPIC_OUT, json.dumps(payload))
-    print(f"MQTT published batch → {TOPIC_OUT} | items={len(payload['forecast'])}")
-    cli.disconnect()
+    ts = df_out["ts_epoch_utc"].to_numpy(dtype=np.int64)
+    step = int(ts[1] - ts[0]) if len(ts) > 1 else 60
+    pub = get_publisher()
+
+    if PUBLISH_FORMAT == "json":   # format lama: satu pesan JSON berisi semua titik
+        payload = json.dumps({
+            "generated_at": int(time.time()),
+            "freq": "1min",
+            "horizon_hours": H,
+            "forecast": [
+                {"ts": int(t), "temp_c_pred": float(tp), "tvoc_ppb_pred": float(vp)}
+                for t, tp, vp in zip(ts, df_out["temp_c_pred"], df_out["tvoc_ppb_pred"])
+            ],
+        }).encode()
+        res = pub.publish_chunks(TOPIC_OUT, [payload])
+    else:
+        res = pub.publish_forecast(
+            TOPIC_OUT, int(ts[0]), step,
+            {"temp_c_pred": df_out["temp_c_pred"].to_numpy(), "tvoc_ppb_pred": df_out["tvoc_ppb_pred"].to_numpy()},
+        )
+    print(f"MQTT published batch → {TOPIC_OUT} | items={len(ts)} format={PUBLISH_FORMAT} "
+          f"chunks={res['chunks']} bytes={res['bytes']:,} {res['ms']:.1f} ms"
+          f"{'' if res['delivered'] else ' (queued)'}")
 
 def main(publish_mqtt=False):
     row_last, last_hour = build_latest_features_from_csv()
+    t0 = time.perf_counter()
     df_out = make_forecast_df(row_last, last_hour)
+    print(f"⏱️  forecast H={H}: {time.perf_counter() - t0:.3f}s ({len(TARGET_COLS)} boosters, workers={PREDICTOR.n_jobs})")
     save_csv_and_print_daily(df_out)
+    store_forecast(
+        DEVICE_ID, last_hour, 60,
+        {"temp_c_pred": df_out["temp_c_pred"].to_numpy(), "tvoc_ppb_pred": df_out["tvoc_ppb_pred"].to_numpy()},
+        "xgb_multi",
+        meta={"source": "forecast_mqtt_xgb_multi.py", "H": H, "freq": "1min"},
+    )
     if publish_mqtt:
         publish_batch(df_out)
+    wait_exports()
 
 if __name__ == "__main__":
     # set True kalau mau kirim lewat MQTT juga
@@ -0,0 +1,223 @@
+# forecast_publisher.py — koneksi MQTT yang tetap hidup untuk publish forecast (packed + chunked)
+"""
+Long-lived MQTT publisher for forecast batches.
+
+One paho client is connected once (connect_async + loop_start) and kept
+for the life of the process; paho reconnects on its own with a backoff of
+1..PUBLISH_RECONNECT_MAX seconds. With QoS 1 (default) chunks published
+while the broker is away are queued by paho and sent after the reconnect.
+
+`publish_forecast` encodes a batch with ai/utils/forecast_payload.py
+(base ts + step + float32 arrays, chunks <= FORECAST_CHUNK_BYTES) and
+waits for the last chunk's PUBACK, so the reported latency is the time
+until the broker has the whole forecast.
+
+Env:
+    FORECAST_QOS            QoS for the chunks (1)
+    PUBLISH_RECONNECT_MAX   max reconnect backoff in seconds (30)
+    PUBLISH_TIMEOUT         wait for PUBACK in seconds (10)
+
+Run (benchmark vs the old connect + one JSON message + disconnect):
+    python local_broker.py --port 1884 &
+    python forecast_publisher.py --broker 127.0.0.1 --port 1884 --rounds 20
+"""
+import argparse
+import os
+import sys
+import threading
+import time
+from pathlib import Path
+
+import numpy as np
+import paho.mqtt.client as mqtt
+
+# PATH FIX (allow ai.*)
+sys.path.append(str(Path(__file__).resolve().parents[1]))  # backend/
+
+from ai.utils.forecast_payload import CHUNK_BYTES, encode_forecast, to_legacy_json
+
+FORECAST_QOS = int(os.getenv("FORECAST_QOS", "1"))
+RECONNECT_MAX = int(os.getenv("PUBLISH_RECONNECT_MAX", "30"))
+PUBLISH_TIMEOUT = float(os.getenv("PUBLISH_TIMEOUT", "10"))
+
+
+class ForecastPublisher:
+    def __init__(self, broker: str, port: int = 1883, client_id: str = "pc-forecast-publisher",
+                 qos: int = FORECAST_QOS, chunk_bytes: int = CHUNK_BYTES, keepalive: int = 60):
+        self.broker = broker
+        self.port = port
+        self.qos = qos
+        self.chunk_bytes = chunk_bytes
+        self.keepalive = keepalive
+
+        self.client = mqtt.Client(mqtt.CallbackAPIVersion.VERSION2, client_id=client_id)
+        self.client.on_connect = self._on_connect
+        self.client.on_disconnect = self._on_disconnect
+        self.client.reconnect_delay_set(min_delay=1, max_delay=RECONNECT_MAX)
+        self._connected = threading.Event()
+        self._started = False
+
+        # metrics
+        self.batches = 0
+        self.chunks = 0
+        self.bytes = 0
+        self.queued = 0          # dikirim saat terputus (antre di paho)
+        self.failed = 0
+        self.connects = 0
+        self.disconnects = 0
+        self.last_ms = 0.0
+        self.max_ms = 0.0
+
+    # --------------------------------------------------
+    # connection
+    # --------------------------------------------------
+    def _on_connect(self, client, userdata, flags, reason_code, properties=None):
+        if reason_code.is_failure:
+            print(f"⚠️ MQTT connect failed: {reason_code}")
+            return
+        self.connects += 1
+        self._connected.set()
+        print(f"📡 MQTT publisher connected {self.broker}:{self.port} ({'re' if self.connects > 1 else ''}connect)")
+
+    def _on_disconnect(self, client, userdata, flags, reason_code, properties=None):
+        self._connected.clear()
+        if self._started:
+            self.disconnects += 1
+            print(f"⚠️ MQTT publisher disconnected ({reason_code}), reconnecting ...")
+
+    def start(self, wait: float = 5.0) -> bool:
+        """Connect in the background; True if connected within `wait` seconds."""
+        if not self._started:
+            self._started = True
+            self.client.connect_async(self.broker, self.port, keepalive=self.keepalive)
+            self.client.loop_start()
+        return self._connected.wait(wait)
+
+    def close(self) -> None:
+        if self._started:
+            self._started = False
+            self.client.disconnect()
+            self.client.loop_stop()
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    @property
+    def connected(self) -> bool:
+        return self._connected.is_set()
+
+    # --------------------------------------------------
+    # publish
+    # --------------------------------------------------
+    def publish_chunks(self, topic: str, chunks, wait: bool = True) -> dict:
+        """Publish payloads in order; with `wait`, block until the last one is acknowledged."""
+        if not self._started:
+            self.start()
+        t0 = time.perf_counter()
+        info = None
+        for payload in chunks:
+            info = self.client.publish(topic, payload, qos=self.qos)
+            if info.rc == mqtt.MQTT_ERR_NO_CONN and self.qos > 0:
+                self.queued += 1
+            elif info.rc != mqtt.MQTT_ERR_SUCCESS:
+                self.failed += 1
+            self.bytes += len(payload)
+        self.chunks += len(chunks)
+        self.batches += 1
+
+        delivered = False
+        if wait and info is not None and info.rc == mqtt.MQTT_ERR_SUCCESS:
+            try:
+                info.wait_for_publish(PUBLISH_TIMEOUT)
+                delivered = info.is_published()
+            except RuntimeError:       # koneksi putus di tengah jalan, pesan tetap antre (QoS 1)
+                delivered = False
+
+        ms = (time.perf_counter() - t0) * 1e3
+        self.last_ms, self.max_ms = ms, max(self.max_ms, ms)
+        return {"chunks": len(chunks), "bytes": sum(len(c) for c in chunks),
+                "ms": ms, "delivered": delivered}
+
+    def publish_forecast(self, topic: str, base_ts: int, step_sec: int, series, generated_at=None,
+                         wait: bool = True) -> dict:
+        chunks = encode_forecast(base_ts, step_sec, series, generated_at, max_bytes=self.chunk_bytes)
+        return self.publish_chunks(topic, chunks, wait)
+
+    def metrics(self) -> dict:
+        return {
+            "batches": self.batches,
+            "chunks": self.chunks,
+            "bytes": self.bytes,
+            "queued": self.queued,
+            "failed": self.failed,
+            "connects": self.connects,
+            "disconnects": self.disconnects,
+            "last_ms": round(self.last_ms, 2),
+            "max_ms": round(self.max_ms, 2),
+        }
+
+
+# ======================================================
+# BENCHMARK
+# ======================================================
+
+def _legacy_publish(broker, port, topic, payload: bytes) -> float:
+    """Old publish_batch: new client, connect, one JSON message, disconnect."""
+    t0 = time.perf_counter()
+    cli = mqtt.Client(mqtt.CallbackAPIVersion.VERSION2, client_id="pc-forecast-xgb-168h")
+    cli.connect(broker, port, keepalive=60)
+    cli.loop_start()
+    cli.publish(topic, payload, qos=FORECAST_QOS).wait_for_publish(PUBLISH_TIMEOUT)
+    cli.disconnect()
+    cli.loop_stop()
+    return (time.perf_counter() - t0) * 1e3
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--broker", default="127.0.0.1")
+    ap.add_argument("--port", type=int, default=1883)
+    ap.add_argument("--topic", default="bench/forecast/esp32-01")
+    ap.add_argument("--points", type=int, default=10080)
+    ap.add_argument("--rounds", type=int, default=20)
+    args = ap.parse_args()
+
+    rng = np.random.default_rng(0)
+    base_ts = int(time.time()) // 60 * 60 + 60
+    series = {
+        "temp_c_pred": (27 + rng.normal(0, 1, args.points)).astype(np.float32),
+        "tvoc_ppb_pred": (390 + rng.normal(0, 20, args.points)).astype(np.float32),
+    }
+
+    legacy_ms, packed_ms = [], []
+    json_bytes = packed_bytes = 0
+    with ForecastPublisher(args.broker, args.port) as pub:
+        for _ in range(args.rounds):
+            t0 = time.perf_counter()
+            payload = to_legacy_json({"generated_at": int(time.time()),
+                                      "ts": base_ts + 60 * np.arange(args.points), "series": series})
+            enc_ms = (time.perf_counter() - t0) * 1e3
+            json_bytes = len(payload)
+            legacy_ms.append(enc_ms + _legacy_publish(args.broker, args.port, args.topic, payload))
+
+            t0 = time.perf_counter()
+            res = pub.publish_forecast(args.topic, base_ts, 60, series)
+            packed_ms.append((time.perf_counter() - t0) * 1e3)
+            packed_bytes = res["bytes"]
+
+        print("=" * 70)
+        print(f"📤 FORECAST PUBLISH ({args.points} points, {args.rounds} rounds, QoS {FORECAST_QOS})")
+        print("=" * 70)
+        print(f"JSON, connect per batch : {json_bytes:>9,} B in 1 msg   "
+              f"median {np.median(legacy_ms):7.1f} ms  p95 {np.percentile(legacy_ms, 95):7.1f} ms")
+        print(f"packed, persistent      : {packed_bytes:>9,} B in {res['chunks']} msgs  "
+              f"median {np.median(packed_ms):7.1f} ms  p95 {np.percentile(packed_ms, 95):7.1f} ms")
+        print(f"📊 {pub.metrics()}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,323 @@
+# hourly_forecast.py — forecast per device dipicu saat satu jam data selesai (ingest-driven)
+import json
+import queue
+import sqlite3
+import sys
+import threading
+import time
+from pathlib import Path
+
+# PATH FIX (allow ai.*)
+sys.path.append(str(Path(__file__).resolve().parents[1]))  # backend/
+
+HOUR_SEC = 3600
+
+
+class HourCloseTracker:
+    """
+    Detects closed device-hours from committed rows.
+
+    An hour is closed for a device once a row from a later hour has been
+    committed; each (device, hour) is reported once. Late rows for older
+    hours are ignored. Called from writer threads, so guarded by a lock.
+    """
+
+    def __init__(self, device_col: int = 1):
+        self.device_col = device_col
+        self._open_hour = {}
+        self._lock = threading.Lock()
+
+    def observe(self, rows) -> list:
+        closed = []
+        with self._lock:
+            for row in rows:
+                dev = row[self.device_col]
+                if dev is None:
+                    continue
+                hour = row[0] - row[0] % HOUR_SEC
+                prev = self._open_hour.get(dev)
+                if prev is None or hour > prev:
+                    self._open_hour[dev] = hour
+                    if prev is not None:
+                        closed.append((dev, prev))
+        return closed
+
+
+class ForecastScheduler:
+    """
+    Worker pool for per-device forecast jobs, with coalescing.
+
+    - At most one job per device runs at a time.
+    - While a device has a job queued or running, newer closed hours
+      replace the pending one (coalesced) instead of piling up, so a
+      backlog collapses to "forecast from the latest closed hour".
+    - A (device, hour) at or before the last completed hour is skipped,
+      so each hour is forecast at most once.
+
+    `job_fn(device_id, hour)` does the work and returns a result that is
+    passed to every `sinks` callable as `sink(device_id, hour, result)`.
+    """
+
+    def __init__(self, job_fn, sinks=(), workers: int = 2, last_done=None):
+        self.job_fn = job_fn
+        self.sinks = list(sinks)
+        self.workers = max(1, workers)
+
+        self._q = queue.Queue()
+        self._lock = threading.Lock()
+        self._pending = {}                     # device → latest closed hour
+        self._running = set()
+        self._last_done = dict(last_done or {})
+        self._threads = []
+
+        # metrics
+        self.submitted = 0
+        self.coalesced = 0
+        self.skipped = 0
+        self.completed = 0
+        self.failed = 0
+        self.job_ms_total = 0.0
+        self.job_ms_max = 0.0
+        self.lag_s_max = 0.0                    # hour close → forecast done
+
+    # --------------------------------------------------
+    # producer side (writer thread)
+    # --------------------------------------------------
+    def submit(self, device_id, hour: int) -> None:
+        with self._lock:
+            self.submitted += 1
+            if hour <= self._last_done.get(device_id, -1):
+                self.skipped += 1
+                return
+            if device_id in self._pending:
+                self.coalesced += 1
+                self._pending[device_id] = max(self._pending[device_id], hour)
+                return
+            self._pending[device_id] = hour
+            if device_id not in self._running:
+                self._q.put(device_id)
+
+    def submit_closed(self, closed) -> None:
+        for device_id, hour in closed:
+            self.submit(device_id, hour)
+
+    # --------------------------------------------------
+    # workers
+    # --------------------------------------------------
+    def start(self) -> None:
+        for i in range(self.workers):
+            t = threading.Thread(target=self._worker, name=f"forecast-{i}", daemon=True)
+            t.start()
+            self._threads.append(t)
+
+    def stop(self, timeout: float = 30.0) -> None:
+        for _ in self._threads:
+            self._q.put(None)
+        for t in self._threads:
+            t.join(timeout)
+
+    def _worker(self) -> None:
+        while True:
+            device_id = self._q.get()
+            if device_id is None:
+                return
+
+            with self._lock:
+                hour = self._pending.pop(device_id, None)
+                if hour is None:
+                    continue
+                self._running.add(device_id)
+
+            t0 = time.perf_counter()
+            try:
+                result = self.job_fn(device_id, hour)
+                for sink in self.sinks:
+                    sink(device_id, hour, result)
+                ok = True
+            except Exception as e:
+                print(f"❌ forecast error ({device_id} @ {hour}):", e)
+                ok = False
+            ms = (time.perf_counter() - t0) * 1000.0
+
+            with self._lock:
+                self._running.discard(device_id)
+                if ok:
+                    self.completed += 1
+                    self._last_done[device_id] = max(hour, self._last_done.get(device_id, -1))
+                    self.job_ms_total += ms
+                    self.job_ms_max = max(self.job_ms_max, ms)
+                    self.lag_s_max = max(self.lag_s_max, time.time() - (hour + HOUR_SEC))
+                else:
+                    self.failed += 1
+                # jam baru masuk saat job berjalan → antrikan lagi device ini
+                if device_id in self._pending:
+                    self._q.put(device_id)
+
+    # --------------------------------------------------
+    # metrics
+    # --------------------------------------------------
+    def metrics(self) -> dict:
+        with self._lock:
+            return {
+                "pending": len(self._pending),
+                "running": len(self._running),
+                "submitted": self.submitted,
+                "coalesced": self.coalesced,
+                "skipped": self.skipped,
+                "completed": self.completed,
+                "failed": self.failed,
+                "job_ms_avg": (self.job_ms_total / self.completed) if self.completed else 0.0,
+                "job_ms_max": self.job_ms_max,
+                "lag_s_max": self.lag_s_max,
+            }
+
+    def print_metrics(self) -> None:
+        m = self.metrics()
+        print(
+            f"📊 forecast pending={m['pending']} running={m['running']} done={m['completed']} "
+            f"failed={m['failed']} coalesced={m['coalesced']} skipped={m['skipped']} "
+            f"job_ms(avg/max)={m['job_ms_avg']:.1f}/{m['job_ms_max']:.1f}"
+        )
+
+
+# ======================================================
+# JOB: hourly model on sensor_hourly (ai/models/xgb_hourly_final.pkl)
+# ======================================================
+
+SQL_CREATE_FORECAST = """
+CREATE TABLE IF NOT EXISTS forecast_hourly (
+    device_id TEXT NOT NULL,
+    hour INTEGER NOT NULL,
+    generated_at INTEGER NOT NULL,
+    payload TEXT NOT NULL,
+    PRIMARY KEY (device_id, hour)
+) WITHOUT ROWID;
+"""
+
+
+def load_last_done(db_paths) -> dict:
+    """Last forecast hour per device from `forecast_hourly` (restart-safe)."""
+    last = {}
+    for path in sorted(set(db_paths)):
+        con = sqlite3.connect(path)
+        con.execute(SQL_CREATE_FORECAST)
+        for dev, hour in con.execute("SELECT device_id, MAX(hour) FROM forecast_hourly GROUP BY device_id"):
+            last[dev] = max(hour, last.get(dev, -1))
+        con.close()
+    return last
+
+
+def make_hourly_model_job(model_path: str, db_path_for, lookback_hours: int = 48):
+    """
+    Build `job(device_id, hour) -> dict` that predicts the next hour from
+    the hourly rollup up to and including the closed `hour`.
+    """
+    import joblib
+
+    from ai.db.sensor_hourly import BASE_COLS, load_hourly
+    from ai.features.build_features import build_latest_features
+
+    bundle = joblib.load(model_path)
+    model = bundle["model"]
+    scaler = bundle.get("scaler")
+    feature_names = bundle["feature_names"]
+    target_cols = bundle["target_cols"]
+
+    def job(device_id, hour):
+        con = sqlite3.connect(db_path_for(device_id), timeout=30)
+        try:
+            df = load_hourly(con, device_id, hour - lookback_hours * HOUR_SEC, hour)
+        finally:
+            con.close()
+        if df.empty:
+            raise RuntimeError("no hourly data")
+
+        X = build_latest_features(df[BASE_COLS])[feature_names].to_numpy()
+        if scaler is not None:
+            X = scaler.transform(X)
+        pred = model.predict(X)[0]
+        return {
+            "device_id": device_id,
+            "hour": int(hour),
+            "target_ts": int(hour + HOUR_SEC),
+            "generated_at": int(time.time()),
+            "forecast": {c: float(v) for c, v in zip(target_cols, pred)},
+        }
+
+    return job
+
+
+def make_sqlite_sink(db_path_for):
+    """Store results in `forecast_hourly` of the device's shard DB."""
+
+    def sink(device_id, hour, result):
+        con = sqlite3.connect(db_path_for(device_id), timeout=30)
+        try:
+            con.execute(
+                "INSERT OR REPLACE INTO forecast_hourly (device_id, hour, generated_at, payload) "
+                "VALUES (?, ?, ?, ?)",
+                (device_id, int(hour), result["generated_at"], json.dumps(result)),
+            )
+            con.commit()
+        finally:
+            con.close()
+
+    return sink
+
+
+def make_prediction_sink(writer, model_version: str):
+    """Queue results for the MySQL `Prediction` table (ai/db/predictions.py, batched)."""
+    from ai.db.predictions import vector_forecast
+
+    def sink(device_id, hour, result):
+        fc = result["forecast"]
+        writer.add(
+            device_id, int(hour), vector_forecast(list(fc), list(fc.values())), model_version,
+            meta={"source": "mqtt_ingest_sqlite", "target_ts": result["target_ts"], "interval": "1h"},
+            generated_at=result["generated_at"],
+        )
+
+    return sink
+
+
+def make_mqtt_sink(client, topic_fmt: str):
+    """Publish results with an existing (connected) paho client."""
+
+    def sink(device_id, hour, result):
+        client.publish(topic_fmt.format(device_id=device_id), json.dumps(result), qos=0)
+
+    return sink
+
+
+# ======================================================
+# SELF TEST (coalescing, tanpa model)
+# ======================================================
+if __name__ == "__main__":
+    done = []
+
+    def slow_job(device_id, hour):
+        time.sleep(0.05)
+        return hour
+
+    sched = ForecastScheduler(slow_job, sinks=[lambda d, h, r: done.append((d, h))], workers=2)
+    tracker = HourCloseTracker()
+    sched.start()
+
+    # 4 device × 24 jam data menit, commit per 500 baris (~10 ms per commit)
+    t_start = 1_760_000_000 - 1_760_000_000 % HOUR_SEC
+    rows = [(t_start + m * 60, f"esp32-{d:02d}") for m in range(24 * 60) for d in range(4)]
+    for i in range(0, len(rows), 500):
+        sched.submit_closed(tracker.observe(rows[i:i + 500]))
+        time.sleep(0.01)
+    # baris terlambat untuk jam yang sudah selesai → tidak memicu ulang
+    sched.submit_closed(tracker.observe([(t_start + 30, "esp32-00")]))
+    time.sleep(0.5)
+    sched.stop()
+
+    m = sched.metrics()
+    per_dev = {}
+    for d, h in done:
+        per_dev.setdefault(d, []).append(h)
+    assert all(hs == sorted(set(hs)) for hs in per_dev.values()), "hour forecast twice / out of order"
+    print(f"✅ closed hours submitted={m['submitted']} jobs run={m['completed']} coalesced={m['coalesced']}")
+    print("   last hour per device:", {d: (hs[-1] - t_start) // HOUR_SEC for d, hs in sorted(per_dev.items())})
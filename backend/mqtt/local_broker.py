@@ -0,0 +1,208 @@
+# local_broker.py — minimal MQTT 3.1.1 broker (QoS 0/1 in, QoS 0 out) untuk load test lokal
+"""
+Stand-in for broker.emqx.io so the ingest path can be benchmarked offline.
+
+Supports CONNECT, PUBLISH (QoS 0/1, PUBACK for QoS 1), SUBSCRIBE with
+`+`/`#` filters, UNSUBSCRIBE, PINGREQ and DISCONNECT. Retained messages,
+will messages, sessions and QoS 2 are not implemented. Messages for a
+subscriber whose socket buffer is above `max_buffer` are dropped and
+counted, like a broker's max-inflight/queue limit.
+
+Run:
+    python local_broker.py --port 1883
+"""
+import argparse
+import asyncio
+import signal
+import time
+
+CONNECT, PUBLISH, PUBACK, SUBSCRIBE, UNSUBSCRIBE, PINGREQ, DISCONNECT = 1, 3, 4, 8, 10, 12, 14
+
+
+def encode_length(n: int) -> bytes:
+    out = bytearray()
+    while True:
+        b = n % 128
+        n //= 128
+        out.append(b | 0x80 if n else b)
+        if not n:
+            return bytes(out)
+
+
+def publish_packet(topic: bytes, payload: bytes) -> bytes:
+    body = len(topic).to_bytes(2, "big") + topic + payload
+    return b"\x30" + encode_length(len(body)) + body
+
+
+def topic_matches(flt: str, topic: str) -> bool:
+    f_parts = flt.split("/")
+    t_parts = topic.split("/")
+    for i, f in enumerate(f_parts):
+        if f == "#":
+            return True
+        if i >= len(t_parts) or (f != "+" and f != t_parts[i]):
+            return False
+    return len(f_parts) == len(t_parts)
+
+
+class LocalBroker:
+    def __init__(self, host: str = "127.0.0.1", port: int = 1883, max_buffer: int = 16 * 1024 * 1024):
+        self.host = host
+        self.port = port
+        self.max_buffer = max_buffer
+        self.subs = {}            # writer → set(filters)
+        self._route_cache = {}    # topic → [writer]
+
+        # metrics
+        self.received = 0
+        self.forwarded = 0
+        self.dropped = 0
+        self.clients = 0
+
+    # --------------------------------------------------
+    # routing
+    # --------------------------------------------------
+    def _routes(self, topic: bytes) -> list:
+        writers = self._route_cache.get(topic)
+        if writers is None:
+            t = topic.decode("utf-8", errors="replace")
+            writers = [w for w, flts in self.subs.items() if any(topic_matches(f, t) for f in flts)]
+            self._route_cache[topic] = writers
+        return writers
+
+    def _route(self, topic: bytes, payload: bytes) -> None:
+        self.received += 1
+        writers = self._routes(topic)
+        if not writers:
+            return
+        pkt = publish_packet(topic, payload)
+        for w in writers:
+            if w.transport.get_write_buffer_size() > self.max_buffer:
+                self.dropped += 1
+                continue
+            w.write(pkt)
+            self.forwarded += 1
+
+    # --------------------------------------------------
+    # connection
+    # --------------------------------------------------
+    async def _handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        self.clients += 1
+        buf = bytearray()
+        try:
+            while True:
+                chunk = await reader.read(1 << 16)
+                if not chunk:
+                    break
+                buf += chunk
+                pos = 0
+                while True:
+                    # fixed header + remaining length (varint)
+                    if len(buf) - pos < 2:
+                        break
+                    mult, length, i = 1, 0, pos + 1
+                    complete = False
+                    while i < len(buf):
+                        b = buf[i]
+                        length += (b & 0x7F) * mult
+                        mult *= 128
+                        i += 1
+                        if not b & 0x80:
+                            complete = True
+                            break
+                    if not complete or len(buf) - i < length:
+                        break
+                    ptype, flags = buf[pos] >> 4, buf[pos] & 0x0F
+                    body = bytes(buf[i:i + length])
+                    pos = i + length
+                    if not self._on_packet(ptype, flags, body, writer):
+                        return
+                del buf[:pos]
+                await writer.drain()
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            self.clients -= 1
+            if writer in self.subs:
+                del self.subs[writer]
+                self._route_cache.clear()
+            writer.close()
+
+    def _on_packet(self, ptype: int, flags: int, body: bytes, writer) -> bool:
+        if ptype == PUBLISH:
+            qos = (flags >> 1) & 0x03
+            tlen = int.from_bytes(body[:2], "big")
+            topic = body[2:2 + tlen]
+            off = 2 + tlen
+            if qos:
+                writer.write(b"\x40\x02" + body[off:off + 2])
+                off += 2
+            self._route(topic, body[off:])
+        elif ptype == CONNECT:
+            writer.write(b"\x20\x02\x00\x00")
+        elif ptype == SUBSCRIBE:
+            pid, off, granted = body[:2], 2, bytearray()
+            flts = self.subs.setdefault(writer, set())
+            while off < len(body):
+                flen = int.from_bytes(body[off:off + 2], "big")
+                flts.add(body[off + 2:off + 2 + flen].decode("utf-8"))
+                off += 2 + flen + 1
+                granted.append(0)
+            self._route_cache.clear()
+            writer.write(b"\x90" + encode_length(2 + len(granted)) + pid + bytes(granted))
+        elif ptype == UNSUBSCRIBE:
+            pid, off = body[:2], 2
+            flts = self.subs.get(writer, set())
+            while off < len(body):
+                flen = int.from_bytes(body[off:off + 2], "big")
+                flts.discard(body[off + 2:off + 2 + flen].decode("utf-8"))
+                off += 2 + flen
+            self._route_cache.clear()
+            writer.write(b"\xb0\x02" + pid)
+        elif ptype == PINGREQ:
+            writer.write(b"\xd0\x00")
+        elif ptype == DISCONNECT:
+            return False
+        return True
+
+    # --------------------------------------------------
+    # lifecycle
+    # --------------------------------------------------
+    async def serve(self, stop_event: asyncio.Event) -> None:
+        server = await asyncio.start_server(self._handle, self.host, self.port)
+        print(f"✅ Local broker listening on {self.host}:{self.port}", flush=True)
+        async with server:
+            await stop_event.wait()
+
+    def stats(self) -> dict:
+        return {
+            "received": self.received,
+            "forwarded": self.forwarded,
+            "dropped": self.dropped,
+            "clients": self.clients,
+        }
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--host", default="127.0.0.1")
+    ap.add_argument("--port", type=int, default=1883)
+    ap.add_argument("--max-buffer-mb", type=float, default=16)
+    args = ap.parse_args()
+
+    broker = LocalBroker(args.host, args.port, int(args.max_buffer_mb * 1024 * 1024))
+
+    async def run():
+        stop = asyncio.Event()
+        loop = asyncio.get_running_loop()
+        for sig in (signal.SIGINT, signal.SIGTERM):
+            loop.add_signal_handler(sig, stop.set)
+        t0 = time.perf_counter()
+        await broker.serve(stop)
+        print(f"📊 broker {broker.stats()} uptime={time.perf_counter() - t0:.1f}s", flush=True)
+
+    asyncio.run(run())
+
+
+if __name__ == "__main__":
+    main()
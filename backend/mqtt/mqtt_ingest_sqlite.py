@@ -1,17 +1,37 @@
 import os
-import json
-import time
+import sys
 import sqlite3
-import threading
+from pathlib import Path
 import paho.mqtt.client as mqtt
 
+# PATH FIX (allow ai.*)
+sys.path.append(str(Path(__file__).resolve().parents[1]))  # backend/
+
+from ai.db import sqlite_store
+from ai.db.compaction import CompactionThread
+from ai.db.predictions import get_writer
+from ai.db.sensor_hourly import apply_batch, create_hourly_table, rebuild_hourly
+from hourly_forecast import (
+    ForecastScheduler,
+    HourCloseTracker,
+    load_last_done,
+    make_hourly_model_job,
+    make_mqtt_sink,
+    make_prediction_sink,
+    make_sqlite_sink,
+)
+from payload_decode import JSON_BACKEND, SampledLogger, make_row_decoder
+from sqlite_writer import ShardedWriter
+
 # ======================================================
 # MQTT CONFIG
 # ======================================================
-BROKER = "broker.emqx.io"
-PORT = 1883
-TOPIC_IN = "uninus/iot/air_quality/esp32-01"
+BROKER = os.getenv("INGEST_BROKER", "broker.emqx.io")  # mqtt_loadtest.py → 127.0.0.1
+PORT = int(os.getenv("INGEST_PORT", "1883"))
+# Wildcard: satu level terakhir = device id (uninus/iot/air_quality/<device_id>)
+TOPIC_IN = os.getenv("INGEST_TOPIC", "uninus/iot/air_quality/+")
 CLIENT_ID = "pc-ingest-sqlite"
+DEFAULT_DEVICE_ID = "esp32"
 
 # ======================================================
 # SQLITE CONFIG
@@ -19,36 +39,86 @@ CLIENT_ID = "pc-ingest-sqlite"
 DB_PATH = "data/sensor.db"
 os.makedirs("data", exist_ok=True)
 
-con = sqlite3.connect(DB_PATH, check_same_thread=False)
-cur = con.cursor()
+# Writer shards (routing by device hash)
+#   INGEST_SHARD_MODE=shared → semua shard menulis ke DB_PATH, masing-masing koneksi sendiri (default;
+#                              data/sensor.db adalah satu-satunya file yang dibaca sensor_data,
+#                              train_from_db, predict_from_db dan compaction)
+#   INGEST_SHARD_MODE=file   → satu file DB per shard (data/sensor_s{i}.db), tanpa lock contention;
+#                              hanya untuk benchmark — reader tidak membuka file shard
+INGEST_SHARDS = max(1, int(os.getenv("INGEST_SHARDS", "1")))
+INGEST_SHARD_MODE = os.getenv("INGEST_SHARD_MODE", "shared")
+
+# Writer thread (batched commits, off the MQTT network thread)
+WRITER_MAX_QUEUE = int(os.getenv("INGEST_MAX_QUEUE", "10000"))
+WRITER_BATCH_SIZE = int(os.getenv("INGEST_BATCH_SIZE", "500"))
+WRITER_FLUSH_SEC = float(os.getenv("INGEST_FLUSH_SEC", "1.0"))
+WRITER_PUT_TIMEOUT = float(os.getenv("INGEST_PUT_TIMEOUT", "0.05"))  # backpressure sebelum drop
+WRITER_METRICS_SEC = float(os.getenv("INGEST_METRICS_SEC", "60"))
+
+# Storage profile (ai/db/sqlite_store.py): "tuned" | "legacy"
+INGEST_STORAGE_PROFILE = os.getenv("INGEST_STORAGE_PROFILE", sqlite_store.DEFAULT_PROFILE)
+CHECKPOINT_SEC = float(os.getenv("INGEST_CHECKPOINT_SEC", str(sqlite_store.CHECKPOINT_INTERVAL_SEC)))
 
-# Enable WAL mode (safe concurrent read/write)
-cur.execute("PRAGMA journal_mode=WAL;")
-con.commit()
+# Rollup per jam (tabel sensor_hourly) di-upsert bersama raw rows
+INGEST_ROLLUP = os.getenv("INGEST_ROLLUP", "1") == "1"
 
-db_lock = threading.Lock()
+# Retensi raw rows (hari); > 0 → compaction ke sensor_hourly di background
+RETENTION_DAYS = int(os.getenv("INGEST_RETENTION_DAYS", "0"))
+COMPACT_SEC = float(os.getenv("INGEST_COMPACT_SEC", "3600"))
+
+# Forecast per device setiap kali satu jam selesai (opt-in: INGEST_FORECAST=1, butuh INGEST_ROLLUP)
+INGEST_FORECAST = os.getenv("INGEST_FORECAST", "0") == "1" and INGEST_ROLLUP
+FORECAST_MODEL_PATH = os.getenv("INGEST_FORECAST_MODEL", "models/xgb_hourly_final.pkl")
+FORECAST_WORKERS = int(os.getenv("INGEST_FORECAST_WORKERS", "2"))
+FORECAST_LOOKBACK_H = int(os.getenv("INGEST_FORECAST_LOOKBACK_H", "48"))
+FORECAST_PUBLISH = os.getenv("INGEST_FORECAST_PUBLISH", "0") == "1"  # opt-in: publish ke TOPIC_FORECAST
+TOPIC_FORECAST = "uninus/iot/air_quality/{device_id}/forecast"  # tidak cocok dengan wildcard TOPIC_IN
+# Juga simpan ke tabel MySQL `Prediction` (DATABASE_URL, batch insert di background)
+FORECAST_STORE_DB = os.getenv("INGEST_FORECAST_STORE_DB", "0") == "1"
+
+# Log per-row dibatasi (maks. 1 baris per interval, sisanya dihitung)
+LOG_INTERVAL_SEC = float(os.getenv("INGEST_LOG_SEC", "10"))
 
 # ======================================================
 # DB SCHEMA
 # ======================================================
-cur.execute("""
-CREATE TABLE IF NOT EXISTS sensor (
-    ts INTEGER NOT NULL,
-    device_id TEXT,
-    temp_c REAL,
-    rh_pct REAL,
-    tvoc_ppb REAL,
-    eco2_ppm REAL,
-    dust_ugm3 REAL
-);
-""")
-
-# Unique index (anti duplicate)
-cur.execute("""
-CREATE UNIQUE INDEX IF NOT EXISTS uniq_ts_dev
-ON sensor (ts, device_id);
-""")
-con.commit()
+def connect_db(path: str) -> sqlite3.Connection:
+    return sqlite_store.connect(path, INGEST_STORAGE_PROFILE)
+
+
+def init_db(path: str) -> None:
+    con = connect_db(path)
+    cur = con.cursor()
+
+    # sensor table: tuned = WITHOUT ROWID (device_id, ts); legacy = rowid + uniq_ts_dev
+    current = sqlite_store.detect_profile(con)
+    if current is not None and current != INGEST_STORAGE_PROFILE:
+        print(f"⚠️ {path} uses the '{current}' layout; run "
+              f"`python -m ai.db.sqlite_store migrate --db {path} --profile {INGEST_STORAGE_PROFILE}`")
+    sqlite_store.create_sensor_table(con, current or INGEST_STORAGE_PROFILE)
+
+    # Hourly rollup (device_id, hour) → count/sum/sumsq/min/max/p90
+    create_hourly_table(con)
+    if INGEST_ROLLUP and cur.execute("SELECT 1 FROM sensor_hourly LIMIT 1").fetchone() is None:
+        if cur.execute("SELECT 1 FROM sensor LIMIT 1").fetchone() is not None:
+            print("⏳ Backfilling sensor_hourly from existing rows...", path)
+            rebuild_hourly(con)
+    con.close()
+
+
+def shard_db_paths(n: int = INGEST_SHARDS, mode: str = INGEST_SHARD_MODE) -> list:
+    if n == 1 or mode == "shared":
+        return [DB_PATH] * n
+    root, ext = os.path.splitext(DB_PATH)
+    return [f"{root}_s{i}{ext}" for i in range(n)]
+
+
+DB_PATHS = shard_db_paths()
+if INGEST_SHARD_MODE == "file" and INGEST_SHARDS > 1:
+    print("⚠️ INGEST_SHARD_MODE=file: rows go to data/sensor_s{i}.db, which the readers "
+          "(sensor_data, train_from_db, predict_from_db) do not open")
+for path in sorted(set(DB_PATHS)):
+    init_db(path)
 
 # ======================================================
 # SQL INSERT
@@ -59,7 +129,37 @@ INSERT OR IGNORE INTO sensor
 VALUES (?, ?, ?, ?, ?, ?, ?)
 """
 
-print("✅ SQLite ready:", DB_PATH)
+# Jam yang selesai dideteksi dari baris yang SUDAH di-commit (hook writer)
+hour_tracker = HourCloseTracker()
+forecaster = None
+prediction_writer = None
+
+
+def on_commit(batch):
+    if forecaster is not None:
+        forecaster.submit_closed(hour_tracker.observe(batch))
+
+
+print("✅ JSON decoder:", JSON_BACKEND)
+print("✅ SQLite ready:", ", ".join(sorted(set(DB_PATHS))),
+      f"(shards={INGEST_SHARDS}, profile={INGEST_STORAGE_PROFILE})")
+
+writer = ShardedWriter(
+    DB_PATHS,
+    SQL_INSERT,
+    max_queue=WRITER_MAX_QUEUE,
+    batch_size=WRITER_BATCH_SIZE,
+    flush_interval=WRITER_FLUSH_SEC,
+    put_timeout=WRITER_PUT_TIMEOUT,
+    metrics_interval=WRITER_METRICS_SEC,
+    write_fn=apply_batch if INGEST_ROLLUP else None,
+    connect_fn=connect_db,
+    checkpoint_interval=CHECKPOINT_SEC,
+    on_commit=on_commit,
+)
+
+# Raw rows lebih tua dari RETENTION_DAYS dirangkum per jam lalu dihapus (batch kecil)
+compactor = CompactionThread(DB_PATHS, RETENTION_DAYS, COMPACT_SEC) if RETENTION_DAYS > 0 else None
 
 # ======================================================
 # MQTT CALLBACKS
@@ -69,40 +169,32 @@ def on_connect(client, userdata, flags, reason_code, properties):
     client.subscribe(TOPIC_IN)
     print("📥 Listening topic:", TOPIC_IN)
 
+def device_from_topic(topic: str) -> str:
+    return topic.rsplit("/", 1)[-1] or DEFAULT_DEVICE_ID
+
+# Skip non-JSON & forecast batch, ts normalize (ms → s), coerce numeric fields
+decode_row = make_row_decoder(device_from_topic)
+
+log_queued = SampledLogger(LOG_INTERVAL_SEC)
+log_skipped = SampledLogger(LOG_INTERVAL_SEC)
+log_dropped = SampledLogger(LOG_INTERVAL_SEC)
+log_error = SampledLogger(LOG_INTERVAL_SEC)
+
 def on_message(client, userdata, msg):
     try:
-        raw = msg.payload.decode("utf-8", errors="ignore").strip()
-
-        # Skip non-JSON
-        if not raw.startswith("{"):
-            print("⚠️ Skipped non-JSON payload")
+        row = decode_row(msg.payload, msg.topic)
+        if row is None:
+            log_skipped.log("⚠️ Skipped non-sensor payload on", msg.topic)
             return
 
-        d = json.loads(raw)
-
-        # Timestamp normalize
-        ts = int(d.get("ts", time.time()))
-        if ts > 1e12:   # milliseconds → seconds
-            ts //= 1000
-
-        row = (
-            ts,
-            d.get("device_id", "esp32"),
-            d.get("temp_c"),
-            d.get("rh_pct"),
-            d.get("tvoc_ppb"),
-            d.get("eco2_ppm"),
-            d.get("dust_ugm3"),
-        )
-
-        with db_lock:
-            cur.execute(SQL_INSERT, row)
-            con.commit()
+        if not writer.submit(row):
+            log_dropped.log("⚠️ Writer queue full, dropped:", row)
+            return
 
-        print("✅ Inserted:", row)
+        log_queued.log("✅ Queued:", row)
 
     except Exception as e:
-        print("❌ ingest error:", e)
+        log_error.log("❌ ingest error:", e)
 
 # ======================================================
 # MAIN
@@ -118,6 +210,33 @@ def main():
 
     client.reconnect_delay_set(min_delay=1, max_delay=10)
 
+    global forecaster, prediction_writer
+    if INGEST_FORECAST and os.path.exists(FORECAST_MODEL_PATH):
+        def db_path_for(device_id):
+            return writer.shard_for(device_id).db_path
+
+        sinks = [make_sqlite_sink(db_path_for)]
+        if FORECAST_PUBLISH:
+            sinks.append(make_mqtt_sink(client, TOPIC_FORECAST))
+        if FORECAST_STORE_DB:
+            prediction_writer = get_writer()
+            sinks.append(make_prediction_sink(prediction_writer, Path(FORECAST_MODEL_PATH).stem))
+        forecaster = ForecastScheduler(
+            make_hourly_model_job(FORECAST_MODEL_PATH, db_path_for, FORECAST_LOOKBACK_H),
+            sinks=sinks,
+            workers=FORECAST_WORKERS,
+            last_done=load_last_done(DB_PATHS),
+        )
+        forecaster.start()
+        print(f"🔮 Hourly forecast on: {FORECAST_MODEL_PATH} (workers={FORECAST_WORKERS})")
+    elif INGEST_FORECAST:
+        print(f"⚠️ Forecast model not found: {FORECAST_MODEL_PATH} (hourly forecast off)")
+
+    writer.start()
+    if compactor is not None:
+        compactor.start()
+        print(f"🧹 Compaction on: keep {RETENTION_DAYS} days raw, every {COMPACT_SEC:.0f}s")
+
     print(f"🔌 Connecting to MQTT {BROKER}:{PORT} ...")
     client.connect(BROKER, PORT, keepalive=60)
     client.loop_forever()
@@ -127,6 +246,15 @@ if __name__ == "__main__":
     try:
         main()
     finally:
-        con.commit()
-        con.close()
+        if compactor is not None:
+            compactor.stop()
+        if writer.is_alive():
+            writer.stop()
+        writer.print_metrics()
+        if forecaster is not None:
+            forecaster.stop()
+            forecaster.print_metrics()
+        if prediction_writer is not None:
+            prediction_writer.stop()
+            print("💾 Prediction table:", prediction_writer.metrics())
         print("🛑 SQLite closed")
@@ -0,0 +1,355 @@
+# mqtt_loadtest.py — load generator + replay harness untuk mqtt_ingest_sqlite.py (offline)
+"""
+Repeatable ingest benchmark without broker.emqx.io.
+
+For every target rate:
+1. start local_broker.py on a free localhost port,
+2. start mqtt_ingest_sqlite.py in a fresh temp dir (its own data/sensor*.db)
+   pointed at that broker (INGEST_BROKER / INGEST_PORT),
+3. publish synthetic multi-device messages, or sensor_raw.csv replayed,
+   at the target rate for `--duration` seconds,
+4. poll the ingester's SQLite files read-only to see when each row is
+   committed, then stop everything and collect writer/broker metrics.
+
+Every message gets a unique `ts` (BASE_TS + sequence), so a committed row
+maps back to its send time. End-to-end latency = first poll that sees the
+row − send time, so its resolution is `--poll-ms`; with the default
+INGEST_FLUSH_SEC=1.0 the flush interval dominates at low rates.
+
+INGEST_* variables in the environment (shards, batch size, profile...)
+are passed through to the ingester.
+
+`--check` exits non-zero unless every published row ended up in the
+ingester's SQLite files, e.g. the shared-file multi-writer regression:
+    INGEST_SHARDS=4 python mqtt_loadtest.py --rates 5000 --duration 2 --check
+
+Run (from backend/mqtt or anywhere):
+    python mqtt_loadtest.py --rates 1000,5000,10000,20000,50000 --duration 10
+    python mqtt_loadtest.py --source replay --csv ../ai/data/sensor_raw.csv --rates 2000
+"""
+import argparse
+import csv
+import json
+import os
+import re
+import shutil
+import signal
+import socket
+import sqlite3
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from pathlib import Path
+
+import numpy as np
+
+from local_broker import encode_length, publish_packet
+
+HERE = Path(__file__).resolve().parent
+INGEST_SCRIPT = HERE / "mqtt_ingest_sqlite.py"
+BROKER_SCRIPT = HERE / "local_broker.py"
+DEFAULT_CSV = HERE.parent / "ai" / "data" / "sensor_raw.csv"
+
+TOPIC_FMT = "uninus/iot/air_quality/{device_id}"
+BASE_TS = 1_700_000_000
+FIELDS = ("temp_c", "rh_pct", "tvoc_ppb", "eco2_ppm", "dust_ugm3")
+TICK_SEC = 0.005
+
+# ======================================================
+# PROCESSES
+# ======================================================
+
+def free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+class Proc:
+    """Subprocess with stdout collected on a thread (and a wait-for-line helper)."""
+
+    def __init__(self, args, cwd=None, env=None):
+        self.p = subprocess.Popen(
+            args, cwd=cwd, env=env, text=True,
+            stdout=subprocess.PIPE, stderr=subprocess.STDOUT, bufsize=1,
+        )
+        self.lines = []
+        self._t = threading.Thread(target=self._read, daemon=True)
+        self._t.start()
+
+    def _read(self):
+        for line in self.p.stdout:
+            self.lines.append(line.rstrip("\n"))
+
+    def wait_for(self, text: str, timeout: float = 30.0) -> None:
+        deadline = time.monotonic() + timeout
+        while time.monotonic() < deadline:
+            if any(text in l for l in self.lines):
+                return
+            if self.p.poll() is not None:
+                break
+            time.sleep(0.05)
+        raise RuntimeError(f"timeout waiting for {text!r}:\n" + "\n".join(self.lines[-20:]))
+
+    def interrupt(self, timeout: float = 60.0) -> None:
+        if self.p.poll() is None:
+            self.p.send_signal(signal.SIGINT)
+            try:
+                self.p.wait(timeout)
+            except subprocess.TimeoutExpired:
+                self.p.kill()
+        self._t.join(5)
+
+
+# ======================================================
+# MESSAGES
+# ======================================================
+
+def build_messages(n: int, n_devices: int, source: str, csv_path: Path) -> list:
+    """Pre-encoded MQTT PUBLISH packets; message i has ts = BASE_TS + i."""
+    if source == "replay":
+        with open(csv_path, newline="") as f:
+            rows = [
+                tuple(float(r[k]) if r.get(k) not in (None, "") else None for k in FIELDS)
+                for r in csv.DictReader(f)
+            ]
+    else:
+        rng = np.random.default_rng(0)
+        rows = [
+            (round(28 + rng.normal(0, 1), 2), round(65 + rng.normal(0, 3), 2),
+             float(rng.integers(100, 900)), float(rng.integers(400, 1200)), 0.0)
+            for _ in range(4096)
+        ]
+
+    topics = [TOPIC_FMT.format(device_id=f"esp32-{d:02d}").encode() for d in range(n_devices)]
+    packets = []
+    for i in range(n):
+        d = i % n_devices
+        payload = {"ts": BASE_TS + i, "device_id": f"esp32-{d:02d}"}
+        payload.update(zip(FIELDS, rows[i % len(rows)]))
+        packets.append(publish_packet(topics[d], json.dumps(payload).encode()))
+    return packets
+
+
+def connect_packet(client_id: str) -> bytes:
+    cid = client_id.encode()
+    body = b"\x00\x04MQTT\x04\x02\x00\x3c" + len(cid).to_bytes(2, "big") + cid
+    return b"\x10" + encode_length(len(body)) + body
+
+
+def publish_paced(port: int, packets: list, rate: float) -> np.ndarray:
+    """Send packets at `rate` msgs/s in TICK_SEC bursts; returns send times."""
+    n = len(packets)
+    send_t = np.zeros(n)
+    sock = socket.create_connection(("127.0.0.1", port))
+    sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+    sock.sendall(connect_packet("pc-loadgen"))
+    sock.recv(4)  # CONNACK
+
+    sent, t0 = 0, time.perf_counter()
+    while sent < n:
+        now = time.perf_counter()
+        due = min(n, int((now - t0) * rate) + 1)
+        if due > sent:
+            sock.sendall(b"".join(packets[sent:due]))
+            send_t[sent:due] = now
+            sent = due
+        else:
+            time.sleep(TICK_SEC)
+    sock.sendall(b"\xe0\x00")  # DISCONNECT
+    sock.close()
+    return send_t
+
+
+# ======================================================
+# COMMIT POLLER
+# ======================================================
+
+class CommitPoller(threading.Thread):
+    """Polls data/sensor*.db (read-only) and records when each ts appears."""
+
+    def __init__(self, data_dir: Path, n: int, poll_sec: float):
+        super().__init__(daemon=True)
+        self.data_dir = data_dir
+        self.poll_sec = poll_sec
+        self.seen_t = np.full(n, np.nan)
+        self.count = 0
+        self._stop_event = threading.Event()
+
+    def run(self):
+        cons = {}
+        while not self._stop_event.is_set():
+            # scan dari baris pertama yang belum terlihat (bukan max_ts yang sudah terlihat):
+            # shard yang tertinggal (shared mode) commit ts yang jauh lebih kecil
+            unseen = np.flatnonzero(np.isnan(self.seen_t))
+            if not len(unseen):
+                break
+            low = BASE_TS + int(unseen[0])
+            for path in sorted(self.data_dir.glob("sensor*.db")):
+                if path not in cons:
+                    cons[path] = sqlite3.connect(f"file:{path}?mode=ro", uri=True, check_same_thread=False)
+                try:
+                    rows = cons[path].execute("SELECT ts FROM sensor WHERE ts >= ?", (low,)).fetchall()
+                except sqlite3.OperationalError:
+                    continue
+                if not rows:
+                    continue
+                now = time.perf_counter()
+                idx = np.fromiter((r[0] for r in rows), dtype=np.int64) - BASE_TS
+                idx = idx[(idx >= 0) & (idx < len(self.seen_t))]
+                new = idx[np.isnan(self.seen_t[idx])]
+                self.seen_t[new] = now
+                self.count += len(new)
+            time.sleep(self.poll_sec)
+        for con in cons.values():
+            con.close()
+
+    def stop(self):
+        self._stop_event.set()
+        self.join(5)
+
+
+# ======================================================
+# ONE RUN
+# ======================================================
+
+def count_stored(data_dir: Path, n: int) -> int:
+    """Distinct loadtest ts committed across data/sensor*.db (after shutdown)."""
+    seen = set()
+    for path in sorted(data_dir.glob("sensor*.db")):
+        con = sqlite3.connect(f"file:{path}?mode=ro", uri=True)
+        try:
+            seen.update(r[0] for r in con.execute(
+                "SELECT ts FROM sensor WHERE ts >= ? AND ts < ?", (BASE_TS, BASE_TS + n)
+            ))
+        except sqlite3.OperationalError:
+            pass
+        finally:
+            con.close()
+    return len(seen)
+
+
+def _sum_metric(lines, prefix: str, key: str) -> int:
+    pat = re.compile(rf"\b{key}=(\d+)")
+    return sum(int(m.group(1)) for l in lines if l.startswith(prefix) for m in [pat.search(l)] if m)
+
+
+def run_once(rate: int, args) -> dict:
+    n = int(rate * args.duration)
+    packets = build_messages(n, args.devices, args.source, Path(args.csv))
+
+    workdir = Path(tempfile.mkdtemp(prefix="ingest_lt_"))
+    port = free_port()
+    broker = Proc([sys.executable, "-u", str(BROKER_SCRIPT), "--port", str(port)])
+    ingest = None
+    try:
+        broker.wait_for("listening")
+
+        env = dict(os.environ)
+        env.update({
+            "INGEST_BROKER": "127.0.0.1",
+            "INGEST_PORT": str(port),
+            "INGEST_LOG_SEC": "3600",
+            "INGEST_METRICS_SEC": "3600",
+            "INGEST_FORECAST": env.get("INGEST_FORECAST", "0"),
+        })
+        ingest = Proc([sys.executable, "-u", str(INGEST_SCRIPT)], cwd=workdir, env=env)
+        ingest.wait_for("Listening topic")
+        time.sleep(0.2)  # SUBACK sampai di broker
+
+        poller = CommitPoller(workdir / "data", n, args.poll_ms / 1000.0)
+        poller.start()
+
+        t0 = time.perf_counter()
+        send_t = publish_paced(port, packets, rate)
+        t_pub = time.perf_counter() - t0
+
+        # drain: tunggu sampai semua row ter-commit atau tidak ada progres
+        last_count, last_change = -1, time.monotonic()
+        while poller.count < n and time.monotonic() - last_change < args.drain:
+            if poller.count != last_count:
+                last_count, last_change = poller.count, time.monotonic()
+            time.sleep(0.1)
+        poller.stop()
+    finally:
+        if ingest is not None:
+            ingest.interrupt()
+        broker.interrupt()
+
+    seen = ~np.isnan(poller.seen_t)
+    lat_ms = (poller.seen_t[seen] - send_t[seen]) * 1000.0
+    t_last = np.nanmax(poller.seen_t) if seen.any() else t0
+    result = {
+        "rate": rate,
+        "published": n,
+        "pub_rate": n / t_pub,
+        "committed": int(seen.sum()),
+        "commit_rate": seen.sum() / max(t_last - send_t[0], 1e-9),
+        "lost": n - int(seen.sum()),
+        # setelah shutdown (writer sudah drain): jumlah row yang benar-benar tersimpan
+        "stored": count_stored(workdir / "data", n),
+        "writer_dropped": _sum_metric(ingest.lines if ingest else [], "📊 writer", "dropped"),
+        "writer_failed": _sum_metric(ingest.lines if ingest else [], "📊 writer", "failed"),
+        "p50": float(np.percentile(lat_ms, 50)) if len(lat_ms) else float("nan"),
+        "p95": float(np.percentile(lat_ms, 95)) if len(lat_ms) else float("nan"),
+        "p99": float(np.percentile(lat_ms, 99)) if len(lat_ms) else float("nan"),
+        "max": float(lat_ms.max()) if len(lat_ms) else float("nan"),
+    }
+    broker_line = next((l for l in broker.lines if l.startswith("📊 broker")), "")
+    result["broker_dropped"] = int(re.search(r"'dropped': (\d+)", broker_line).group(1)) if broker_line else 0
+
+    if args.verbose:
+        print("\n".join(l for l in ingest.lines if l.startswith(("📊", "⚠️", "❌"))))
+        print(broker_line)
+    if args.keep:
+        print("📁 kept:", workdir)
+    else:
+        shutil.rmtree(workdir, ignore_errors=True)
+    return result
+
+
+# ======================================================
+# MAIN
+# ======================================================
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--rates", default="1000,5000,10000,20000,50000", help="msgs/s, dipisah koma")
+    ap.add_argument("--duration", type=float, default=10.0, help="detik publish per rate")
+    ap.add_argument("--devices", type=int, default=8)
+    ap.add_argument("--source", choices=["synthetic", "replay"], default="synthetic")
+    ap.add_argument("--csv", default=str(DEFAULT_CSV))
+    ap.add_argument("--poll-ms", type=float, default=20.0)
+    ap.add_argument("--drain", type=float, default=5.0, help="detik tanpa progres sebelum berhenti")
+    ap.add_argument("--keep", action="store_true", help="simpan temp dir (DB hasil ingest)")
+    ap.add_argument("-v", "--verbose", action="store_true")
+    ap.add_argument("--check", action="store_true",
+                    help="exit 1 kalau ada row yang tidak tersimpan (mis. shared mode + rollup)")
+    args = ap.parse_args()
+
+    print(f"⏳ source={args.source} devices={args.devices} duration={args.duration}s "
+          f"(INGEST_* env: {', '.join(k for k in os.environ if k.startswith('INGEST_')) or '-'})")
+    results = [run_once(int(r), args) for r in args.rates.split(",")]
+
+    print(f"\n{'target':>8} {'pub/s':>9} {'commit/s':>9} {'committed':>10} {'lost':>7} {'stored':>8} "
+          f"{'w.drop':>7} {'w.fail':>7} {'b.drop':>7} {'p50ms':>8} {'p95ms':>8} {'p99ms':>8} {'maxms':>8}")
+    for r in results:
+        print(
+            f"{r['rate']:>8} {r['pub_rate']:>9.0f} {r['commit_rate']:>9.0f} {r['committed']:>10} "
+            f"{r['lost']:>7} {r['stored']:>8} {r['writer_dropped']:>7} {r['writer_failed']:>7} {r['broker_dropped']:>7} "
+            f"{r['p50']:>8.0f} {r['p95']:>8.0f} {r['p99']:>8.0f} {r['max']:>8.0f}"
+        )
+
+    if args.check:
+        bad = [r for r in results if r["stored"] < r["published"]]
+        for r in bad:
+            print(f"❌ rate {r['rate']}: stored {r['stored']:,} of {r['published']:,} rows")
+        if bad:
+            sys.exit(1)
+        print("✅ every published row was committed")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,28 +1,48 @@
 # mqtt_tail_forecast.py — tail paket batch forecast [WIB print]
 import json
+import sys
 from datetime import datetime, timezone
+from pathlib import Path
 from zoneinfo import ZoneInfo
 import paho.mqtt.client as mqtt
 
+# PATH FIX (allow ai.*)
+sys.path.append(str(Path(__file__).resolve().parents[1]))  # backend/
+
+from ai.utils.forecast_payload import ForecastAssembler, is_forecast_chunk, to_points
+
 BROKER = "broker.emqx.io"
 TOPIC  = "uninus/iot/air_quality/esp32-01"
 WIB = ZoneInfo("Asia/Jakarta")
 
+# chunk packed (forecast_publisher.py) dirakit ulang per topic
+assembler = ForecastAssembler()
+
 def to_wib(ts_epoch):
     return datetime.fromtimestamp(int(ts_epoch), timezone.utc).astimezone(WIB).strftime("%Y-%m-%d %H:%M:%S%z")
 
 def on_connect(client, userdata, flags, rc, properties=None):
     print("listening:", TOPIC)
-    client.subscribe(TOPIC, qos=0)
+    client.subscribe(TOPIC, qos=1)
+
+def print_batch(items, freq):
+    print(f"received batch: items={len(items)}, freq={freq}")
+    for it in items[:24]:
+        ts_wib = to_wib(it.get("ts"))
+        print({**it, "ts_wib": ts_wib})
 
 def on_message(client, userdata, msg):
     try:
+        if is_forecast_chunk(msg.payload):
+            fc = assembler.add(msg.payload, msg.topic)
+            if fc is not None:
+                print_batch(to_points(fc), f"{fc['step_sec']}s")
+                print("chunks:", assembler.metrics())
+            return
+
         d = json.loads(msg.payload.decode("utf-8"))
         if "forecast" in d and isinstance(d["forecast"], list):
-            print(f"received batch: items={len(d['forecast'])}, freq={d.get('freq')}")
-            for it in d["forecast"][:24]:
-                ts_wib = to_wib(it.get("ts"))
-                print({**it, "ts_wib": ts_wib})
+            print_batch(d["forecast"], d.get("freq"))
         else:
             print(d)
     except Exception as e:
@@ -32,6 +52,7 @@ def main():
     cli = mqtt.Client(mqtt.CallbackAPIVersion.VERSION2, client_id="pc-tail-forecast")
     cli.on_connect = on_connect
     cli.on_message = on_message
+    cli.reconnect_delay_set(min_delay=1, max_delay=30)
     cli.connect(BROKER, 1883, keepalive=60)
     cli.loop_forever()
 
@@ -0,0 +1,153 @@
+# payload_decode.py — fast-path decoding payload sensor MQTT → row SQLite
+import time
+
+try:
+    import orjson
+
+    def json_loads(raw):
+        return orjson.loads(raw)
+
+    JSON_BACKEND = "orjson"
+except ImportError:  # fallback stdlib
+    import json
+
+    def json_loads(raw):
+        return json.loads(raw)
+
+    JSON_BACKEND = "json"
+
+SENSOR_FIELDS = ("temp_c", "rh_pct", "tvoc_ppb", "eco2_ppm", "dust_ugm3")
+
+
+def _to_float(v):
+    if v is None:
+        return None
+    try:
+        return float(v)
+    except (TypeError, ValueError):
+        return None
+
+
+def make_row_decoder(device_from_topic, fields=SENSOR_FIELDS):
+    """
+    Build a decoder `decode(payload: bytes, topic: str) -> tuple | None`.
+
+    Row layout: (ts, device_id, *fields). Field names are bound once here
+    so the per-message work is one JSON parse plus plain dict lookups.
+    Returns None for non-JSON payloads and forecast batches.
+    """
+    fields = tuple(fields)
+
+    def decode(payload, topic):
+        raw = payload.lstrip()
+        if raw[:1] != b"{":
+            return None
+
+        d = json_loads(raw)
+        if "forecast" in d:
+            return None
+
+        ts = d.get("ts")
+        ts = int(ts) if ts is not None else int(time.time())
+        if ts > 1e12:   # milliseconds → seconds
+            ts //= 1000
+
+        get = d.get
+        vals = []
+        for f in fields:
+            v = get(f)
+            vals.append(v if type(v) is float else _to_float(v))
+
+        return (ts, get("device_id") or device_from_topic(topic), *vals)
+
+    return decode
+
+
+class SampledLogger:
+    """
+    Rate-limited print: at most one line per `interval` seconds, plus the
+    number of suppressed calls since the last line.
+    """
+
+    def __init__(self, interval: float = 10.0):
+        self.interval = interval
+        self.suppressed = 0
+        self._next = 0.0
+
+    def log(self, *args) -> None:
+        now = time.monotonic()
+        if now < self._next:
+            self.suppressed += 1
+            return
+        if self.suppressed:
+            print(*args, f"(+{self.suppressed} more)")
+        else:
+            print(*args)
+        self.suppressed = 0
+        self._next = now + self.interval
+
+
+# ======================================================
+# BENCHMARK (replay sensor_raw.csv)
+# ======================================================
+if __name__ == "__main__":
+    import argparse
+    import contextlib
+    import csv
+    import io
+    import json as std_json
+
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--csv", default="data/sensor_raw.csv")
+    ap.add_argument("--repeat", type=int, default=5)
+    args = ap.parse_args()
+
+    topic = "uninus/iot/air_quality/esp32-01"
+    with open(args.csv, newline="") as f:
+        payloads = []
+        for r in csv.DictReader(f):
+            d = {"ts": int(float(r["ts"])), "device_id": r.get("device_id") or "esp32-01"}
+            for k in SENSOR_FIELDS:
+                d[k] = float(r[k]) if r.get(k) not in (None, "") else None
+            payloads.append(std_json.dumps(d).encode("utf-8"))
+    payloads *= args.repeat
+
+    def legacy(payload, topic):
+        # jalur lama on_message: decode/strip/startswith/json.loads/get + print per row
+        raw = payload.decode("utf-8", errors="ignore").strip()
+        if not raw.startswith("{"):
+            return None
+        d = std_json.loads(raw)
+        ts = int(d.get("ts", time.time()))
+        if ts > 1e12:
+            ts //= 1000
+        row = (
+            ts,
+            d.get("device_id", "esp32"),
+            d.get("temp_c"),
+            d.get("rh_pct"),
+            d.get("tvoc_ppb"),
+            d.get("eco2_ppm"),
+            d.get("dust_ugm3"),
+        )
+        print("✅ Inserted:", row)
+        return row
+
+    fast = make_row_decoder(lambda t: t.rsplit("/", 1)[-1])
+    logger = SampledLogger(interval=10.0)
+
+    def fast_path(payload, topic):
+        row = fast(payload, topic)
+        logger.log("✅ Queued:", row)
+        return row
+
+    sink = io.StringIO()
+    for name, fn in (("legacy", legacy), (f"fast ({JSON_BACKEND})", fast_path)):
+        with contextlib.redirect_stdout(sink):
+            t0 = time.perf_counter()
+            for p in payloads:
+                fn(p, topic)
+            dt = time.perf_counter() - t0
+        sink.seek(0)
+        sink.truncate()
+        print(f"{name:16s}: {len(payloads) / dt:12,.0f} msgs/s ({len(payloads)} msgs, {dt:.3f}s)")
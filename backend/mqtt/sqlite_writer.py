@@ -0,0 +1,365 @@
+# sqlite_writer.py — buffered, batched SQLite writer untuk MQTT ingest
+import queue
+import sqlite3
+import threading
+import time
+import zlib
+
+_STOP = object()
+LOG_BAD_ROWS = 3  # berapa baris pertama dari batch gagal yang di-print
+
+# Error yang disebabkan isi baris: batch dipecah, hanya baris rusak yang dibuang
+BAD_ROW_ERRORS = (
+    sqlite3.IntegrityError,
+    sqlite3.InterfaceError,    # tipe value tidak didukung
+    sqlite3.ProgrammingError,  # jumlah kolom salah
+    ValueError,
+    TypeError,
+)
+
+
+def _is_transient(e: sqlite3.OperationalError) -> bool:
+    msg = str(e).lower()
+    return "locked" in msg or "busy" in msg
+
+
+class BatchWriter(threading.Thread):
+    """
+    Dedicated writer thread fed by a bounded queue.
+
+    - `submit()` is called from the paho network thread and never touches
+      SQLite; it waits at most `put_timeout` seconds when the queue is full
+      (backpressure) and then counts the row as dropped.
+    - The writer flushes with `executemany` + one commit when `batch_size`
+      rows are buffered or `flush_interval` seconds have passed. A custom
+      `write_fn(con, batch)` (e.g. raw insert + hourly rollup) replaces the
+      plain `executemany` and runs inside the same transaction.
+    - `on_commit(batch)` (optional) runs on the writer thread after each
+      successful commit, e.g. to detect closed hours for forecasting.
+    - A failed write is rolled back and the writer thread keeps running:
+      "database is locked/busy" is retried with exponential backoff
+      (`max_retries`, `retry_backoff`); bad-row errors (BAD_ROW_ERRORS)
+      split the batch in halves until only the bad rows are dropped; rows
+      that cannot be written are counted in `failed` and the first few
+      are logged.
+    - `stop()` drains the queue and flushes before closing the connection;
+      it never blocks longer than `timeout` (e.g. a dead writer thread
+      with a full queue).
+    """
+
+    def __init__(
+        self,
+        db_path: str,
+        sql_insert: str,
+        max_queue: int = 10000,
+        batch_size: int = 500,
+        flush_interval: float = 1.0,
+        put_timeout: float = 0.0,
+        metrics_interval: float = 60.0,
+        write_fn=None,
+        connect_fn=None,
+        checkpoint_interval: float = 0.0,
+        on_commit=None,
+        max_retries: int = 5,
+        retry_backoff: float = 0.1,
+        name: str = "sqlite-writer",
+    ):
+        super().__init__(name=name, daemon=True)
+        self.db_path = db_path
+        self.sql_insert = sql_insert
+        self.write_fn = write_fn
+        self.connect_fn = connect_fn
+        self.checkpoint_interval = checkpoint_interval
+        self.on_commit = on_commit
+        self.max_retries = max_retries
+        self.retry_backoff = retry_backoff
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.put_timeout = put_timeout
+        self.metrics_interval = metrics_interval
+
+        self.q = queue.Queue(maxsize=max_queue)
+        self._stats_lock = threading.Lock()
+
+        # metrics
+        self.enqueued = 0
+        self.dropped = 0
+        self.written = 0
+        self.batches = 0
+        self.errors = 0
+        self.failed = 0
+        self.retries = 0
+        self._logged_bad = 0
+        self.last_batch_size = 0
+        self.max_batch_size = 0
+        self.commit_ms_last = 0.0
+        self.commit_ms_total = 0.0
+        self.commit_ms_max = 0.0
+        self.checkpoints = 0
+        self.checkpoint_busy = 0
+
+    # --------------------------------------------------
+    # producer side (MQTT thread)
+    # --------------------------------------------------
+    def submit(self, row) -> bool:
+        try:
+            if self.put_timeout > 0:
+                self.q.put(row, timeout=self.put_timeout)
+            else:
+                self.q.put_nowait(row)
+        except queue.Full:
+            with self._stats_lock:
+                self.dropped += 1
+            return False
+
+        with self._stats_lock:
+            self.enqueued += 1
+        return True
+
+    def _signal_stop(self, timeout: float) -> bool:
+        # sentinel pakai put() blocking (dengan batas waktu) supaya tidak ikut
+        # ter-drop saat antrian penuh, tapi tidak hang kalau thread sudah mati
+        if not self.is_alive():
+            return False
+        try:
+            self.q.put(_STOP, timeout=timeout)
+        except queue.Full:
+            print(f"⚠️ writer[{self.name}] queue still full after {timeout:g}s, not waiting for drain")
+            return False
+        return True
+
+    def stop(self, timeout: float = 30.0) -> None:
+        if self._signal_stop(timeout):
+            self.join(timeout)
+
+    # --------------------------------------------------
+    # writer side
+    # --------------------------------------------------
+    def _connect(self) -> sqlite3.Connection:
+        if self.connect_fn is not None:
+            return self.connect_fn(self.db_path)
+        con = sqlite3.connect(self.db_path)
+        con.execute("PRAGMA journal_mode=WAL;")
+        return con
+
+    def _checkpoint(self, con: sqlite3.Connection) -> None:
+        # PASSIVE: salin WAL → DB tanpa menunggu/ memblokir reader
+        try:
+            busy, _, _ = con.execute("PRAGMA wal_checkpoint(PASSIVE);").fetchone()
+        except sqlite3.Error as e:
+            print("⚠️ checkpoint error:", e)
+            return
+        with self._stats_lock:
+            self.checkpoints += 1
+            self.checkpoint_busy += int(busy)
+
+    def _write_retry(self, con: sqlite3.Connection, rows: list) -> None:
+        """Write + commit `rows`; retry locked/busy with backoff, re-raise anything else."""
+        for attempt in range(self.max_retries + 1):
+            try:
+                if self.write_fn is not None:
+                    self.write_fn(con, rows)
+                else:
+                    con.executemany(self.sql_insert, rows)
+                con.commit()
+                return
+            except Exception as e:
+                try:
+                    con.rollback()
+                except sqlite3.Error as re:
+                    print("⚠️ rollback error:", re)
+                transient = isinstance(e, sqlite3.OperationalError) and _is_transient(e)
+                if not transient or attempt == self.max_retries:
+                    raise
+                with self._stats_lock:
+                    self.retries += 1
+                time.sleep(self.retry_backoff * (2 ** attempt))
+
+    def _write_rows(self, con: sqlite3.Connection, rows: list) -> list:
+        """Returns the rows that were committed."""
+        try:
+            self._write_retry(con, rows)
+            return rows
+        except BAD_ROW_ERRORS as e:
+            if len(rows) == 1:
+                self._drop(rows, e)
+                return []
+            # pecah dua sampai baris rusaknya ketemu; baris lain tetap ditulis
+            mid = len(rows) // 2
+            return self._write_rows(con, rows[:mid]) + self._write_rows(con, rows[mid:])
+        except Exception as e:
+            self._drop(rows, e)
+            return []
+
+    def _drop(self, rows: list, e: Exception) -> None:
+        with self._stats_lock:
+            self.errors += 1
+            self.failed += len(rows)
+        if self._logged_bad < LOG_BAD_ROWS:
+            print(f"❌ write error, dropped {len(rows)} rows: {type(e).__name__}: {e}")
+            for row in rows[:LOG_BAD_ROWS - self._logged_bad]:
+                print("   ↳ row:", row)
+                self._logged_bad += 1
+
+    def _flush(self, con: sqlite3.Connection, batch: list) -> None:
+        if not batch:
+            return
+
+        t0 = time.perf_counter()
+        self._logged_bad = 0
+        written = self._write_rows(con, batch)
+        if not written:
+            return
+        ms = (time.perf_counter() - t0) * 1000.0
+
+        with self._stats_lock:
+            self.written += len(written)
+            self.batches += 1
+            self.last_batch_size = len(written)
+            self.max_batch_size = max(self.max_batch_size, len(written))
+            self.commit_ms_last = ms
+            self.commit_ms_total += ms
+            self.commit_ms_max = max(self.commit_ms_max, ms)
+
+        if self.on_commit is not None:
+            try:
+                self.on_commit(written)
+            except Exception as e:
+                print("❌ on_commit error:", e)
+
+    def run(self) -> None:
+        con = self._connect()
+        batch = []
+        stopping = False
+        deadline = time.monotonic() + self.flush_interval
+        next_report = time.monotonic() + self.metrics_interval
+        next_checkpoint = time.monotonic() + self.checkpoint_interval
+
+        try:
+            while not stopping:
+                timeout = max(0.0, deadline - time.monotonic())
+                try:
+                    item = self.q.get(timeout=timeout)
+                    if item is _STOP:
+                        stopping = True
+                    else:
+                        batch.append(item)
+                except queue.Empty:
+                    pass
+
+                now = time.monotonic()
+                if stopping or len(batch) >= self.batch_size or now >= deadline:
+                    self._flush(con, batch)
+                    batch = []
+                    deadline = now + self.flush_interval
+
+                if self.checkpoint_interval and now >= next_checkpoint:
+                    self._checkpoint(con)
+                    next_checkpoint = now + self.checkpoint_interval
+
+                if self.metrics_interval and now >= next_report:
+                    self.print_metrics()
+                    next_report = now + self.metrics_interval
+
+            # drain sisa antrian (submit yang masuk setelah sentinel)
+            while True:
+                try:
+                    item = self.q.get_nowait()
+                except queue.Empty:
+                    break
+                if item is not _STOP:
+                    batch.append(item)
+                if len(batch) >= self.batch_size:
+                    self._flush(con, batch)
+                    batch = []
+            self._flush(con, batch)
+            if self.checkpoint_interval:
+                self._checkpoint(con)
+        finally:
+            con.close()
+
+    # --------------------------------------------------
+    # metrics
+    # --------------------------------------------------
+    def metrics(self) -> dict:
+        with self._stats_lock:
+            return {
+                "queue_depth": self.q.qsize(),
+                "enqueued": self.enqueued,
+                "written": self.written,
+                "dropped": self.dropped,
+                "errors": self.errors,
+                "failed": self.failed,
+                "retries": self.retries,
+                "batches": self.batches,
+                "last_batch_size": self.last_batch_size,
+                "max_batch_size": self.max_batch_size,
+                "avg_batch_size": (self.written / self.batches) if self.batches else 0.0,
+                "commit_ms_last": self.commit_ms_last,
+                "commit_ms_avg": (self.commit_ms_total / self.batches) if self.batches else 0.0,
+                "commit_ms_max": self.commit_ms_max,
+                "checkpoints": self.checkpoints,
+                "checkpoint_busy": self.checkpoint_busy,
+            }
+
+    def print_metrics(self) -> None:
+        m = self.metrics()
+        print(
+            f"📊 writer[{self.name}] queue={m['queue_depth']} written={m['written']} "
+            f"dropped={m['dropped']} errors={m['errors']} failed={m['failed']} retries={m['retries']} batches={m['batches']} "
+            f"batch(avg/max)={m['avg_batch_size']:.1f}/{m['max_batch_size']} "
+            f"commit_ms(avg/max)={m['commit_ms_avg']:.2f}/{m['commit_ms_max']:.2f}"
+        )
+
+
+class ShardedWriter:
+    """
+    Routes rows to N BatchWriter shards by a stable hash of device_id.
+
+    Each shard has its own thread and connection. With `db_paths` pointing
+    to separate files the shards never contend for the SQLite write lock;
+    with one shared path they only split the queueing/encoding work.
+    """
+
+    def __init__(self, db_paths, sql_insert: str, device_col: int = 1, **writer_kwargs):
+        self.device_col = device_col
+        self.shards = [
+            BatchWriter(path, sql_insert, name=f"sqlite-writer-{i}", **writer_kwargs)
+            for i, path in enumerate(db_paths)
+        ]
+
+    @staticmethod
+    def shard_index(device_id, n: int) -> int:
+        # crc32 (bukan hash()) supaya stabil antar proses/restart
+        return zlib.crc32(str(device_id).encode("utf-8")) % n
+
+    def shard_for(self, device_id) -> BatchWriter:
+        return self.shards[self.shard_index(device_id, len(self.shards))]
+
+    def submit(self, row) -> bool:
+        return self.shard_for(row[self.device_col]).submit(row)
+
+    def start(self) -> None:
+        for w in self.shards:
+            w.start()
+
+    def stop(self, timeout: float = 30.0) -> None:
+        signalled = [w for w in self.shards if w._signal_stop(timeout)]
+        for w in signalled:
+            w.join(timeout)
+
+    def is_alive(self) -> bool:
+        return any(w.is_alive() for w in self.shards)
+
+    def metrics(self) -> dict:
+        per_shard = [w.metrics() for w in self.shards]
+        total = {
+            k: sum(m[k] for m in per_shard)
+            for k in ("queue_depth", "enqueued", "written", "dropped", "errors", "failed", "retries", "batches")
+        }
+        total["shards"] = per_shard
+        return total
+
+    def print_metrics(self) -> None:
+        for w in self.shards:
+            w.print_metrics()
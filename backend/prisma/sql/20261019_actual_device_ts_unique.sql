@@ -0,0 +1,25 @@
+-- Actual: @@index([deviceId, ts]) -> @@unique([deviceId, ts])
+--
+-- Existing tables can hold duplicate (deviceId, ts) rows (the old importer
+-- and the MQTT worker never deduplicated), and CREATE UNIQUE INDEX fails on
+-- them, so the duplicates are removed first, keeping the lowest id.
+--
+-- The schema is applied with `prisma db push` (prisma/migrations is not
+-- tracked), and db push cannot add the unique key while duplicates exist.
+-- Run this file once before pushing the new schema; db push then finds the
+-- index already in place:
+--   npx prisma db execute --file prisma/sql/20261019_actual_device_ts_unique.sql --schema prisma/schema.prisma
+--   npx prisma db push
+
+-- DedupActual (uses the old (deviceId, ts) index for the self-join)
+DELETE a FROM `Actual` a
+JOIN `Actual` b
+  ON a.`deviceId` = b.`deviceId`
+ AND a.`ts` = b.`ts`
+ AND a.`id` > b.`id`;
+
+-- CreateIndex
+CREATE UNIQUE INDEX `Actual_deviceId_ts_key` ON `Actual`(`deviceId`, `ts`);
+
+-- DropIndex
+DROP INDEX `Actual_deviceId_ts_idx` ON `Actual`;
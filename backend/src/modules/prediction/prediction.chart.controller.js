@@ -3,6 +3,12 @@ import { mlOnline } from "../ml/predict.service.js";
 
 const prisma = new PrismaClient();
 
+// chart type → series name in forecastJson.series (ai/db/predictions.py)
+const SERIES_BY_TYPE = {
+  temperature: "temp_c_pred",
+  tvoc: "tvoc_ppb_pred",
+};
+
 /**
  * Format time HH:mm
  */
@@ -53,21 +59,27 @@ export async function getPredictionChart(req, res) {
 
     let predicted = [];
 
-    if (
-      latestPrediction?.forecastJson &&
-      Array.isArray(latestPrediction.forecastJson.prediction)
-    ) {
-      const forecast = latestPrediction.forecastJson.prediction;
+    const forecastJson = latestPrediction?.forecastJson;
+    // Python scripts (ai/db/predictions.py series_forecast): per-target series + step_sec
+    const series = forecastJson?.series?.[SERIES_BY_TYPE[type]];
+    const forecast = Array.isArray(series)
+      ? series
+      : Array.isArray(forecastJson?.prediction)
+        ? forecastJson.prediction
+        : null;
+
+    if (forecast) {
+      const stepMs = (Array.isArray(series) && forecastJson.step_sec ? forecastJson.step_sec : 60) * 1000;
 
       // mulai dari timestamp prediction
       let baseTime = new Date(latestPrediction.timestamp);
 
       predicted = forecast.slice(0, 60).map((value, i) => {
-        const ts = new Date(baseTime.getTime() + (i + 1) * 60 * 1000);
+        const ts = new Date(baseTime.getTime() + (i + 1) * stepMs);
 
         return {
           time: formatTime(ts), // ⏱️ jam real
-          value: Number(value.toFixed(2)), // ✅ angka valid
+          value: Number(Number(value).toFixed(2)), // ✅ angka valid
           type: "predicted",
         };
       });